@@ -15,9 +15,9 @@ from energylib import comedlib
 from energylib import ecobeelib
 
 #============================================
-def parse_args():
+def parse_args(argv=None):
 	"""
-	Parse command-line arguments.
+	Parse command-line arguments (sys.argv when argv is None).
 	"""
 	parser = argparse.ArgumentParser(
 		description="Automated ecobee thermostat control based on ComEd pricing"
@@ -43,26 +43,43 @@ def parse_args():
 		help="Do not use humidity adjustment"
 	)
 	parser.set_defaults(debug=True, use_humid=True)
-	args = parser.parse_args()
+	args = parser.parse_args(argv)
 	return args
 
 #============================================
 class ThermoStat(object):
-	def __init__(self, args):
+	"""
+	Price-driven A/C controller that keeps one Ecobee session and one ComedLib.
+
+	Construct it once and call runCycle() for every check: the Ecobee
+	connection is opened on the first cycle that needs it and only the
+	tokens are checked afterwards.
+	"""
+	def __init__(self, args, comlib=None):
 		self.debug = args.debug
 		self.use_humid = args.use_humid
 		self.hightemp = args.hightemp
 		self.cooltemp = args.cooltemp
-		self.comlib = comedlib.ComedLib()
-		self.comlib.msg = self.debug
+		if comlib is None:
+			comlib = comedlib.ComedLib()
+			comlib.msg = self.debug
+		self.comlib = comlib
 		self.current_rate = None
-		self.openEcobee()
+		self.myecobee = None
 
 	def openEcobee(self):
-		self.myecobee = ecobeelib.MyEcobee()
-		self.myecobee.setLogger()
-		self.myecobee.readThermostatDefs()
-		self.myecobee.openConnection()
+		if self.myecobee is None:
+			self.myecobee = ecobeelib.MyEcobee()
+			self.myecobee.setLogger()
+			self.myecobee.readThermostatDefs()
+			self.myecobee.openConnection()
+		else:
+			self.myecobee.ensureConnection()
+		self.readThermostat()
+
+	def readThermostat(self):
+		# one fresh snapshot: runtime, events and sensors for this check
+		self.myecobee.invalidateSnapshot()
 		self.runtimedict = self.myecobee.runtime()
 		self.coolsetting = float(self.runtimedict['desired_cool'])/10.
 		#self.coolsetting = 72.0
@@ -84,8 +101,9 @@ class ThermoStat(object):
 		print((" o Cut Off Rate:     {0:.3f}c".format(self.cutoff)))
 		print((" o Most Recent Rate: {0:.1f}c".format(self.recent_rate)))
 
-	def checkUserOverride(self):
-		events_tree = self.myecobee.events()
+	def checkUserOverride(self, fresh=False):
+		# fresh: ask the thermostat for its events now instead of the snapshot
+		events_tree = self.myecobee.events(fresh=fresh)
 		if events_tree is None:
 			print('no events to parse -> no override')
 			return False
@@ -158,6 +176,7 @@ class ThermoStat(object):
 		adjustTemp -= adjustment
 		print(" _ Adjust temp down by {0:.1f}F for standard deviation of {1:.1f}F".format(adjustment, stdev_temp))
 
+		now = datetime.datetime.now()
 		if now.hour >= 19:
 			print(" _ Adjust temperature down 1 degree after 7pm for bedtime")
 			adjustTemp -= 1.0
@@ -196,69 +215,84 @@ class ThermoStat(object):
 		print("Temperature Bonus Rate: {0:.3f}c".format(bonus_rate))
 		return bonus_rate
 
+	def runCycle(self):
+		"""
+		Check prices once and set the thermostat for the rest of the hour.
+		"""
+		print("=====================================================")
+		print(time.asctime())
+		now = datetime.datetime.now()
+		print("Current hour: {0:d}".format(now.hour))
+		#vacation override
+		if now.hour < 6 or now.hour >= 21:
+			print("only run program between 6am and 8:59pm => exit")
+			return
 
+		self.openEcobee()
+		if self.checkUserOverride() is True:
+			print("user override in effect => exit")
+			return
+		print("no user override found")
+
+		#don't change temperature when it is almost the next hour
+		next_hour_cutoff = 59
+		if now.minute >= next_hour_cutoff:
+			print(f"more than {next_hour_cutoff} minutes past the hour => turn off")
+			self.turnOffEcobee()
+			return
+
+		#minutes past the hour to start tweaking temperature
+		if now.hour < 10 or now.hour >= 18:
+			#early late
+			time_cutoff = 9
+		elif now.weekday() >= 5:
+			#weekend
+			time_cutoff = 7
+		else:
+			#default
+			time_cutoff = 20
+			#time_cutoff = 3
+		#vacation override
+		#time_cutoff = 20
+
+		#blah
+		if now.minute <= time_cutoff:
+			print("less than {0:d} minutes past the hour => turn off".format(time_cutoff))
+			self.turnOffEcobee()
+			return
+
+		# fresh prices every cycle
+		self.getRates()
+		self.showRates()
+		bonus_rate = self.getRateBonus()
+		bonus_cutoff = self.cutoff + bonus_rate + 1.1
+		print("Final Cutoff Rate: {0:.3f}".format(bonus_cutoff))
+
+		# the price checks take a while: re-read the events (only) so a hold
+		# the user set meanwhile is respected
+		if self.checkUserOverride(fresh=True) is True:
+			print("user override in effect => exit")
+			return
+		print("no user override found")
+
+		if self.predict_rate >= bonus_cutoff:
+			self.turnOffEcobee()
+		else:
+			self.turnOnEcobee()
 
+#============================================
+def run_once(args, comlib=None):
+	"""
+	Run a single control cycle with a new controller.
+
+	Args:
+		args: parsed arguments, see parse_args().
+		comlib: ComedLib to share with other jobs; a new one when None.
+	"""
+	thermstat = ThermoStat(args, comlib)
+	thermstat.runCycle()
+	return thermstat
 
 #============================================
 if __name__ == "__main__":
-	args = parse_args()
-
-	print("=====================================================")
-	print(time.asctime())
-	now = datetime.datetime.now()
-	print("Current hour: {0:d}".format(now.hour))
-	#vacation override
-	if now.hour < 6 or now.hour >= 21:
-		print("only run program between 6am and 8:59pm => exit")
-		sys.exit(0)
-
-	thermstat = ThermoStat(args)
-	if thermstat.checkUserOverride() is True:
-		print("user override in effect => exit")
-		sys.exit(0)
-	print("no user override found")
-
-	#don't change temperature when it is almost the next hour
-	next_hour_cutoff = 59
-	if now.minute >= next_hour_cutoff:
-		print(f"more than {next_hour_cutoff} minutes past the hour => turn off")
-		thermstat.turnOffEcobee()
-		sys.exit(0)
-
-	#minutes past the hour to start tweaking temperature
-	if now.hour < 10 or now.hour >= 18:
-		#early late
-		time_cutoff = 9
-	elif now.weekday() >= 5:
-		#weekend
-		time_cutoff = 7
-	else:
-		#default
-		time_cutoff = 20
-		#time_cutoff = 3
-	#vacation override
-	#time_cutoff = 20
-
-	#blah
-	if now.minute <= time_cutoff:
-		print("less than {0:d} minutes past the hour => turn off".format(time_cutoff))
-		thermstat.turnOffEcobee()
-		sys.exit(0)
-
-	thermstat.showRates()
-	bonus_rate = thermstat.getRateBonus()
-	bonus_cutoff = thermstat.cutoff + bonus_rate + 1.1
-	print("Final Cutoff Rate: {0:.3f}".format(bonus_cutoff))
-
-	predict_rate = thermstat.predict_rate
-	del thermstat
-	thermstat = ThermoStat(args)
-	if thermstat.checkUserOverride() is True:
-		print("user override in effect => exit")
-		sys.exit(0)
-	print("no user override found")
-
-	if predict_rate >= bonus_cutoff:
-		thermstat.turnOffEcobee()
-	else:
-		thermstat.turnOnEcobee()
+	run_once(parse_args())
@@ -3,11 +3,11 @@
 import os
 import sys
 import time
-import math
 import argparse
-import pywemo
 import random
+import threading
 import datetime
+import concurrent.futures
 
 REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if REPO_ROOT not in sys.path:
@@ -15,6 +15,9 @@ if REPO_ROOT not in sys.path:
 
 from energylib import comedlib
 from energylib import commonlib
+from energylib import wemolib
+from energylib import charging_decision
+from energylib import charge_planner
 
 CL = commonlib.CommonLib()
 
@@ -27,6 +30,9 @@ CL = commonlib.CommonLib()
 # - Compute a cutoff based on ComEd's reasonable cutoff, then clamp to bounds.
 # - If predicted price is very high (2x cutoff after :20), disable for the hour.
 # - Otherwise enable if predicted is low, disable if predicted is high, or hold steady.
+# With --charge-kwh and --ready-by the plugs follow a plan instead: the cheapest
+# day-ahead hours that deliver the energy before the deadline, re-planned hourly
+# for the energy still owed, and the loop sleeps until the plan next switches.
 
 #badHours = [5, 6, 17, 18]
 #badHours = [17, 18]
@@ -36,19 +42,49 @@ wemoIpAddresses = [
 	"192.168.2.166",  # insight2
 ]
 
+# Thresholds (c/kWh) live in energylib/charging_decision.py so the backtester
+# replays exactly these values; see scripts/backtest_comed_strategies.py.
 # Always start charge below this value.
-lower_bound = 2.8
+lower_bound = charging_decision.DEFAULT_PARAMS['lower_bound']
 # Always stop charge above this value.
-upper_bound = 7.2
+upper_bound = charging_decision.DEFAULT_PARAMS['upper_bound']
 # Small bias to make the cutoff slightly more permissive or strict.
-cutoff_adjust = -0.8
+cutoff_adjust = charging_decision.DEFAULT_PARAMS['cutoff_adjust']
 # Deadband around the cutoff to reduce churn.
-buffer_rate = 0.5
+buffer_rate = charging_decision.DEFAULT_PARAMS['buffer_rate']
+
+# Every plug is handled on its own thread, so N plugs take as long as one.
+# Seconds each plug gets per operation; enable() alone sleeps 20 seconds.
+PLUG_TIMEOUTS = {
+	'connect': 60.0,
+	'actuate': 240.0,
+}
+# extra attempts after an exception (network errors, not a wrong state)
+PLUG_RETRIES = 2
+RETRY_DELAY_SECONDS = 5.0
+# wemolib.PlugActuator settings: attempts with doubling backoff between them,
+# then a plug failing three actuations in a row is skipped for 15 minutes
+PLUG_ACTUATION = {
+	'attempts': 4,
+	'settle_seconds': 2.0,
+	'verify_seconds': 20.0,
+	'backoff_seconds': 2.0,
+	'max_backoff_seconds': 30.0,
+	'failure_threshold': 3,
+	'open_seconds': 900.0,
+}
+
+_plug_manager = None
+_plug_manager_lock = threading.Lock()
+# operation still running per plug, so a plug stuck past its timeout is
+# skipped instead of getting a second thread
+_plugs_in_flight = {}
+_plugs_in_flight_lock = threading.Lock()
 
 #======================================
-def parse_args():
+def parse_args(argv=None):
 	"""
-	Parse command-line arguments.
+	Parse command-line arguments (sys.argv when argv is None).
 	"""
 	parser = argparse.ArgumentParser(
 		description="Control WeMo plugs with ComEd pricing and multi-plug support."
@@ -58,24 +94,41 @@ def parse_args():
 		help='Show detailed WeMo connection diagnostics'
 	)
 	parser.add_argument(
-		'-r', '--refresh-seconds', dest='refresh_seconds', type=int, default=180,
-		help='Seconds between pricing refresh checks'
+		'-r', '--refresh-seconds', dest='refresh_seconds', type=int, default=900,
+		help='Longest wait between pricing checks when no new price is published'
 	)
 	parser.add_argument(
 		'-i', '--wemo-ip', dest='wemo_ips', action='append',
 		help='WeMo IP address (repeat for multiple plugs)'
 	)
+	parser.add_argument(
+		'-k', '--charge-kwh', dest='charge_kwh', type=float,
+		help='Energy to deliver before --ready-by; enables day-ahead planning'
+	)
+	parser.add_argument(
+		'-p', '--charge-kw', dest='charge_kw', type=float, default=1.4,
+		help='Charger power draw in kW while on (default 1.4, Level 1)'
+	)
+	parser.add_argument(
+		'-b', '--ready-by', dest='ready_by', default='07:00',
+		help='Local time HH:MM by which the energy must be delivered'
+	)
 	parser.set_defaults(debug_wemo=False)
-	args = parser.parse_args()
+	args = parser.parse_args(argv)
 	return args
 
 class ComedSmartWemoPlug(object):
-	def __init__(self, ipaddress, debug_wemo=False):
+	def __init__(self, ipaddress, debug_wemo=False, manager=None, connect=True):
 		self.address = ipaddress
-		self.depth = 0
 		self.debug = debug_wemo
 		self.connected = False
-		self.connectToWemo()
+		# one subscription registry per process tracks every plug
+		if manager is None:
+			manager = get_plug_manager()
+		self.manager = manager
+		self.actuator = wemolib.PlugActuator(manager, ipaddress, **PLUG_ACTUATION)
+		if connect:
+			self.connectToWemo()
 		return
 
 	#======================================
@@ -86,72 +139,62 @@ class ComedSmartWemoPlug(object):
 
 	#======================================
 	def getState(self):
-		return self.device.get_state(force_update=True)
+		# last state pushed by the plug, no network round-trip
+		return self.manager.getState(self.address)
 
 	#======================================
 	def connectToWemo(self):
 		self._debug(f"connecting to WeMo plug at {self.address}")
 		time.sleep(random.random())
-		self.port = pywemo.ouimeaux_device.probe_wemo(self.address)
-		self._debug(f"WeMo probe success {self.address}:{self.port}")
-		self.wemoUrl = pywemo.setup_url_for_address(self.address)
-		self._debug(f"WeMo description url {self.wemoUrl}")
-		self.device = pywemo.discovery.device_from_description(self.wemoUrl)
-		self._debug(f"WeMo device object {self.device}")
-		if self.debug is True:
-			time.sleep(random.random())
+		# failures count against the actuator's circuit breaker
+		self.actuator.ensureConnected()
+		self.connected = self.address in self.manager.plugs
+		if self.connected and self.debug is True:
+			self._debug(f"WeMo device object {self.manager.plugs[self.address]['device']}")
 			state = self.getState()
 			self._debug(f"WeMo state response {self.address} = {state}")
-		self.connected = True
+
+	#======================================
+	def ensureSubscribed(self):
+		"""
+		Reconnect only when the plug's event subscription has failed or it never connected.
+
+		An unreachable plug is retried once per circuit-breaker cool-down.
+		"""
+		if self.actuator.ensureConnected():
+			if self.connected:
+				print(CL.colorString(f"WeMo subscription lost, reconnected {self.address}", "brown"))
+			else:
+				print(CL.colorString(f"WeMo plug {self.address} connected", "green"))
+			self.connected = True
+
+	#======================================
+	def _actuate(self, turn_on, color, log_msg):
+		"""
+		Switch the plug through its actuator; a failure is reported, never raised.
+		"""
+		outcome = self.actuator.actuate(turn_on)
+		if outcome == wemolib.SWITCHED:
+			mystr = f"turned {'ON' if turn_on else 'OFF'} wemo plug, {log_msg} ({self.address})"
+			print(CL.colorString(mystr, color))
+			self.writeToLogFile(log_msg)
+		elif outcome == wemolib.FAILED:
+			health = self.actuator.health()
+			mystr = (f"ERROR: {log_msg} failed ({self.address}, circuit {health['circuit']}): "
+				f"{health['last_error']}")
+			print(CL.colorString(mystr, "red"))
+		elif outcome == wemolib.SKIPPED:
+			mystr = f"skipping wemo plug {self.address}, circuit open after repeated failures"
+			print(CL.colorString(mystr, "brown"))
+		return outcome
 
 	#======================================
 	def enable(self):
-		self.depth += 1
-		if self.getState() == 0:
-			mystr = f"turning ON wemo plug, start charging ({self.address})"
-			print(CL.colorString(mystr, "green"))
-			self.device.on()
-			time.sleep(15)
-			self.writeToLogFile("begin charging")
-		else:
-			#print "charging already active"
-			pass
-		time.sleep(5)
-		if self.getState() in (1, 8):
-			self.depth = 0
-			return
-		print(f"state = {self.getState()}")
-		print(CL.colorString("ERROR: starting charging", "red"))
-		if self.depth > 10:
-			sys.exit(1)
-		else:
-			self.enable()
-		return
+		return self._actuate(True, "green", "begin charging")
 
 	#======================================
 	def disable(self):
-		self.depth += 1
-		if self.getState() in (1, 8):
-			mystr = f"turning OFF wemo plug, stop charging (state = {self.getState()}, {self.address})"
-			print(CL.colorString(mystr, "red"))
-			self.device.off()
-			time.sleep(5)
-			self.writeToLogFile("stop charging")
-		else:
-			#print "charging already disabled"
-			pass
-		# get state of device
-		if self.getState() == 0:
-			self.depth = 0
-			return
-		print(f"state = {self.getState()}")
-		print(CL.colorString("ERROR: turning off charging", "red"))
-		time.sleep(0.2 * self.depth)
-		if self.depth > 10:
-			sys.exit(1)
-		else:
-			self.disable()
-		return
+		return self._actuate(False, "red", "stop charging")
 
 	#======================================
 	def writeToLogFile(self, msg):
@@ -167,11 +210,7 @@ def _compute_rates(comlib):
 	current_rate = comlib.getCurrentComedRate()
 	predict_rate = comlib.getPredictedRate()
 	cutoff = comlib.getReasonableCutOff()
-	if cutoff < lower_bound:
-		cutoff = lower_bound
-	elif cutoff > upper_bound:
-		cutoff = upper_bound
-	cutoff += cutoff_adjust
+	cutoff = charging_decision.bound_cutoff(cutoff, lower_bound, upper_bound, cutoff_adjust)
 	return current_rate, predict_rate, cutoff
 
 #======================================
@@ -180,36 +219,200 @@ def _is_always_cheap(comlib):
 	Return True when the raw recent price is below the always-cheap threshold.
 	"""
 	recent_rate = comlib.getMostRecentRate()
-	return recent_rate < 1.0, recent_rate
+	return recent_rate < charging_decision.ALWAYS_CHEAP_RATE, recent_rate
 
 #======================================
-def _decision(now, current_rate, predict_rate, cutoff):
+def _decision(engine, now, current_rate, predict_rate, cutoff):
 	"""
 	Decide whether to enable, disable, or hold based on predicted prices.
+
+	The engine keeps state between cycles and holds a toggle back during the
+	minimum dwell time or when the hourly toggle budget is spent.
 	"""
 	timestr = "%02d:%02d"%(now.hour, now.minute)
-	if predict_rate > 2.0*cutoff and now.minute > 20:
+	action = engine.decide(now.timestamp(), now.minute, predict_rate, cutoff)
+	if action == "disable_long":
 		msg = "%s: charging LONG DISable !! double cutoff ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
-		return "disable_long", msg
-
-	if predict_rate < lower_bound:
+	elif action == "enable":
 		msg = "%s: charging +enabled ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
-		return "enable", msg
-
-	if predict_rate > float(cutoff) + buffer_rate:
+	elif action == "disable" and predict_rate > float(cutoff) + buffer_rate:
 		msg = "%s: charging -DISabled ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
-		return "disable", msg
-
-	if predict_rate > upper_bound:
+	elif action == "disable":
 		msg = "%s: charging -DISabled ( %.2f c/kWh | %.2f c/kWh | upper_bound = %.2f c/kWh )"%(timestr, current_rate, predict_rate, upper_bound)
-		return "disable", msg
+	elif engine.last_reason == "dwell":
+		msg = "%s: charging ~held, minimum dwell ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
+	elif engine.last_reason == "budget":
+		msg = "%s: charging ~held, toggle budget spent ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
+	else:
+		msg = "%s: charging ~unchanged ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
+	return action, msg
 
-	if predict_rate < float(cutoff) - buffer_rate:
-		msg = "%s: charging +enabled ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
-		return "enable", msg
+#======================================
+def _print_engine_metrics(engine, now):
+	"""
+	Print the decision engine counters, once per hour.
+	"""
+	metrics = engine.metrics(now.timestamp())
+	mystr = ("decisions %d | toggles %d (%d forced, %d in the last hour) | held: dwell %d, budget %d"
+		%(metrics['decisions'], metrics['toggles'], metrics['forced_toggles'], metrics['toggles_last_hour'],
+		metrics['held_dwell'], metrics['held_budget']))
+	print(CL.colorString(mystr, "cyan"))
+
+#======================================
+def _with_retries(function, item, retries):
+	"""
+	Call function(item), retrying after an exception with a growing delay.
+	"""
+	for attempt in range(retries + 1):
+		try:
+			return function(item)
+		except Exception as error:
+			if attempt == retries:
+				raise
+			mystr = f"WARNING: {_label(item)} failed ({error}), retry {attempt + 1} of {retries}"
+			print(CL.colorString(mystr, "red"))
+			time.sleep(RETRY_DELAY_SECONDS * (attempt + 1))
+
+#======================================
+def _label(item):
+	"""
+	Return the IP address of a plug (or the address itself) for log lines.
+	"""
+	return getattr(item, 'address', item)
+
+#======================================
+def _submit_plug(executor, function, item, retries):
+	"""
+	Start function(item) unless the plug still runs an earlier operation.
+
+	Returns:
+		concurrent.futures.Future: the new operation, or None when the plug is busy.
+	"""
+	label = _label(item)
+	with _plugs_in_flight_lock:
+		running = _plugs_in_flight.get(label)
+		if running is not None and not running.done():
+			return None
+		future = executor.submit(_with_retries, function, item, retries)
+		_plugs_in_flight[label] = future
+
+	def release(done_future):
+		with _plugs_in_flight_lock:
+			if _plugs_in_flight.get(label) is done_future:
+				del _plugs_in_flight[label]
+	future.add_done_callback(release)
+	return future
+
+#======================================
+def run_on_plugs(function, items, timeout_seconds, retries=PLUG_RETRIES):
+	"""
+	Run function(item) for every plug concurrently, each with its own timeout and retries.
+
+	One slow or failing plug does not hold up the others; the failures are
+	raised together once every plug has finished or run out of time. A plug
+	whose earlier operation is still running after its timeout is skipped
+	and reported until that operation ends, so stuck plugs never pile up
+	threads.
+
+	Args:
+		function: callable taking one plug (or IP address).
+		items: plugs or IP addresses.
+		timeout_seconds: time each plug is allowed, retries included.
+		retries: extra attempts after an exception.
+
+	Returns:
+		list: the results in the order of items.
+	"""
+	if not items:
+		return []
+	start_time = time.monotonic()
+	executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(items),
+		thread_name_prefix="wemo")
+	futures = [_submit_plug(executor, function, item, retries) for item in items]
+	results = []
+	errors = []
+	for item, future in zip(items, futures):
+		if future is None:
+			results.append(None)
+			errors.append(f"{_label(item)}: skipped, an earlier operation is still running")
+			continue
+		remaining = start_time + timeout_seconds - time.monotonic()
+		try:
+			results.append(future.result(timeout=max(remaining, 0.0)))
+		except concurrent.futures.TimeoutError:
+			results.append(None)
+			errors.append(f"{_label(item)}: no answer within {timeout_seconds:.0f} seconds")
+		except Exception as error:
+			results.append(None)
+			errors.append(f"{_label(item)}: {type(error).__name__} {error}")
+	# a plug that timed out keeps its thread; do not wait for it
+	executor.shutdown(wait=False)
+	if errors:
+		raise RuntimeError("WeMo plug errors: " + "; ".join(errors))
+	return results
+
+#======================================
+def get_plug_manager():
+	"""
+	Return the process-wide WeMo plug manager, creating it on first use.
+	"""
+	global _plug_manager
+	if _plug_manager is None:
+		with _plug_manager_lock:
+			if _plug_manager is None:
+				_plug_manager = wemolib.WemoPlugManager()
+	return _plug_manager
+
+#======================================
+def check_subscriptions(wemo_plugs):
+	"""
+	Reconnect, concurrently, only the plugs whose event subscription failed.
+
+	A plug that cannot be reached is reported and tried again next cycle;
+	its actuator's circuit breaker keeps it from holding up the others.
+	"""
+	try:
+		run_on_plugs(lambda plug: plug.ensureSubscribed(), wemo_plugs, PLUG_TIMEOUTS['connect'])
+	except RuntimeError as error:
+		print(CL.colorString(f"ERROR: {error}", "red"))
+
+#======================================
+def actuate_plugs(wemo_plugs, turn_on):
+	"""
+	Enable or disable every plug concurrently and report unhealthy plugs.
+
+	Retries live in each plug's wemolib.PlugActuator, so a failing plug
+	never raises here.
+
+	Returns:
+		list: actuation outcome per plug, None for a plug that ran out of time.
+	"""
+	try:
+		outcomes = run_on_plugs(lambda plug: plug.enable() if turn_on else plug.disable(), wemo_plugs, PLUG_TIMEOUTS['actuate'], retries=0)
+	except RuntimeError as error:
+		print(CL.colorString(f"ERROR: {error}", "red"))
+		outcomes = [None] * len(wemo_plugs)
+	return outcomes
 
-	msg = "%s: charging ~unchanged ( current %.2f | predict %.2f | cutoff %.2f c/kWh )"%(timestr, current_rate, predict_rate, cutoff)
-	return "unchanged", msg
+#======================================
+def plug_health(wemo_plugs):
+	"""
+	Return the actuation health of every plug.
+	"""
+	return [plug.actuator.health() for plug in wemo_plugs]
+
+#======================================
+def _print_plug_health(wemo_plugs):
+	"""
+	Print the actuation health of every plug, once per hour.
+	"""
+	for health in plug_health(wemo_plugs):
+		mystr = ("plug %s | circuit %s | switches %d, failures %d, skips %d"
+			%(health['address'], health['circuit'], health['switches'], health['failures'], health['skips']))
+		if health['last_error']:
+			mystr += f" | last error: {health['last_error']}"
+		color = "cyan" if health['circuit'] == wemolib.CIRCUIT_CLOSED else "red"
+		print(CL.colorString(mystr, color))
 
 #======================================
 def _apply_action(wemo_plugs, action, msg):
@@ -226,85 +429,228 @@ def _apply_action(wemo_plugs, action, msg):
 	for plug in wemo_plugs:
 		plug_msg = f"{msg} | {plug.address}"
 		print(CL.colorString(plug_msg, color))
-		if action == "enable":
-			plug.enable()
-		elif action in ("disable", "disable_long"):
-			plug.disable()
+	if action == "enable":
+		actuate_plugs(wemo_plugs, True)
+	elif action in ("disable", "disable_long"):
+		actuate_plugs(wemo_plugs, False)
+
+#======================================
+def _next_ready_by(ready_by, now):
+	"""
+	Return the next occurrence of the local HH:MM deadline as a Unix time.
+	"""
+	ready_time = datetime.datetime.strptime(ready_by, "%H:%M").time()
+	deadline = datetime.datetime.combine(now.date(), ready_time)
+	if deadline <= now:
+		deadline += datetime.timedelta(days=1)
+	return deadline.timestamp()
+
+#======================================
+def _schedule_end(comlib):
+	"""
+	Return the start of the last published day-ahead hour, or None.
+	"""
+	columns = comlib.getDayAheadPrices()
+	if columns is None or len(columns[0]) == 0:
+		return None
+	return int(columns[0][-1])
+
+#======================================
+def new_plan_state():
+	"""
+	Return the state run_plan_cycle() carries between cycles.
+	"""
+	plan_state = {
+		'plan': None,
+		'deadline': None,
+		'delivered_kwh': 0.0,
+		'planned_at': None,
+		'replan_at': None,
+		'planned_schedule_end': None,
+	}
+	return plan_state
+
+#======================================
+def run_plan_cycle(wemo_plugs, comlib, plan_state, charge_kwh, charge_kw, ready_by):
+	"""
+	Follow a cheapest-hours plan for the energy still owed before the deadline.
+
+	The plan is redone at the top of every hour and whenever ComEd publishes
+	a newer day-ahead schedule, each time for the energy the earlier plans
+	have not delivered yet; the need resets after every deadline.
+
+	Args:
+		wemo_plugs: ComedSmartWemoPlug objects.
+		comlib: ComedLib used for the day-ahead prices.
+		plan_state: dict from new_plan_state(), carried between cycles.
+		charge_kwh: energy to deliver before each deadline.
+		charge_kw: charger power draw while on.
+		ready_by: local HH:MM deadline.
+
+	Returns:
+		float: seconds until the plan next switches or is redone.
+	"""
+	check_subscriptions(wemo_plugs)
+	now = datetime.datetime.now()
+	now_seconds = now.timestamp()
+	schedule_end = _schedule_end(comlib)
+	plan = plan_state['plan']
+	if plan is not None:
+		# the plugs followed the plan since it was made
+		on_seconds = charge_planner.planned_on_seconds(plan, plan_state['planned_at'], now_seconds)
+		plan_state['delivered_kwh'] += on_seconds / 3600.0 * charge_kw
+	if plan is None or now_seconds >= plan_state['deadline']:
+		plan_state['deadline'] = _next_ready_by(ready_by, now)
+		plan_state['delivered_kwh'] = 0.0
+		plan = None
+	deadline = plan_state['deadline']
+	if plan is None or now_seconds >= plan_state['replan_at'] or schedule_end != plan_state['planned_schedule_end']:
+		remaining_kwh = max(charge_kwh - plan_state['delivered_kwh'], 0.0)
+		plan = comlib.planCheapestHours(remaining_kwh, charge_kw, deadline, now_seconds)
+		plan_state['planned_schedule_end'] = schedule_end
+		plan_state['replan_at'] = (int(now_seconds // 3600) + 1) * 3600
+		if plan['average_price'] is None:
+			average_text = "n/a"
 		else:
-			pass
+			average_text = "%.2f c/kWh"%(plan['average_price'])
+		mystr = ("planned %.1f of %.1f kWh in %d intervals before %s, avg %s (%d hours estimated)"
+			%(plan['energy_kwh'], charge_kwh, len(plan['intervals']), ready_by, average_text,
+			plan['estimated_hours']))
+		print(CL.colorString(mystr, "cyan"))
+		if plan['shortfall_kwh'] > 0:
+			print(CL.colorString("WARNING: %.1f kWh do not fit before the deadline"%(plan['shortfall_kwh']), "red"))
+	plan_state['plan'] = plan
+	plan_state['planned_at'] = now_seconds
+	timestr = "%02d:%02d"%(now.hour, now.minute)
+	if charge_planner.plan_is_active(plan, now_seconds):
+		_apply_action(wemo_plugs, "enable", "%s: charging +enabled ( planned hour )"%(timestr))
+	else:
+		_apply_action(wemo_plugs, "disable", "%s: charging -DISabled ( not a planned hour )"%(timestr))
+	wake_seconds = charge_planner.next_change_seconds(plan, now_seconds)
+	if wake_seconds is None or wake_seconds > plan_state['replan_at']:
+		wake_seconds = plan_state['replan_at']
+	wake_seconds = min(wake_seconds, deadline)
+	return max(wake_seconds - time.time(), 1.0)
+
+#======================================
+def connect_plugs(wemo_ip_addresses, debug_wemo=False):
+	"""
+	Connect to every configured WeMo plug concurrently.
+
+	A plug that cannot be reached is reported and kept: check_subscriptions()
+	connects it on a later cycle, and its circuit breaker keeps it from
+	delaying the reachable plugs meanwhile.
+	"""
+	wemo_plugs = [ComedSmartWemoPlug(ipaddress, debug_wemo=debug_wemo, connect=False)
+		for ipaddress in wemo_ip_addresses]
+	try:
+		run_on_plugs(lambda plug: plug.connectToWemo(), wemo_plugs, PLUG_TIMEOUTS['connect'])
+	except RuntimeError as error:
+		print(CL.colorString(f"ERROR: {error}", "red"))
+	return wemo_plugs
+
+#======================================
+def run_cycle(wemo_plugs, comlib, state):
+	"""
+	Run one pricing check and apply the decision to every plug.
+
+	Args:
+		wemo_plugs: connected ComedSmartWemoPlug objects.
+		comlib: ComedLib used for prices, shared between cycles.
+		state: dict from new_cycle_state(), carried between cycles.
+
+	Returns:
+		float: extra seconds to hold before the next cycle (bad hours and
+			long disables), else 0.
+	"""
+	state['count'] += 1
+	# plugs push their state; reconnect only those whose subscription failed
+	check_subscriptions(wemo_plugs)
+	now = datetime.datetime.now()
+	hour = now.hour
+	if hour != state['last_hour']:
+		print('============== new hour ==')
+		_print_engine_metrics(state['engine'], now)
+		_print_plug_health(wemo_plugs)
+	state['last_hour'] = hour
+
+	### always enable before 5AM
+	#if hour < 5:
+	#	for plug in wemo_plugs:
+	#		plug.enable()
+	#	return 0.0
+
+	### special condition where it is assumed to be a high price
+	if hour in badHours:
+		if now.minute < 20:
+			mystr = "charging disabled, bad hour, sleep until %d:20"%(hour)
+			print(CL.colorString(mystr, "red"))
+			state['engine'].apply("disable", now.timestamp(), force=True)
+			actuate_plugs(wemo_plugs, False)
+			minutesToSleep = 20 - now.minute - 2
+			return max(minutesToSleep*60, 0.0)
+
+	is_always_cheap, recent_rate = _is_always_cheap(comlib)
+	if is_always_cheap:
+		timestr = "%02d:%02d"%(now.hour, now.minute)
+		msg = "%s: charging +enabled ( recent %.2f | always cheap < 1.00 c/kWh )"%(timestr, recent_rate)
+		state['engine'].apply("enable", now.timestamp(), force=True)
+		_apply_action(wemo_plugs, "enable", msg)
+		return 0.0
+
+	current_rate, predict_rate, cutoff = _compute_rates(comlib)
+	action, msg = _decision(state['engine'], now, current_rate, predict_rate, cutoff)
+	_apply_action(wemo_plugs, action, msg)
+
+	if action == "disable_long":
+		minutesToSleep = 60 - now.minute - 2
+		return max(minutesToSleep*60, 0.0)
+	return 0.0
+
+#======================================
+def new_cycle_state():
+	"""
+	Return the state run_cycle() carries between cycles.
+	"""
+	state = {
+		'count': 0,
+		'last_hour': -2,
+		# hysteresis: dwell times and toggle budget across cycles
+		'engine': charging_decision.DecisionEngine(),
+	}
+	return state
 
 #======================================
 if __name__ == '__main__':
 	args = parse_args()
-	count = 0
-	last_hour = -2
 	refreshTime = args.refresh_seconds
-	wemo_plugs = []
 	if args.wemo_ips:
 		wemo_ip_addresses = args.wemo_ips
 	else:
 		wemo_ip_addresses = wemoIpAddresses
 	if args.debug_wemo is True:
 		print(CL.colorString("WeMo debug mode enabled", "cyan"))
-	for ipaddress in wemo_ip_addresses:
-		wemo_plug = ComedSmartWemoPlug(ipaddress, debug_wemo=args.debug_wemo)
-		wemo_plugs.append(wemo_plug)
+	wemo_plugs = connect_plugs(wemo_ip_addresses, args.debug_wemo)
 	comlib = comedlib.ComedLib()
 	comlib.msg = False
-
-	while(True):
-		if count > 0:
-			factor = (math.sqrt(random.random()) + math.sqrt(random.random()))/1.414
-			sleepTime = refreshTime*factor
-			#print "Sleep %d seconds"%(sleepTime)
+	comlib.useArchive = True
+	if args.charge_kwh is not None:
+		# sleep until the plan next switches instead of polling prices
+		plan_state = new_plan_state()
+		while(True):
+			sleepTime = run_plan_cycle(wemo_plugs, comlib, plan_state, args.charge_kwh,
+				args.charge_kw, args.ready_by)
 			time.sleep(sleepTime)
-		count += 1
-		# reconnect every ~15 min to guard against stale TCP connections
-		if count % 5 == 0:
-			for plug in wemo_plugs:
-				plug.connectToWemo()
-		now = datetime.datetime.now()
-		hour = now.hour
-		if hour != last_hour:
-			print('============== new hour ==')
-		last_hour = hour
-
-		### always enable before 5AM
-		#if hour < 5:
-		#	for plug in wemo_plugs:
-		#		plug.enable()
-		#	continue
-
-		### special condition where it is assumed to be a high price
-		if hour in badHours:
-			if now.minute < 20:
-				mystr = "charging disabled, bad hour, sleep until %d:20"%(hour)
-				print(CL.colorString(mystr, "red"))
-				for plug in wemo_plugs:
-					plug.disable()
-				minutesToSleep = 20 - now.minute - 2
-				sleepTime = minutesToSleep*60
-				if sleepTime > 0:
-					time.sleep(sleepTime)
-				continue
-		else:
-			#print "good hour %d"%(hour)
-			pass
-
-		is_always_cheap, recent_rate = _is_always_cheap(comlib)
-		if is_always_cheap:
-			timestr = "%02d:%02d"%(now.hour, now.minute)
-			msg = "%s: charging +enabled ( recent %.2f | always cheap < 1.00 c/kWh )"%(timestr, recent_rate)
-			_apply_action(wemo_plugs, "enable", msg)
-			continue
-
-		current_rate, predict_rate, cutoff = _compute_rates(comlib)
-		action, msg = _decision(now, current_rate, predict_rate, cutoff)
-		_apply_action(wemo_plugs, action, msg)
 
-		if action == "disable_long":
-			minutesToSleep = 60 - now.minute - 2
-			sleepTime = minutesToSleep*60
-			if sleepTime > 0:
-				time.sleep(sleepTime)
+	# scripts/energy_supervisor.py runs the same cycle as a scheduled task
+	state = new_cycle_state()
+	last_price_seconds = None
+	while(True):
+		hold_seconds = run_cycle(wemo_plugs, comlib, state)
+		if hold_seconds > 0:
+			time.sleep(hold_seconds)
+			last_price_seconds = None
 			continue
+		# re-evaluate when ComEd publishes the next 5-minute price (at once
+		# when the shared feed is republished), not on a random timer
+		last_price_seconds = comlib.waitForNewPrice(last_price_seconds, max_wait_seconds=refreshTime)
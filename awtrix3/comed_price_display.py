@@ -11,7 +11,6 @@ import argparse
 import yaml
 import numpy
 import colorsys
-import requests
 
 # Local Repo Modules
 # Ensure energylib is importable when running this file directly.
@@ -21,6 +20,7 @@ if REPO_ROOT not in sys.path:
 
 import icon_draw
 from energylib import comedlib
+from energylib import httpclient
 
 #============================================
 # Treat data older than this as unknown for display purposes.
@@ -100,14 +100,15 @@ def get_current_price() -> float:
 	return price, trend
 
 #============================================
-def compile_comed_price_data():
+def compile_comed_price_data(comed: comedlib.ComedLib = None):
 	"""
 	Compile the electricity price to a data dict
 
 	Args:
-		price (float): The electricity price in cents.
+		comed (ComedLib): shared ComedLib instance; a new one when None.
 	"""
-	comed = comedlib.ComedLib()
+	if comed is None:
+		comed = comedlib.ComedLib()
 	now_seconds = time.time()
 	data = comed.downloadComedJsonData()
 	price = None
@@ -258,7 +259,7 @@ def send_to_awtrix(app_data: dict) -> bool:
 	url = f"http://{ip}/api/custom?name={app_name}"
 
 	print(f"Sending to AWTRIX at {ip}...")
-	response = requests.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
+	response = httpclient.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
 
 	if response.status_code == 200:
 		print(f"  Sent successfully: {app_data.get('text', '')}")
@@ -2,12 +2,20 @@
 
 # Standard Library
 import os
+import sys
 import argparse
 from datetime import datetime
 
 # PIP3 modules
 import yaml
-import requests
+
+# Local Repo Modules
+# Ensure energylib is importable when running this file directly.
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+from energylib import httpclient
 
 #============================================
 def get_date_data():
@@ -144,7 +152,7 @@ def send_to_awtrix(app_data: dict) -> bool:
 	url = f"http://{ip}/api/custom?name={app_name}"
 
 	print(f"Sending to AWTRIX at {ip}...")
-	response = requests.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
+	response = httpclient.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
 
 	if response.status_code == 200:
 		print("  Sent successfully: DateDisplay")
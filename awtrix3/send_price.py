@@ -2,15 +2,21 @@
 
 # Standard Library
 import os
+import sys
 import time
 import random
 
 #pypi libraries
 import yaml
-import requests
 from requests.auth import HTTPBasicAuth
 
 # Local Repo Modules
+# Ensure energylib is importable when running this file directly.
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+from energylib import httpclient
 # AWTRIX apps are built as local payload generators.
 import solar_display
 import comed_price_display
@@ -38,7 +44,7 @@ def get_active_awtrix_apps():
 	url = f"http://{ip}/api/loop"
 
 	try:
-		response = requests.get(url, auth=HTTPBasicAuth(username, password))
+		response = httpclient.get(url, auth=HTTPBasicAuth(username, password))
 
 		if response.status_code == 200:
 				apps = response.json()  # Convert response to dictionary
@@ -83,16 +89,19 @@ def send_to_awtrix(app_data: dict):
 		print(f"  TEXT: '{app_data.get('text', '')}'")
 	except AttributeError:
 		pass
-	response = requests.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
+	response = httpclient.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
 
 	# Print response for debugging
 	print(response.status_code, response.text)
 	time.sleep(1.0 + random.random())
 
 #============================================
-def main():
+def main(comlib=None):
 	"""
 	Main function to fetch and send electricity pricing, solar data, and date info to AWTRIX.
+
+	Args:
+		comlib: ComedLib shared with other jobs (see scripts/energy_supervisor.py).
 	"""
 
 	# Fetch solar energy data (current and total) and add them to the list
@@ -102,7 +111,7 @@ def main():
 	#send_to_awtrix(total_data)
 
 	# Fetch the latest electricity price data and add to the list
-	comed_data_dict = comed_price_display.compile_comed_price_data()
+	comed_data_dict = comed_price_display.compile_comed_price_data(comlib)
 	send_to_awtrix(comed_data_dict)
 
 	# Fetch formatted date data (e.g., "Sat Feb 22") and send to AWTRIX
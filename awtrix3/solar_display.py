@@ -7,7 +7,6 @@ import argparse
 
 # PIP3 modules
 import yaml
-import requests
 
 # Local Repo Modules
 # Ensure energylib is importable when running this file directly.
@@ -17,6 +16,7 @@ if REPO_ROOT not in sys.path:
 
 import icon_draw
 import sun_location
+from energylib import httpclient
 from energylib import solarProduction
 
 
@@ -155,7 +155,7 @@ def send_to_awtrix(app_data: dict) -> bool:
 	url = f"http://{ip}/api/custom?name={app_name}"
 
 	print(f"Sending to AWTRIX at {ip}...")
-	response = requests.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
+	response = httpclient.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
 
 	if response.status_code == 200:
 		print(f"  Sent successfully: {app_data.get('text', '')}")
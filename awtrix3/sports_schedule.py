@@ -7,6 +7,7 @@ Fetches next game times from ESPN/Ergast APIs and displays a compact day/time to
 
 # Standard Library
 import os
+import sys
 import time
 import random
 import argparse
@@ -15,10 +16,15 @@ from datetime import datetime
 # PIP3 modules
 import yaml
 import colorsys
-import requests
 import tabulate
 
 # Local repo modules
+# Ensure energylib is importable when running this file directly.
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+from energylib import httpclient
 import icon_draw
 
 #============================================
@@ -272,7 +278,7 @@ def fetch_espn_next_game(league: str, team_id: str) -> dict:
 	# Add delay to avoid overloading server
 	time.sleep(random.random())
 
-	response = requests.get(url, timeout=10)
+	response = httpclient.get(url, timeout=10)
 	if response.status_code != 200:
 		print(f"ESPN API error {response.status_code} for {team_id} in {league}")
 		return None
@@ -344,7 +350,7 @@ def fetch_espn_next_league_event(league: str) -> dict:
 
 	time.sleep(random.random())
 
-	response = requests.get(url, timeout=10)
+	response = httpclient.get(url, timeout=10)
 	if response.status_code != 200:
 		print(f"ESPN API error {response.status_code} for league {league}")
 		return None
@@ -425,7 +431,7 @@ def fetch_f1_next_race() -> dict:
 
 	time.sleep(random.random())
 
-	response = requests.get(url, timeout=10)
+	response = httpclient.get(url, timeout=10)
 	if response.status_code != 200:
 		print(f"Ergast API error {response.status_code}")
 		return None
@@ -1130,7 +1136,7 @@ def send_to_awtrix(app_data) -> bool:
 	url = f"http://{ip}/api/custom?name={app_name}"
 
 	print(f"Sending to AWTRIX at {ip}...")
-	response = requests.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
+	response = httpclient.post(url, json=app_data, auth=HTTPBasicAuth(username, password))
 
 	if response.status_code == 200:
 		print(f"  Sent successfully: {app_data.get('text', '')}")
@@ -0,0 +1,184 @@
+"""
+Plan flexible loads into the cheapest hours of a price schedule.
+
+Given hourly prices (normally ComEd's day-ahead prices, see
+ComedLib.getDayAheadPrices()) and an energy need such as "10 kWh at 1.4 kW
+before 7:00", plan_cheapest_hours() sorts the eligible hours by price once
+and takes the shortest prefix whose cumulative run time covers the need,
+so planning a day is a sort and a prefix sum. cheapest_window() finds the
+cheapest run of consecutive hours with a sliding prefix-sum difference, for
+loads that cannot be split.
+
+Plans are plain dictionaries with the charging intervals as Unix times;
+plan_is_active() and next_change_seconds() let a controller sleep until
+the plan says to switch instead of polling prices, and planned_on_seconds()
+tells it how much of the need a plan has already delivered when it re-plans.
+"""
+
+# Standard Library
+import time
+# PIP modules
+import numpy
+
+#============================================
+def hourly_schedule(hour_start_seconds, prices, start_seconds: float, end_seconds: float,
+		fallback_price=None) -> dict:
+	"""
+	Lay the known prices onto every hour between start and end.
+
+	Args:
+		hour_start_seconds: Unix time of the start of each priced hour.
+		prices: price of each hour in cents per kWh.
+		start_seconds: planning start, usually now.
+		end_seconds: deadline.
+		fallback_price: price assumed for hours without a known price, either
+			one price or 24 prices indexed by local hour of day; those hours
+			are left out when None.
+
+	Returns:
+		dict: 'hour_start', 'price', 'available_seconds' (part of the hour
+			inside [start, end)) and 'estimated' (True where fallback_price
+			was used), one entry per hour.
+	"""
+	known = {int(hour): float(price) for hour, price in zip(numpy.asarray(hour_start_seconds).tolist(),
+		numpy.asarray(prices).tolist())}
+	first_hour = int(start_seconds // 3600) * 3600
+	hour_start = numpy.arange(first_hour, end_seconds, 3600, dtype=numpy.int64)
+	available = numpy.minimum(hour_start + 3600, end_seconds) - numpy.maximum(hour_start, start_seconds)
+	available = numpy.maximum(available, 0.0)
+	price = numpy.array([known.get(int(hour), numpy.nan) for hour in hour_start], dtype=numpy.float64)
+	estimated = numpy.isnan(price)
+	if fallback_price is None:
+		available = numpy.where(estimated, 0.0, available)
+		price = numpy.where(estimated, numpy.inf, price)
+	else:
+		fallback = numpy.asarray(fallback_price, dtype=numpy.float64)
+		if fallback.ndim == 0:
+			price = numpy.where(estimated, float(fallback), price)
+		else:
+			# unknown hours follow the daily shape, not one flat price
+			for index in numpy.flatnonzero(estimated).tolist():
+				price[index] = fallback[time.localtime(int(hour_start[index])).tm_hour]
+	schedule = {
+		'hour_start': hour_start,
+		'price': price,
+		'available_seconds': available,
+		'estimated': estimated,
+	}
+	return schedule
+
+#============================================
+def plan_cheapest_hours(hour_start_seconds, prices, energy_kwh: float, power_kw: float,
+		start_seconds: float, end_seconds: float, fallback_price=None) -> dict:
+	"""
+	Choose the cheapest hours that deliver energy_kwh before end_seconds.
+
+	Hours are taken cheapest first (earlier first among equal prices); the
+	last hour taken is only used for the minutes still needed. Each chosen
+	hour runs from its start, or from start_seconds for the current hour.
+
+	Args:
+		hour_start_seconds: Unix time of the start of each priced hour.
+		prices: price of each hour in cents per kWh.
+		energy_kwh: energy to deliver.
+		power_kw: power drawn while on.
+		start_seconds: planning start, usually now.
+		end_seconds: deadline.
+		fallback_price: price assumed for hours without a known price; see
+			hourly_schedule().
+
+	Returns:
+		dict: 'intervals' (list of (begin, end) Unix times, merged and in
+			order), 'energy_kwh', 'cost_cents', 'average_price',
+			'shortfall_kwh' (energy that does not fit before the deadline) and
+			'estimated_hours' (chosen hours priced with fallback_price).
+	"""
+	if power_kw <= 0:
+		raise ValueError(f"power_kw must be positive, not {power_kw}")
+	schedule = hourly_schedule(hour_start_seconds, prices, start_seconds, end_seconds, fallback_price)
+	needed_seconds = max(energy_kwh, 0.0) / power_kw * 3600.0
+	order = numpy.argsort(schedule['price'], kind='stable')
+	cumulative = numpy.cumsum(schedule['available_seconds'][order])
+	on_seconds = numpy.zeros(len(order))
+	if needed_seconds > 0 and len(order) > 0:
+		# shortest prefix of the sorted hours that covers the need
+		taken = min(int(numpy.searchsorted(cumulative, needed_seconds, side='left')) + 1, len(order))
+		on_seconds[order[:taken]] = schedule['available_seconds'][order[:taken]]
+		if cumulative[taken - 1] > needed_seconds:
+			on_seconds[order[taken - 1]] -= cumulative[taken - 1] - needed_seconds
+
+	chosen = numpy.flatnonzero(on_seconds > 0)
+	begins = numpy.maximum(schedule['hour_start'][chosen], start_seconds)
+	intervals = []
+	for begin, seconds in zip(begins.tolist(), on_seconds[chosen].tolist()):
+		if intervals and abs(intervals[-1][1] - begin) < 1e-6:
+			intervals[-1] = (intervals[-1][0], begin + seconds)
+		else:
+			intervals.append((begin, begin + seconds))
+	energy = float(on_seconds.sum() / 3600.0 * power_kw)
+	cost = float((on_seconds[chosen] / 3600.0 * power_kw * schedule['price'][chosen]).sum())
+	plan = {
+		'intervals': intervals,
+		'energy_kwh': energy,
+		'cost_cents': cost,
+		'average_price': cost / energy if energy > 0 else None,
+		'shortfall_kwh': max(energy_kwh - energy, 0.0),
+		'estimated_hours': int(schedule['estimated'][chosen].sum()),
+	}
+	return plan
+
+#============================================
+def cheapest_window(hour_start_seconds, prices, hours_needed: int) -> tuple | None:
+	"""
+	Find the cheapest run of consecutive priced hours.
+
+	Args:
+		hour_start_seconds: Unix time of the start of each hour, consecutive
+			and oldest first.
+		prices: price of each hour in cents per kWh.
+		hours_needed: length of the run in whole hours.
+
+	Returns:
+		tuple: (start_seconds, average_price) of the cheapest run, or None when
+			there are fewer than hours_needed hours.
+	"""
+	prices = numpy.asarray(prices, dtype=numpy.float64)
+	if hours_needed < 1 or len(prices) < hours_needed:
+		return None
+	prefix = numpy.concatenate(([0.0], numpy.cumsum(prices)))
+	window_sums = prefix[hours_needed:] - prefix[:-hours_needed]
+	best = int(numpy.argmin(window_sums))
+	window = (float(numpy.asarray(hour_start_seconds)[best]), float(window_sums[best] / hours_needed))
+	return window
+
+#============================================
+def plan_is_active(plan: dict, now_seconds: float) -> bool:
+	"""
+	Return True when the plan has the load on at now_seconds.
+	"""
+	for begin, end in plan['intervals']:
+		if begin <= now_seconds < end:
+			return True
+	return False
+
+#============================================
+def planned_on_seconds(plan: dict, start_seconds: float, end_seconds: float) -> float:
+	"""
+	Return how many seconds the plan has the load on between start and end.
+	"""
+	total = 0.0
+	for begin, end in plan['intervals']:
+		total += max(min(end, end_seconds) - max(begin, start_seconds), 0.0)
+	return total
+
+#============================================
+def next_change_seconds(plan: dict, now_seconds: float) -> float | None:
+	"""
+	Return the next time the plan switches the load on or off, or None.
+	"""
+	for begin, end in plan['intervals']:
+		if now_seconds < begin:
+			return begin
+		if now_seconds < end:
+			return end
+	return None
@@ -0,0 +1,283 @@
+"""
+Price-based load decisions shared by the live controllers and the backtester.
+
+The rules are the ones apps/wemoPlug-comed-multi.py has always used (see
+docs/wemoPlug-comed-multi.md) and the battery arbitrage comparison from
+battery_arbitrage/main_arbitrage.py. Every function works on scalars for the
+live loop and element-wise on numpy arrays, so a backtest can evaluate all
+time steps and all parameter combinations in one call.
+
+DecisionEngine wraps decide() for the live loop with state kept across
+ticks: a minimum dwell time after each toggle and a toggle budget per hour,
+so a predicted price hovering at the cutoff no longer flips the plugs every
+few minutes.
+"""
+
+# Standard Library
+import collections
+
+# PIP modules
+import numpy
+
+#============================================
+# default thresholds in cents per kWh, used by the WeMo plug controller
+DEFAULT_PARAMS = {
+	# always start charge below this value
+	'lower_bound': 2.8,
+	# always stop charge above this value
+	'upper_bound': 7.2,
+	# small bias to make the cutoff slightly more permissive or strict
+	'cutoff_adjust': -0.8,
+	# deadband around the cutoff to reduce churn
+	'buffer_rate': 0.5,
+}
+
+# recent 5-minute price below which the plug is always enabled
+ALWAYS_CHEAP_RATE = 1.0
+
+# action codes returned by decide_array(); decide() returns the names
+UNCHANGED = 0
+ENABLE = 1
+DISABLE = 2
+DISABLE_LONG = 3
+ACTION_NAMES = ('unchanged', 'enable', 'disable', 'disable_long')
+
+# DecisionEngine defaults: a toggle holds for the dwell time, and at most
+# max_toggles_per_hour toggles happen in any 60 minutes
+DEFAULT_ENGINE_PARAMS = {
+	'min_on_seconds': 600.0,
+	'min_off_seconds': 600.0,
+	'max_toggles_per_hour': 4,
+}
+
+# battery action codes returned by battery_action_array()
+BATTERY_OFF = 0
+BATTERY_CHARGE = 1
+BATTERY_DISCHARGE = 2
+BATTERY_ACTION_NAMES = ('off', 'charge', 'discharge')
+
+#============================================
+def bound_cutoff(cutoff, lower_bound, upper_bound, cutoff_adjust):
+	"""
+	Clamp the reasonable cutoff to the bounds, then apply the bias.
+
+	Args:
+		cutoff: cutoff from comedlib.reasonableCutOff().
+		lower_bound: lowest allowed cutoff before the bias.
+		upper_bound: highest allowed cutoff before the bias.
+		cutoff_adjust: bias added after clamping.
+
+	Returns:
+		float or numpy.ndarray: bounded cutoff.
+	"""
+	bounded = numpy.minimum(numpy.maximum(cutoff, lower_bound), upper_bound) + cutoff_adjust
+	if numpy.ndim(bounded) == 0:
+		return float(bounded)
+	return bounded
+
+#============================================
+def decide_array(minute, predict_rate, cutoff, lower_bound, upper_bound, buffer_rate):
+	"""
+	Vectorized plug decision; the first matching rule wins.
+
+	1. predicted price above twice the cutoff after :20 -> DISABLE_LONG
+	2. predicted price below lower_bound -> ENABLE
+	3. predicted price above cutoff + buffer_rate -> DISABLE
+	4. predicted price above upper_bound -> DISABLE
+	5. predicted price below cutoff - buffer_rate -> ENABLE
+	6. otherwise -> UNCHANGED
+
+	All arguments broadcast against each other, so time-step arrays of shape
+	(N,) combine with parameter columns of shape (P, 1) into a (P, N) result.
+
+	Args:
+		minute: local minute of the hour.
+		predict_rate: predicted hourly price.
+		cutoff: bounded cutoff from bound_cutoff().
+		lower_bound: always-enable price.
+		upper_bound: always-disable price.
+		buffer_rate: deadband around the cutoff.
+
+	Returns:
+		numpy.ndarray: int8 action codes.
+	"""
+	conditions = [
+		(predict_rate > 2.0 * cutoff) & (minute > 20),
+		predict_rate < lower_bound,
+		predict_rate > cutoff + buffer_rate,
+		predict_rate > upper_bound,
+		predict_rate < cutoff - buffer_rate,
+	]
+	choices = [DISABLE_LONG, ENABLE, DISABLE, DISABLE, ENABLE]
+	actions = numpy.select(conditions, choices, default=UNCHANGED).astype(numpy.int8)
+	return actions
+
+#============================================
+def decide(minute: int, predict_rate: float, cutoff: float, lower_bound: float,
+		upper_bound: float, buffer_rate: float) -> str:
+	"""
+	Scalar plug decision for the live loop; see decide_array() for the rules.
+
+	Returns:
+		str: 'enable', 'disable', 'disable_long' or 'unchanged'.
+	"""
+	code = decide_array(minute, predict_rate, cutoff, lower_bound, upper_bound, buffer_rate)
+	action = ACTION_NAMES[int(code)]
+	return action
+
+#============================================
+class DecisionEngine(object):
+	"""
+	Stateful plug decisions with minimum dwell times and a toggle budget.
+
+	decide() applies the same rules as the stateless decide() and then holds
+	a toggle back ('unchanged') while the plugs are within their minimum
+	on or off time, or when the last hour's toggle budget is spent. A
+	'disable_long' (price above twice the cutoff) and forced actions always
+	go through.
+	"""
+
+	def __init__(self, params: dict = None, min_on_seconds: float = None,
+			min_off_seconds: float = None, max_toggles_per_hour: int = None):
+		"""
+		Args:
+			params: thresholds like DEFAULT_PARAMS; missing keys use the defaults.
+			min_on_seconds: shortest time plugs stay on after being enabled.
+			min_off_seconds: shortest time plugs stay off after being disabled.
+			max_toggles_per_hour: most toggles allowed in any 3600 seconds.
+		"""
+		self.params = dict(DEFAULT_PARAMS)
+		if params is not None:
+			self.params.update(params)
+		if min_on_seconds is None:
+			min_on_seconds = DEFAULT_ENGINE_PARAMS['min_on_seconds']
+		if min_off_seconds is None:
+			min_off_seconds = DEFAULT_ENGINE_PARAMS['min_off_seconds']
+		if max_toggles_per_hour is None:
+			max_toggles_per_hour = DEFAULT_ENGINE_PARAMS['max_toggles_per_hour']
+		self.min_on_seconds = min_on_seconds
+		self.min_off_seconds = min_off_seconds
+		self.max_toggles_per_hour = max_toggles_per_hour
+		self.is_on = None  # unknown until the first enable or disable
+		self.last_action = None
+		self.last_reason = None
+		self.last_toggle = None
+		self.toggle_times = collections.deque()
+		self.counts = {'decisions': 0, 'toggles': 0, 'forced_toggles': 0, 'held_dwell': 0, 'held_budget': 0}
+
+	#============================================
+	def decide(self, now_seconds: float, minute: int, predict_rate: float, cutoff: float) -> str:
+		"""
+		Decide from the predicted price, then apply dwell time and budget.
+
+		Args:
+			now_seconds: Unix time of the tick.
+			minute: local minute of the hour.
+			predict_rate: predicted hourly price.
+			cutoff: bounded cutoff from bound_cutoff().
+
+		Returns:
+			str: 'enable', 'disable', 'disable_long' or 'unchanged'.
+		"""
+		action = decide(minute, predict_rate, cutoff, self.params['lower_bound'],
+			self.params['upper_bound'], self.params['buffer_rate'])
+		return self.apply(action, now_seconds)
+
+	#============================================
+	def apply(self, action: str, now_seconds: float, force: bool = False) -> str:
+		"""
+		Filter a wanted action through the dwell time and toggle budget.
+
+		Callers with their own rules (always-cheap prices, bad hours) pass
+		their action here too, with force=True, so every toggle is counted.
+
+		Args:
+			action: 'enable', 'disable', 'disable_long' or 'unchanged'.
+			now_seconds: Unix time of the tick.
+			force: skip the dwell time and toggle budget.
+
+		Returns:
+			str: the action to carry out; 'unchanged' when held back.
+		"""
+		self.counts['decisions'] += 1
+		self._forget(now_seconds)
+		if action == 'unchanged':
+			return self._result(action, 'rule')
+		turn_on = action == 'enable'
+		if self.is_on is None or self.is_on == turn_on:
+			# first decision, or confirming the current state: not a toggle
+			if self.is_on is None:
+				self.last_toggle = now_seconds
+			self.is_on = turn_on
+			return self._result(action, 'rule')
+		if not force and action != 'disable_long':
+			dwell = self.min_on_seconds if self.is_on else self.min_off_seconds
+			if now_seconds - self.last_toggle < dwell:
+				self.counts['held_dwell'] += 1
+				return self._result('unchanged', 'dwell')
+			if len(self.toggle_times) >= self.max_toggles_per_hour:
+				self.counts['held_budget'] += 1
+				return self._result('unchanged', 'budget')
+		self.is_on = turn_on
+		self.last_toggle = now_seconds
+		self.toggle_times.append(now_seconds)
+		self.counts['toggles'] += 1
+		if force or action == 'disable_long':
+			self.counts['forced_toggles'] += 1
+			return self._result(action, 'forced')
+		return self._result(action, 'toggle')
+
+	#============================================
+	def _forget(self, now_seconds: float) -> None:
+		"""
+		Drop toggles older than an hour from the budget window.
+		"""
+		while self.toggle_times and now_seconds - self.toggle_times[0] >= 3600.0:
+			self.toggle_times.popleft()
+
+	#============================================
+	def _result(self, action: str, reason: str) -> str:
+		self.last_action = action
+		self.last_reason = reason
+		return action
+
+	#============================================
+	def metrics(self, now_seconds: float) -> dict:
+		"""
+		Return decision counters and the current hysteresis state.
+		"""
+		self._forget(now_seconds)
+		metrics = dict(self.counts)
+		metrics['is_on'] = self.is_on
+		metrics['last_action'] = self.last_action
+		metrics['last_reason'] = self.last_reason
+		metrics['toggles_last_hour'] = len(self.toggle_times)
+		metrics['seconds_since_toggle'] = None
+		if self.last_toggle is not None:
+			metrics['seconds_since_toggle'] = now_seconds - self.last_toggle
+		return metrics
+
+#============================================
+def battery_action_array(predict_rate, median, cutoff, fudge_factor):
+	"""
+	Vectorized battery arbitrage decision.
+
+	Discharge when the predicted price is above both the median and the cutoff
+	by more than fudge_factor, charge when it is below both by more than
+	fudge_factor, otherwise stay off.
+
+	Args:
+		predict_rate: predicted hourly price.
+		median: 24 hour median price.
+		cutoff: reasonable cutoff price.
+		fudge_factor: required margin in cents.
+
+	Returns:
+		numpy.ndarray: int8 battery action codes.
+	"""
+	upper = numpy.maximum(median, cutoff) + fudge_factor
+	lower = numpy.minimum(median, cutoff) - fudge_factor
+	actions = numpy.select(
+		[predict_rate > upper, predict_rate < lower],
+		[BATTERY_DISCHARGE, BATTERY_CHARGE], default=BATTERY_OFF).astype(numpy.int8)
+	return actions
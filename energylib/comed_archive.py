@@ -0,0 +1,166 @@
+"""
+Durable archive of every ComEd 5-minute price sample.
+
+Samples are stored in a SQLite table keyed on the UTC timestamp, so writes
+are append-only and idempotent (re-archiving an overlapping download is a
+no-op) and any time range is an index scan. Queries return numpy columns
+oldest first, ready for backtests and multi-week statistics.
+"""
+
+# Standard Library
+import os
+import sqlite3
+import contextlib
+
+# PIP modules
+import numpy
+
+#============================================
+# /var/lib/energy is shared by all users on the house server; fall back to home
+if os.path.isdir("/var/lib/energy"):
+	DEFAULT_ARCHIVE_FILE = "/var/lib/energy/comed_archive.sqlite3"
+else:
+	DEFAULT_ARCHIVE_FILE = os.path.join(os.path.expanduser("~"), ".energy", "comed_archive.sqlite3")
+
+# seconds a writer waits for another process holding the write lock
+BUSY_TIMEOUT_SECONDS = 10.0
+
+#============================================
+def open_archive(archive_file: str = DEFAULT_ARCHIVE_FILE) -> sqlite3.Connection:
+	"""
+	Open the archive, creating the file and table on first use.
+
+	Args:
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		sqlite3.Connection: open connection; the caller closes it.
+	"""
+	archive_dir = os.path.dirname(archive_file)
+	if archive_dir:
+		os.makedirs(archive_dir, exist_ok=True)
+	connection = sqlite3.connect(archive_file, timeout=BUSY_TIMEOUT_SECONDS)
+	# WAL lets readers (dashboard, backtests) run while the fetcher appends
+	connection.execute("PRAGMA journal_mode=WAL")
+	connection.execute(
+		"CREATE TABLE IF NOT EXISTS prices ("
+		" millis_utc INTEGER PRIMARY KEY,"
+		" price REAL NOT NULL"
+		") WITHOUT ROWID")
+	return connection
+
+#============================================
+def append_samples(millis: numpy.ndarray, prices: numpy.ndarray,
+		archive_file: str = DEFAULT_ARCHIVE_FILE) -> int:
+	"""
+	Append price samples, ignoring timestamps already archived.
+
+	Args:
+		millis: UTC timestamps in milliseconds, any order.
+		prices: prices in cents per kWh, same order as millis.
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		int: number of new samples written.
+	"""
+	rows = zip(numpy.asarray(millis, dtype=numpy.int64).tolist(),
+		numpy.asarray(prices, dtype=numpy.float64).tolist())
+	with contextlib.closing(open_archive(archive_file)) as connection:
+		before = connection.total_changes
+		with connection:
+			connection.executemany("INSERT OR IGNORE INTO prices (millis_utc, price) VALUES (?, ?)", rows)
+		written = connection.total_changes - before
+	return written
+
+#============================================
+def query_range(start_millis: int = None, end_millis: int = None,
+		archive_file: str = DEFAULT_ARCHIVE_FILE) -> tuple:
+	"""
+	Return archived samples with start_millis <= millisUTC < end_millis.
+
+	Args:
+		start_millis: inclusive lower bound, or None for the oldest sample.
+		end_millis: exclusive upper bound, or None for the newest sample.
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		tuple: (millis, prices) int64 and float64 arrays, oldest first.
+	"""
+	if start_millis is None:
+		start_millis = numpy.iinfo(numpy.int64).min
+	if end_millis is None:
+		end_millis = numpy.iinfo(numpy.int64).max
+	with contextlib.closing(open_archive(archive_file)) as connection:
+		rows = connection.execute(
+			"SELECT millis_utc, price FROM prices"
+			" WHERE millis_utc >= ? AND millis_utc < ? ORDER BY millis_utc",
+			(int(start_millis), int(end_millis))).fetchall()
+	millis = numpy.fromiter((row[0] for row in rows), dtype=numpy.int64, count=len(rows))
+	prices = numpy.fromiter((row[1] for row in rows), dtype=numpy.float64, count=len(rows))
+	return (millis, prices)
+
+#============================================
+def newest_millis(archive_file: str = DEFAULT_ARCHIVE_FILE) -> int | None:
+	"""
+	Return the newest archived timestamp.
+
+	Args:
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		int: newest millisUTC, or None when the archive is empty.
+	"""
+	with contextlib.closing(open_archive(archive_file)) as connection:
+		row = connection.execute("SELECT MAX(millis_utc) FROM prices").fetchone()
+	return row[0]
+
+#============================================
+def range_summary(start_millis: int, end_millis: int,
+		archive_file: str = DEFAULT_ARCHIVE_FILE) -> tuple:
+	"""
+	Return how much of a time range is already archived.
+
+	Args:
+		start_millis: inclusive lower bound.
+		end_millis: exclusive upper bound.
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		tuple: (count, oldest_millis, newest_millis); the timestamps are None
+			when the range holds no samples.
+	"""
+	with contextlib.closing(open_archive(archive_file)) as connection:
+		row = connection.execute(
+			"SELECT COUNT(*), MIN(millis_utc), MAX(millis_utc) FROM prices"
+			" WHERE millis_utc >= ? AND millis_utc < ?",
+			(int(start_millis), int(end_millis))).fetchone()
+	return (row[0], row[1], row[2])
+
+#============================================
+def missing_ranges(start_millis: int, end_millis: int, step_millis: int,
+		archive_file: str = DEFAULT_ARCHIVE_FILE) -> list:
+	"""
+	Return the gaps in the archive within a time range.
+
+	A gap is any stretch longer than 1.5 sample steps without an archived
+	sample, including before the first and after the last sample.
+
+	Args:
+		start_millis: inclusive lower bound.
+		end_millis: exclusive upper bound.
+		step_millis: expected spacing of the samples.
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		list: (start_millis, end_millis) half-open gaps, oldest first.
+	"""
+	millis, _prices = query_range(start_millis, end_millis, archive_file)
+	# virtual neighbours one step before the range and at its end
+	bounds = numpy.concatenate(([start_millis - step_millis], millis, [end_millis]))
+	gap_after = numpy.flatnonzero(numpy.diff(bounds) > 1.5 * step_millis)
+	gaps = []
+	for index in gap_after.tolist():
+		begin = max(int(bounds[index]) + 1, start_millis)
+		end = min(int(bounds[index + 1]), end_millis)
+		gaps.append((begin, end))
+	return gaps
@@ -0,0 +1,368 @@
+"""
+Vectorized replay of the price-based controllers over archived ComEd prices.
+
+build_features() turns an archived price history (oldest first) into the
+inputs the live controllers see after every 5-minute sample: the predicted
+hourly rate of ComedLib.getPredictedRate(), the trailing 24 hour median and
+std of ComedLib.getMedianComedRate(), and comedlib.reasonableCutOff().
+simulate_plug() and simulate_battery() then apply the shared rules from
+energylib/charging_decision.py to every time step and every parameter
+combination at once, and report energy, cost and toggle counts.
+
+Each archived sample is one decision tick. The live WeMo loop polls every
+~3 minutes, but its inputs only change when a new sample is published.
+"""
+
+# Standard Library
+import itertools
+
+# PIP modules
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+# local repo modules
+from energylib import comedlib
+from energylib import comed_forecast
+from energylib import charging_decision
+
+#============================================
+# length of one 5-minute price interval in hours
+SAMPLE_HOURS = 5.0 / 60.0
+# the live median and std come from the 24 hour feed: 288 five-minute samples
+MEDIAN_WINDOW = 288
+# rows per percentile chunk and parameter combinations per simulation chunk,
+# which bound the size of the temporary arrays
+PERCENTILE_CHUNK_ROWS = 8192
+PARAM_CHUNK = 64
+
+#============================================
+def local_time_fields(millis: numpy.ndarray) -> dict:
+	"""
+	Split UTC timestamps into local clock fields.
+
+	Args:
+		millis: UTC timestamps in milliseconds.
+
+	Returns:
+		dict: int64 arrays 'hour_id' (hours since the local epoch), 'hour',
+			'minute' and 'weekday' (Monday is 0).
+	"""
+	local_seconds = comedlib.localSeconds(millis)
+	hour_id = local_seconds // 3600
+	fields = {
+		'hour_id': hour_id,
+		'hour': hour_id % 24,
+		'minute': (local_seconds % 3600) // 60,
+		# 1970-01-01 was a Thursday
+		'weekday': (local_seconds // 86400 + 3) % 7,
+	}
+	return fields
+
+#============================================
+def predicted_rates(prices: numpy.ndarray, hour_ids: numpy.ndarray) -> numpy.ndarray:
+	"""
+	Replay ComedLib.getPredictedRate() with the default forecaster after every sample.
+
+	Args:
+		prices: prices in cents per kWh, oldest first.
+		hour_ids: local hour id per sample (see local_time_fields()).
+
+	Returns:
+		numpy.ndarray: predicted rate after each sample.
+	"""
+	predicted = comed_forecast.HeuristicForecaster().predict_history(prices, hour_ids)
+	return predicted
+
+#============================================
+def trailing_median_std(prices: numpy.ndarray, window: int = MEDIAN_WINDOW) -> tuple:
+	"""
+	Replay ComedLib.getMedianComedRate() over a trailing sample window.
+
+	Args:
+		prices: prices in cents per kWh, oldest first.
+		window: samples per window.
+
+	Returns:
+		tuple: (median, std) arrays for the windows ending at samples
+			window-1 through the last; the median is the 75th percentile.
+	"""
+	views = sliding_window_view(numpy.asarray(prices, dtype=numpy.float64), window)
+	medians = numpy.empty(len(views))
+	stds = numpy.empty(len(views))
+	for first in range(0, len(views), PERCENTILE_CHUNK_ROWS):
+		chunk = views[first:first + PERCENTILE_CHUNK_ROWS]
+		medians[first:first + len(chunk)] = numpy.percentile(chunk, 75, axis=1)
+		stds[first:first + len(chunk)] = chunk.std(axis=1)
+	return medians, stds
+
+#============================================
+def build_features(millis: numpy.ndarray, prices: numpy.ndarray, window: int = MEDIAN_WINDOW,
+		forecaster=None) -> dict:
+	"""
+	Compute the live controller inputs after every sample.
+
+	The first window-1 samples only warm up the trailing statistics; the
+	returned arrays start at the first sample with a full window.
+
+	Args:
+		millis: UTC timestamps in milliseconds, oldest first.
+		prices: prices in cents per kWh, same order.
+		window: samples in the trailing median window.
+		forecaster: comed_forecast forecaster for 'predict', default the
+			live heuristic.
+
+	Returns:
+		dict: equal-length arrays 'millis', 'price', 'hour_id', 'hour',
+			'minute', 'weekday', 'predict', 'median', 'std', 'cutoff' and
+			'hour_mean_price' (the clock-hour average ComEd bills on).
+	"""
+	millis = numpy.asarray(millis, dtype=numpy.int64)
+	prices = numpy.asarray(prices, dtype=numpy.float64)
+	if len(prices) < window:
+		raise ValueError(f"need at least {window} samples, got {len(prices)}")
+	fields = local_time_fields(millis)
+	if forecaster is None:
+		forecaster = comed_forecast.HeuristicForecaster()
+	predicted = forecaster.predict_history(prices, fields['hour_id'])
+	median, std = trailing_median_std(prices, window)
+	hour_mean_price, _counts = comed_forecast.hour_average_targets(prices, fields['hour_id'])
+
+	first = window - 1
+	features = {
+		'millis': millis[first:],
+		'price': prices[first:],
+		'hour_id': fields['hour_id'][first:],
+		'hour': fields['hour'][first:],
+		'minute': fields['minute'][first:],
+		'weekday': fields['weekday'][first:],
+		'predict': predicted[first:],
+		'median': median,
+		'std': std,
+		'hour_mean_price': hour_mean_price[first:],
+	}
+	features['cutoff'] = comedlib.reasonableCutOff(median, std, features['hour'], features['weekday'])
+	return features
+
+#============================================
+def parameter_grid(**values) -> dict:
+	"""
+	Build the cartesian product of parameter values.
+
+	Parameters not given take their value from
+	charging_decision.DEFAULT_PARAMS.
+
+	Args:
+		**values: parameter name mapped to a list of values to try.
+
+	Returns:
+		dict: parameter name mapped to a 1-D array, one entry per combination.
+	"""
+	names = list(charging_decision.DEFAULT_PARAMS)
+	for name in values:
+		if name not in names:
+			raise ValueError(f"unknown parameter {name}")
+	axes = []
+	for name in names:
+		axes.append(list(values.get(name, [charging_decision.DEFAULT_PARAMS[name]])))
+	combos = numpy.array(list(itertools.product(*axes)), dtype=numpy.float64)
+	grid = {}
+	for column, name in enumerate(names):
+		grid[name] = combos[:, column]
+	return grid
+
+#============================================
+def _group_cumsum_rows(flags: numpy.ndarray, starts: numpy.ndarray) -> numpy.ndarray:
+	"""
+	Running sum along axis 1 that restarts at each group start.
+	"""
+	totals = numpy.cumsum(flags, axis=1)
+	padded = numpy.concatenate((numpy.zeros((flags.shape[0], 1), dtype=totals.dtype), totals), axis=1)
+	running = totals - padded[:, starts]
+	return running
+
+#============================================
+def plug_states(features: dict, params: dict) -> numpy.ndarray:
+	"""
+	Replay the WeMo plug controller for every parameter combination.
+
+	Per tick, as in the live loop: a disable_long earlier in the same clock
+	hour keeps the plug off (the live loop sleeps until the next hour), else
+	a recent price under charging_decision.ALWAYS_CHEAP_RATE enables, else
+	charging_decision.decide_array() decides. 'unchanged' keeps the previous
+	state; the plug starts off.
+
+	Args:
+		features: output of build_features().
+		params: equal-length parameter arrays, see parameter_grid().
+
+	Returns:
+		numpy.ndarray: (combinations, ticks) bool array, True when on.
+	"""
+	def column(name):
+		return numpy.asarray(params[name], dtype=numpy.float64)[:, None]
+	cutoff = charging_decision.bound_cutoff(features['cutoff'][None, :],
+		column('lower_bound'), column('upper_bound'), column('cutoff_adjust'))
+	actions = charging_decision.decide_array(features['minute'][None, :], features['predict'][None, :],
+		cutoff, column('lower_bound'), column('upper_bound'), column('buffer_rate'))
+	cheap = (features['price'] < charging_decision.ALWAYS_CHEAP_RATE)[None, :]
+
+	starts, _group_index, _counts = comed_forecast.group_layout(features['hour_id'])
+	long_flags = (actions == charging_decision.DISABLE_LONG) & ~cheap
+	# long disables strictly before this tick within the same hour
+	held_off = (_group_cumsum_rows(long_flags, starts) - long_flags) > 0
+	effective = numpy.where(cheap, charging_decision.ENABLE, actions)
+	effective = numpy.where(held_off, charging_decision.DISABLE, effective)
+
+	# forward-fill the last decisive action
+	ticks = numpy.arange(effective.shape[1])
+	decisive = effective != charging_decision.UNCHANGED
+	last_index = numpy.maximum.accumulate(numpy.where(decisive, ticks[None, :], -1), axis=1)
+	last_action = numpy.take_along_axis(effective, numpy.maximum(last_index, 0), axis=1)
+	states = (last_index >= 0) & (last_action == charging_decision.ENABLE)
+	return states
+
+#============================================
+def simulate_plug(features: dict, params: dict, load_kw: float = 1.0) -> dict:
+	"""
+	Backtest the WeMo plug controller over a parameter grid.
+
+	The state chosen at a tick holds for the following 5-minute interval,
+	which is billed at the clock-hour average price of that interval.
+
+	Args:
+		features: output of build_features().
+		params: equal-length parameter arrays, see parameter_grid().
+		load_kw: power drawn while the plug is on.
+
+	Returns:
+		dict: the parameter arrays plus per-combination 'kwh', 'cost_cents',
+			'avg_price' (cents per kWh, NaN if never on), 'savings_cents'
+			(against buying the same kWh at the period average price),
+			'toggles' and 'on_fraction'.
+	"""
+	billing_price = features['hour_mean_price'][1:]
+	average_price = billing_price.mean()
+	combos = len(next(iter(params.values())))
+	report = {
+		'kwh': numpy.empty(combos),
+		'cost_cents': numpy.empty(combos),
+		'toggles': numpy.empty(combos, dtype=numpy.int64),
+		'on_fraction': numpy.empty(combos),
+	}
+	for first in range(0, combos, PARAM_CHUNK):
+		chunk = {name: numpy.asarray(values)[first:first + PARAM_CHUNK] for name, values in params.items()}
+		states = plug_states(features, chunk)
+		interval_on = states[:, :-1]
+		last = first + len(interval_on)
+		report['kwh'][first:last] = interval_on.sum(axis=1) * load_kw * SAMPLE_HOURS
+		report['cost_cents'][first:last] = (interval_on @ billing_price) * load_kw * SAMPLE_HOURS
+		report['toggles'][first:last] = (numpy.diff(states, axis=1)).sum(axis=1)
+		report['on_fraction'][first:last] = interval_on.mean(axis=1)
+	kwh = report['kwh']
+	report['avg_price'] = numpy.where(kwh > 0, report['cost_cents'] / numpy.where(kwh > 0, kwh, 1.0), numpy.nan)
+	report['savings_cents'] = average_price * kwh - report['cost_cents']
+	for name, values in params.items():
+		report[name] = numpy.asarray(values)
+	return report
+
+#============================================
+def simulate_battery(features: dict, fudge_factors, battery_kw: float = 1.0) -> dict:
+	"""
+	Backtest the battery arbitrage comparison for several fudge factors.
+
+	Charges or discharges at battery_kw for each interval after a tick with
+	that action. State of charge and round-trip losses are not modeled, so
+	the value is an upper bound useful for ranking settings.
+
+	Args:
+		features: output of build_features().
+		fudge_factors: margins in cents to try.
+		battery_kw: charge and discharge power.
+
+	Returns:
+		dict: 'fudge_factor', 'kwh_charged', 'kwh_discharged' and
+			'value_cents' (discharge revenue minus charge cost) per factor.
+	"""
+	fudge = numpy.asarray(fudge_factors, dtype=numpy.float64)[:, None]
+	actions = charging_decision.battery_action_array(features['predict'][None, :],
+		features['median'][None, :], features['cutoff'][None, :], fudge)[:, :-1]
+	billing_price = features['hour_mean_price'][1:]
+	charging = actions == charging_decision.BATTERY_CHARGE
+	discharging = actions == charging_decision.BATTERY_DISCHARGE
+	energy = battery_kw * SAMPLE_HOURS
+	report = {
+		'fudge_factor': fudge[:, 0],
+		'kwh_charged': charging.sum(axis=1) * energy,
+		'kwh_discharged': discharging.sum(axis=1) * energy,
+		'value_cents': (discharging @ billing_price - charging @ billing_price) * energy,
+	}
+	return report
+
+#============================================
+def pareto_front(cost: numpy.ndarray, toggles: numpy.ndarray) -> numpy.ndarray:
+	"""
+	Find the settings no other setting beats on both cost and toggles.
+
+	Both objectives are minimized; settings with a NaN cost are ignored.
+
+	Args:
+		cost: cost per setting, for example simulate_plug() 'avg_price'.
+		toggles: plug toggles per setting.
+
+	Returns:
+		numpy.ndarray: indices of the Pareto-optimal settings, fewest toggles first.
+	"""
+	cost = numpy.asarray(cost, dtype=numpy.float64)
+	toggles = numpy.asarray(toggles)
+	candidates = numpy.flatnonzero(numpy.isfinite(cost))
+	# fewest toggles first, cheapest first among equal toggles
+	order = candidates[numpy.lexsort((cost[candidates], toggles[candidates]))]
+	sorted_cost = cost[order]
+	best_before = numpy.concatenate(([numpy.inf], numpy.minimum.accumulate(sorted_cost)[:-1]))
+	front = order[sorted_cost < best_before]
+	return front
+
+#============================================
+def score_forecasters(millis: numpy.ndarray, prices: numpy.ndarray, forecasters: list,
+		train_fraction: float = 0.5) -> dict:
+	"""
+	Train forecasters on the start of a history and score them on the rest.
+
+	The history is split at a clock-hour boundary. Each forecaster is fit on
+	the training part, then predicts after every sample of the whole history
+	(so smoothing has context) and is scored on the test part against the
+	billed average of each sample's hour. Hours with fewer than twelve
+	samples are left out of the score.
+
+	Args:
+		millis: UTC timestamps in milliseconds, oldest first.
+		prices: prices in cents per kWh, same order.
+		forecasters: comed_forecast forecaster instances; fit() updates them.
+		train_fraction: share of the samples used for training.
+
+	Returns:
+		dict: forecaster name -> {'mae', 'rmse', 'bias', 'count'}, errors in
+			cents per kWh; 'bias' is the mean of prediction minus actual.
+	"""
+	prices = numpy.asarray(prices, dtype=numpy.float64)
+	hour_ids = local_time_fields(millis)['hour_id']
+	split = int(len(prices) * train_fraction)
+	# move the split back to the start of its hour
+	split = int(numpy.searchsorted(hour_ids, hour_ids[min(split, len(prices) - 1)]))
+	target, counts = comed_forecast.hour_average_targets(prices, hour_ids)
+	scored = numpy.arange(len(prices)) >= split
+	scored &= counts >= comed_forecast.SAMPLES_PER_HOUR
+	if not numpy.any(scored):
+		raise ValueError("no complete hours left to score after the training split")
+	scores = {}
+	for forecaster in forecasters:
+		if split > 0:
+			forecaster.fit(prices[:split], hour_ids[:split])
+		errors = (forecaster.predict_history(prices, hour_ids) - target)[scored]
+		scores[forecaster.name] = {
+			'mae': float(numpy.abs(errors).mean()),
+			'rmse': float(numpy.sqrt((errors ** 2).mean())),
+			'bias': float(errors.mean()),
+			'count': int(len(errors)),
+		}
+	return scores
@@ -0,0 +1,292 @@
+"""
+Replay ComEd Hourly Pricing bills from hourly import/export energy.
+
+Implements the Level 1 and Level 2 models of docs/COMED_PRICING_SPEC.md:
+imported and exported kWh are settled on separate line items, each billed
+hour uses the archived hourly average supply price, and the per-kWh
+delivery, transmission and net-metering rates come from a versioned rate
+table taken from past bills. Everything is vectorized: a billing period of
+hourly series, or a stack of series (one row per strategy), is costed with
+a handful of numpy reductions.
+
+All prices and line items are in cents; a positive line item is a charge
+and a negative one is a credit.
+"""
+
+# Standard Library
+import datetime
+
+# PIP modules
+import numpy
+
+# local repo modules
+from energylib import comed_archive
+
+#============================================
+# per-kWh rates in cents, by bill start date; each version only lists the
+# rates read off that bill and inherits the rest from the version before.
+# export credit rates are positive when they reduce the bill.
+RATE_VERSIONS = (
+	('2024-03-18', {
+		# Distribution Facility 4.777 + IL Electricity Distribution 0.124
+		'delivery_import_cents': 4.901,
+		'delivery_export_credit_cents': 4.901,
+		'net_metering_adjustment_cents': -3.507,
+	}),
+	('2024-04-16', {
+		'delivery_import_cents': 5.127,
+		'delivery_export_credit_cents': 5.127,
+		'net_metering_adjustment_cents': -2.523,
+	}),
+	('2025-04-16', {
+		'delivery_import_cents': 6.166,
+		'delivery_export_credit_cents': 6.166,
+		'transmission_cents': 0.982,
+		'export_supply_credit_cents': 3.704,
+		'net_metering_adjustment_cents': -0.630,
+	}),
+	('2025-05-18', {
+		'delivery_import_cents': 6.180,
+		'delivery_export_credit_cents': 6.180,
+		'transmission_cents': 1.101,
+		'export_supply_credit_cents': 1.822,
+		'net_metering_adjustment_cents': 0.546,
+	}),
+	('2025-06-17', {
+		'export_supply_credit_cents': -0.263,
+		'net_metering_adjustment_cents': -0.264,
+	}),
+	('2025-11-16', {
+		'net_metering_adjustment_cents': -0.880,
+	}),
+	('2025-12-15', {
+		# Distribution Facility 6.228 + IL Electricity Distribution 0.126
+		'delivery_import_cents': 6.354,
+		'delivery_export_credit_cents': 6.354,
+		'transmission_cents': 1.083,
+		'export_supply_credit_cents': 1.888,
+		'net_metering_adjustment_cents': 1.220,
+	}),
+	('2026-02-16', {
+		'net_metering_adjustment_cents': 2.949,
+	}),
+)
+
+# every rate in the table; rates never read off a bill stay at zero
+RATE_NAMES = (
+	'delivery_import_cents',
+	'delivery_export_credit_cents',
+	'transmission_cents',
+	'capacity_cents',
+	'misc_procurement_cents',
+	'import_taxes_cents',
+	'export_supply_credit_cents',
+	'net_metering_adjustment_cents',
+)
+
+# line items of each modeling level, in bill order
+LEVEL1_ITEMS = ('supply_charge', 'supply_credit', 'delivery_charge', 'delivery_credit')
+LEVEL2_ITEMS = LEVEL1_ITEMS + (
+	'transmission_charge', 'capacity_charge', 'misc_procurement_charge', 'import_taxes',
+	'net_metering_supply_credit', 'net_metering_adjustment',
+	'fixed_charges', 'monthly_adjustments',
+)
+
+#============================================
+def rate_table(versions: tuple = RATE_VERSIONS) -> tuple:
+	"""
+	Resolve the versioned rates into one column per rate.
+
+	Args:
+		versions: (bill start date 'YYYY-MM-DD', rates) pairs, oldest first.
+
+	Returns:
+		tuple: (effective_seconds, rates) where effective_seconds is the local
+			midnight of each version start and rates maps every name in
+			RATE_NAMES to a float64 array with one value per version.
+	"""
+	current = dict.fromkeys(RATE_NAMES, 0.0)
+	effective = []
+	columns = {name: [] for name in RATE_NAMES}
+	for start_date, changes in versions:
+		unknown = set(changes) - set(RATE_NAMES)
+		if unknown:
+			raise ValueError(f"unknown rate names in {start_date}: {sorted(unknown)}")
+		current.update(changes)
+		effective.append(datetime.datetime.strptime(start_date, "%Y-%m-%d").timestamp())
+		for name in RATE_NAMES:
+			columns[name].append(current[name])
+	effective_seconds = numpy.array(effective, dtype=numpy.float64)
+	if numpy.any(numpy.diff(effective_seconds) <= 0):
+		raise ValueError("rate versions must be in increasing date order")
+	rates = {name: numpy.array(values, dtype=numpy.float64) for name, values in columns.items()}
+	return effective_seconds, rates
+
+#============================================
+def rates_at(seconds, versions: tuple = RATE_VERSIONS) -> dict:
+	"""
+	Look up the rates in effect at the given times.
+
+	Times before the first version use the first version.
+
+	Args:
+		seconds: Unix time, scalar or array.
+		versions: versioned rate table.
+
+	Returns:
+		dict: rate name -> rate in cents per kWh, shaped like seconds.
+	"""
+	effective_seconds, rates = rate_table(versions)
+	index = numpy.searchsorted(effective_seconds, seconds, side='right') - 1
+	index = numpy.clip(index, 0, len(effective_seconds) - 1)
+	resolved = {}
+	for name, column in rates.items():
+		value = column[index]
+		resolved[name] = float(value) if numpy.ndim(value) == 0 else value
+	return resolved
+
+#============================================
+def delivery_rate(seconds: float = None) -> float:
+	"""
+	Return the variable import delivery rate in cents per kWh.
+
+	Args:
+		seconds: Unix time of interest, default now.
+
+	Returns:
+		float: Distribution Facility plus IL Electricity Distribution rate.
+	"""
+	if seconds is None:
+		seconds = datetime.datetime.now().timestamp()
+	rate = rates_at(seconds)['delivery_import_cents']
+	return rate
+
+#============================================
+def hourly_prices(start_seconds: float, end_seconds: float,
+		archive_file: str = comed_archive.DEFAULT_ARCHIVE_FILE) -> tuple:
+	"""
+	Average archived 5-minute prices into billed hourly prices.
+
+	Args:
+		start_seconds: period start as a Unix time, rounded down to the hour.
+		end_seconds: period end as a Unix time (exclusive).
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		tuple: (hour_start_seconds, prices) arrays, oldest first, one entry per
+			hour; hours without archived samples have a NaN price.
+	"""
+	first_hour = int(start_seconds // 3600)
+	hour_count = max(int(-(-end_seconds // 3600)) - first_hour, 0)
+	millis, prices = comed_archive.query_range(first_hour * 3600000,
+		(first_hour + hour_count) * 3600000, archive_file)
+	slot = millis // 3600000 - first_hour
+	sums = numpy.bincount(slot, weights=prices, minlength=hour_count)[:hour_count]
+	counts = numpy.bincount(slot, minlength=hour_count)[:hour_count]
+	with numpy.errstate(invalid='ignore', divide='ignore'):
+		means = numpy.where(counts > 0, sums / counts, numpy.nan)
+	hour_start_seconds = (first_hour + numpy.arange(hour_count)) * 3600
+	return hour_start_seconds, means
+
+#============================================
+def replay_bill(hour_start_seconds: numpy.ndarray, import_kwh: numpy.ndarray,
+		export_kwh: numpy.ndarray, hourly_price: numpy.ndarray, level: int = 2,
+		fixed_charges_cents: float = 0.0, monthly_adjustments_cents: float = 0.0,
+		versions: tuple = RATE_VERSIONS) -> dict:
+	"""
+	Compute bill line items for hourly import and export energy.
+
+	Level 1 settles supply at the hourly price in both directions plus
+	variable delivery, which is enough to rank strategies. Level 2 adds the
+	per-kWh transmission, capacity, procurement and tax items, the export
+	supply credit and net-metering adjustment, and the fixed charges and
+	monthly adjustments (PEA) passed in.
+
+	The energy arrays may carry leading axes, for example (strategies, hours);
+	line items are summed over the last axis only.
+
+	Args:
+		hour_start_seconds: Unix time of each billed hour.
+		import_kwh: energy taken from the grid per hour, never negative.
+		export_kwh: energy sent to the grid per hour, never negative.
+		hourly_price: hourly average supply price in cents per kWh.
+		level: 1 or 2.
+		fixed_charges_cents: customer and meter charges for the period.
+		monthly_adjustments_cents: PEA and other period-level adjustments.
+		versions: versioned rate table.
+
+	Returns:
+		dict: line item -> cents (float or array over the leading axes), plus
+			'total', 'import_kwh', 'export_kwh' and 'rate_versions' (bill start
+			dates of the rate versions used).
+	"""
+	if level not in (1, 2):
+		raise ValueError(f"level must be 1 or 2, not {level}")
+	import_kwh = numpy.asarray(import_kwh, dtype=numpy.float64)
+	export_kwh = numpy.asarray(export_kwh, dtype=numpy.float64)
+	hourly_price = numpy.asarray(hourly_price, dtype=numpy.float64)
+	if numpy.any(import_kwh < 0) or numpy.any(export_kwh < 0):
+		raise ValueError("import and export kWh must not be negative")
+	# a missing price only matters for hours that moved energy
+	flows = (import_kwh > 0) | (export_kwh > 0)
+	moved = numpy.any(flows, axis=tuple(range(flows.ndim - 1)))
+	if numpy.any(numpy.isnan(hourly_price) & moved):
+		raise ValueError("missing hourly price for an hour with grid energy")
+	price = numpy.nan_to_num(hourly_price)
+	rates = rates_at(numpy.asarray(hour_start_seconds, dtype=numpy.float64), versions)
+
+	def import_item(rate):
+		return (import_kwh * rate).sum(axis=-1)
+
+	def export_item(rate):
+		return (export_kwh * rate).sum(axis=-1)
+
+	items = {
+		'supply_charge': import_item(price),
+		'supply_credit': -export_item(price),
+		'delivery_charge': import_item(rates['delivery_import_cents']),
+		'delivery_credit': -export_item(rates['delivery_export_credit_cents']),
+	}
+	if level == 2:
+		items['transmission_charge'] = import_item(rates['transmission_cents'])
+		items['capacity_charge'] = import_item(rates['capacity_cents'])
+		items['misc_procurement_charge'] = import_item(rates['misc_procurement_cents'])
+		items['import_taxes'] = import_item(rates['import_taxes_cents'])
+		items['net_metering_supply_credit'] = -export_item(rates['export_supply_credit_cents'])
+		items['net_metering_adjustment'] = export_item(rates['net_metering_adjustment_cents'])
+		items['fixed_charges'] = numpy.zeros_like(items['supply_charge']) + fixed_charges_cents
+		items['monthly_adjustments'] = numpy.zeros_like(items['supply_charge']) + monthly_adjustments_cents
+
+	bill = {}
+	for name, value in items.items():
+		bill[name] = float(value) if numpy.ndim(value) == 0 else value
+	bill['total'] = sum(items.values())
+	if numpy.ndim(bill['total']) == 0:
+		bill['total'] = float(bill['total'])
+	bill['import_kwh'] = import_kwh.sum(axis=-1)
+	bill['export_kwh'] = export_kwh.sum(axis=-1)
+	effective_seconds, _ = rate_table(versions)
+	used = numpy.unique(numpy.clip(numpy.searchsorted(effective_seconds,
+		numpy.asarray(hour_start_seconds, dtype=numpy.float64), side='right') - 1, 0, None))
+	bill['rate_versions'] = [versions[i][0] for i in used]
+	return bill
+
+#============================================
+def split_net_kwh(net_kwh: numpy.ndarray) -> tuple:
+	"""
+	Split signed hourly net grid energy into import and export series.
+
+	Only valid when the net value per hour is all that is known; metered
+	import and export within one hour should be passed to replay_bill()
+	directly.
+
+	Args:
+		net_kwh: positive for import, negative for export.
+
+	Returns:
+		tuple: (import_kwh, export_kwh), both non-negative.
+	"""
+	net_kwh = numpy.asarray(net_kwh, dtype=numpy.float64)
+	import_kwh = numpy.maximum(net_kwh, 0.0)
+	export_kwh = numpy.maximum(-net_kwh, 0.0)
+	return import_kwh, export_kwh
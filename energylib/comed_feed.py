@@ -0,0 +1,125 @@
+"""
+Shared ComEd price feed published as a memory-mappable numpy file.
+
+One resident fetcher (scripts/comed_feed_daemon.py) downloads the ComEd
+5-minute feed and publishes the parsed timestamp and price columns here.
+Every other process reads the file with numpy.load(mmap_mode='r'), so N
+consumers cost one HTTP request per interval and no JSON parsing.
+"""
+
+# Standard Library
+import os
+import time
+import tempfile
+
+# PIP modules
+import numpy
+
+#============================================
+# /dev/shm keeps the feed in RAM on Linux; fall back to /tmp elsewhere
+if os.path.isdir("/dev/shm"):
+	DEFAULT_FEED_FILE = "/dev/shm/comed_price_feed.npy"
+else:
+	DEFAULT_FEED_FILE = "/tmp/comed_price_feed.npy"  # nosec B108
+
+# record layout of the published file, newest sample first
+FEED_DTYPE = numpy.dtype([('millisUTC', numpy.int64), ('price', numpy.float64)])
+
+#============================================
+def publish_feed(millis: numpy.ndarray, prices: numpy.ndarray, feed_file: str = DEFAULT_FEED_FILE) -> None:
+	"""
+	Atomically publish price columns to the shared feed file.
+
+	Args:
+		millis: UTC timestamps in milliseconds, newest first.
+		prices: prices in cents per kWh, same order as millis.
+		feed_file: destination path of the feed.
+	"""
+	records = numpy.empty(len(millis), dtype=FEED_DTYPE)
+	records['millisUTC'] = millis
+	records['price'] = prices
+	# each publisher writes its own temporary file, so two publishers never
+	# write into the same file and replace the feed with a torn one
+	directory = os.path.dirname(feed_file) or "."
+	handle, tmp_file = tempfile.mkstemp(dir=directory, prefix=os.path.basename(feed_file) + ".", suffix=".npy")
+	try:
+		# mkstemp files are private; allow all users to read/write
+		os.fchmod(handle, 0o666)
+		with os.fdopen(handle, "wb") as file:
+			numpy.save(file, records)
+		# readers holding the old mapping keep a valid inode after the replace
+		os.replace(tmp_file, feed_file)
+	except BaseException:
+		if os.path.exists(tmp_file):
+			os.remove(tmp_file)
+		raise
+
+#============================================
+def feed_stamp(feed_file: str = DEFAULT_FEED_FILE) -> int | None:
+	"""
+	Return the modification stamp of the feed file in nanoseconds.
+
+	Args:
+		feed_file: path of the feed.
+
+	Returns:
+		int: st_mtime_ns of the feed, or None when the feed does not exist.
+	"""
+	if not os.path.exists(feed_file):
+		return None
+	stamp = os.stat(feed_file).st_mtime_ns
+	return stamp
+
+#============================================
+def read_feed(feed_file: str = DEFAULT_FEED_FILE, max_age_seconds: float = None) -> tuple | None:
+	"""
+	Read the shared feed through a memory map.
+
+	Args:
+		feed_file: path of the feed.
+		max_age_seconds: ignore feeds published longer ago than this.
+
+	Returns:
+		tuple: (millis, prices, published_seconds) arrays and publish time,
+			or None when the feed is missing or stale.
+	"""
+	stamp = feed_stamp(feed_file)
+	if stamp is None:
+		return None
+	published_seconds = stamp / 1e9
+	if max_age_seconds is not None and time.time() - published_seconds > max_age_seconds:
+		return None
+	records = numpy.load(feed_file, mmap_mode='r')
+	# copy the columns out so the mapping can be released right away
+	millis = numpy.array(records['millisUTC'], dtype=numpy.int64)
+	prices = numpy.array(records['price'], dtype=numpy.float64)
+	feed = (millis, prices, published_seconds)
+	return feed
+
+#============================================
+def wait_for_feed_update(last_stamp: int, timeout_seconds: float,
+		feed_file: str = DEFAULT_FEED_FILE, poll_seconds: float = 1.0) -> int | None:
+	"""
+	Block until the feed is republished or the timeout expires.
+
+	A stat() call per poll is all this costs, so consumers can react within
+	about a second of the fetcher publishing new prices.
+
+	Args:
+		last_stamp: stamp from feed_stamp() the caller has already seen.
+		timeout_seconds: maximum time to wait.
+		feed_file: path of the feed.
+		poll_seconds: time between stat() checks.
+
+	Returns:
+		int: the new stamp, or None when the timeout expired first.
+	"""
+	deadline = time.time() + timeout_seconds
+	while True:
+		stamp = feed_stamp(feed_file)
+		if stamp is not None and stamp != last_stamp:
+			return stamp
+		remaining = deadline - time.time()
+		if remaining <= 0:
+			return None
+		time.sleep(min(poll_seconds, remaining))
@@ -0,0 +1,506 @@
+"""
+Forecasters for the billed ComEd hourly price.
+
+ComEd bills each clock hour at the average of its twelve 5-minute prices,
+so every forecaster here predicts that hourly average while the hour is
+still in progress. A forecaster answers two questions:
+
+- predict(series): one prediction for the newest hour of a
+  comedlib.ComedPriceSeries, cheap enough for every decision tick.
+- predict_history(prices, hour_ids): the prediction after every sample of
+  an archived history (oldest first), vectorized for backtests and scoring.
+
+Trainable models learn their parameters offline with fit() on archived
+prices and can be saved to and loaded from JSON. Hour ids are local hour
+ids, localSeconds() // 3600, so hour of day is hour_id % 24 and the
+weekday (Monday 0) is (hour_id // 24 + 3) % 7.
+
+This module depends only on numpy so comedlib can import it.
+"""
+
+# Standard Library
+import abc
+import json
+
+# PIP modules
+import numpy
+
+#============================================
+# five-minute samples in one billed hour
+SAMPLES_PER_HOUR = 12
+
+#============================================
+def group_layout(group_ids: numpy.ndarray) -> tuple:
+	"""
+	Describe runs of equal, contiguous group ids.
+
+	Args:
+		group_ids: group id per element, equal ids adjacent.
+
+	Returns:
+		tuple: (starts, group_index, counts) where starts[i] is the index of the
+			first element of element i's group, group_index[i] numbers the groups
+			from 0, and counts[g] is the size of group g.
+	"""
+	count = len(group_ids)
+	boundary = numpy.ones(count, dtype=bool)
+	boundary[1:] = group_ids[1:] != group_ids[:-1]
+	group_index = numpy.cumsum(boundary) - 1
+	start_positions = numpy.flatnonzero(boundary)
+	starts = start_positions[group_index]
+	counts = numpy.diff(numpy.append(start_positions, count))
+	return starts, group_index, counts
+
+#============================================
+def window_matrix(values: numpy.ndarray, window_starts: numpy.ndarray,
+		lengths: numpy.ndarray, fill: float) -> numpy.ndarray:
+	"""
+	Gather a short trailing window per element into a padded matrix.
+
+	Row i holds values[window_starts[i] : window_starts[i] + lengths[i]],
+	padded with fill on the right.
+
+	Args:
+		values: source array.
+		window_starts: first index of each window.
+		lengths: length of each window.
+		fill: padding value.
+
+	Returns:
+		numpy.ndarray: (len(window_starts), lengths.max()) matrix.
+	"""
+	width = int(lengths.max())
+	offsets = numpy.arange(width)
+	index = window_starts[:, None] + offsets[None, :]
+	valid = offsets[None, :] < lengths[:, None]
+	matrix = numpy.where(valid, values[numpy.clip(index, 0, len(values) - 1)], fill)
+	return matrix
+
+#============================================
+def hour_progress(prices: numpy.ndarray, hour_ids: numpy.ndarray) -> tuple:
+	"""
+	Samples seen and their mean within the current hour, after every sample.
+
+	Args:
+		prices: prices in cents per kWh, oldest first.
+		hour_ids: local hour id per sample.
+
+	Returns:
+		tuple: (count, mean) arrays aligned with prices.
+	"""
+	prices = numpy.asarray(prices, dtype=numpy.float64)
+	starts, _group_index, _counts = group_layout(hour_ids)
+	count = numpy.arange(len(prices)) - starts + 1
+	totals = numpy.concatenate(([0.0], numpy.cumsum(prices)))
+	mean = (totals[1:] - totals[starts]) / count
+	return count, mean
+
+#============================================
+def hour_average_targets(prices: numpy.ndarray, hour_ids: numpy.ndarray) -> tuple:
+	"""
+	The billed average of each sample's clock hour, the forecast target.
+
+	Args:
+		prices: prices in cents per kWh, oldest first.
+		hour_ids: local hour id per sample.
+
+	Returns:
+		tuple: (averages, counts) arrays aligned with prices, where counts is
+			the number of samples in that hour.
+	"""
+	prices = numpy.asarray(prices, dtype=numpy.float64)
+	_starts, group_index, counts = group_layout(hour_ids)
+	sums = numpy.bincount(group_index, weights=prices)
+	averages = (sums / counts)[group_index]
+	return averages, counts[group_index]
+
+#============================================
+def closed_form_slope(values: numpy.ndarray) -> float:
+	"""
+	Least-squares slope of values against 0, 1, 2, ...
+
+	Args:
+		values: evenly spaced samples, oldest first.
+
+	Returns:
+		float: slope per sample, NaN for fewer than two values.
+	"""
+	count = len(values)
+	if count < 2:
+		return float('nan')
+	sum_x = count * (count - 1) / 2.0
+	sum_xx = (count - 1) * count * (2 * count - 1) / 6.0
+	sum_y = float(numpy.sum(values))
+	sum_xy = float(numpy.dot(numpy.arange(count, dtype=numpy.float64), values))
+	slope = (count * sum_xy - sum_x * sum_y) / (count * sum_xx - sum_x ** 2)
+	return slope
+
+#============================================
+def _finish_hour(count, mean, expected):
+	"""
+	Blend the samples seen so far with an expected price for the rest of the hour.
+	"""
+	remaining = numpy.maximum(SAMPLES_PER_HOUR - count, 0)
+	average = (count * mean + remaining * expected) / (count + remaining)
+	return average
+
+#============================================
+def _mean_absolute_error(predicted: numpy.ndarray, target: numpy.ndarray) -> float:
+	return float(numpy.mean(numpy.abs(predicted - target)))
+
+#============================================
+#============================================
+class PriceForecaster(abc.ABC):
+	"""
+	Interface of the hourly price forecasters.
+
+	Subclasses set name, must implement predict() and predict_history()
+	(the class cannot be instantiated otherwise), and override fit(),
+	to_dict() and from_dict() when they have parameters.
+	"""
+
+	name = None
+
+	#============================================
+	def fit(self, prices: numpy.ndarray, hour_ids: numpy.ndarray):
+		"""
+		Learn parameters from archived prices; a no-op for fixed models.
+
+		Args:
+			prices: prices in cents per kWh, oldest first.
+			hour_ids: local hour id per sample.
+
+		Returns:
+			PriceForecaster: self, for chaining.
+		"""
+		return self
+
+	#============================================
+	@abc.abstractmethod
+	def predict(self, series) -> float:
+		"""
+		Predict the billed average of the newest hour of a ComedPriceSeries.
+		"""
+
+	#============================================
+	@abc.abstractmethod
+	def predict_history(self, prices: numpy.ndarray, hour_ids: numpy.ndarray) -> numpy.ndarray:
+		"""
+		Predict the billed hour average after every sample of a history.
+
+		Args:
+			prices: prices in cents per kWh, oldest first.
+			hour_ids: local hour id per sample.
+
+		Returns:
+			numpy.ndarray: prediction after each sample.
+		"""
+
+	#============================================
+	def to_dict(self) -> dict:
+		"""
+		Return the JSON-ready parameters, including the model name.
+		"""
+		return {'model': self.name}
+
+	#============================================
+	@classmethod
+	def from_dict(cls, params: dict):
+		"""
+		Rebuild a forecaster from to_dict() output.
+		"""
+		return cls()
+
+#============================================
+#============================================
+class HeuristicForecaster(PriceForecaster):
+	"""
+	The long-standing ComedLib.getPredictedRate() rule, with no training.
+
+	The prediction is the largest of three estimates for the current hour:
+	mean plus sqrt(std) scaled down as the hour fills, a least-squares slope
+	extrapolated to the end of the hour (borrowing the four newest samples of
+	the previous hour while the hour has three samples or fewer), and the
+	average of max, mean and newest price. Prices below 1.0c are clamped to
+	1.0c for the spread and slope.
+	"""
+
+	name = 'heuristic'
+
+	#============================================
+	def predict(self, series) -> float:
+		key = series.latestHourKey()
+		yarray = series.hourPrices(key)
+		ymean = yarray.mean()
+		ypositive = numpy.where(yarray < 1.0, 1.0, yarray)
+		weight = min((8 - len(yarray)) / 8.0, 1)
+		value1 = ymean + numpy.sqrt(ypositive.std()) * weight
+
+		key2 = series.previousHourKey(key)
+		if len(ypositive) > 3 or key2 is None:
+			yslopedata = ypositive[::-1]
+		else:
+			yarray2 = series.hourPrices(key2)
+			ypositive2 = numpy.where(yarray2 < 1.0, 1.0, yarray2)
+			yslopedata = numpy.hstack((ypositive, ypositive2[:4]))[::-1]
+		predicted = max(value1, (yarray.max() + ymean + yarray[0]) / 3.0)
+		slope = closed_form_slope(yslopedata)
+		# a single point has no slope
+		if not numpy.isnan(slope):
+			value2 = (14 - len(yslopedata)) * max(slope, 0.1) / 2.0 + ymean
+			predicted = max(predicted, value2)
+		return float(predicted)
+
+	#============================================
+	def predict_history(self, prices: numpy.ndarray, hour_ids: numpy.ndarray) -> numpy.ndarray:
+		prices = numpy.asarray(prices, dtype=numpy.float64)
+		position = numpy.arange(len(prices))
+		starts, group_index, counts = group_layout(hour_ids)
+		hour_count = position - starts + 1
+		clipped = numpy.where(prices < 1.0, 1.0, prices)
+
+		# statistics of the current hour so far
+		hour_values = window_matrix(prices, starts, hour_count, numpy.nan)
+		hour_clipped = window_matrix(clipped, starts, hour_count, numpy.nan)
+		hour_mean = numpy.nanmean(hour_values, axis=1)
+		hour_max = numpy.nanmax(hour_values, axis=1)
+		clipped_std = numpy.nanstd(hour_clipped, axis=1)
+		weight = numpy.minimum((8 - hour_count) / 8.0, 1.0)
+		value1 = hour_mean + numpy.sqrt(clipped_std) * weight
+
+		# least-squares slope over the trailing regression window
+		previous_counts = numpy.concatenate(([0], counts[:-1]))[group_index]
+		borrowed = numpy.where(hour_count > 3, 0, numpy.minimum(4, previous_counts))
+		slope_count = hour_count + borrowed
+		window = window_matrix(clipped, position - slope_count + 1, slope_count, 0.0)
+		xvalues = numpy.arange(window.shape[1], dtype=numpy.float64)[None, :]
+		valid = xvalues < slope_count[:, None]
+		sum_x = slope_count * (slope_count - 1) / 2.0
+		sum_xx = (slope_count - 1) * slope_count * (2 * slope_count - 1) / 6.0
+		sum_y = window.sum(axis=1)
+		sum_xy = (numpy.where(valid, xvalues, 0.0) * window).sum(axis=1)
+		denominator = slope_count * sum_xx - sum_x ** 2
+		safe_denominator = numpy.where(denominator > 0, denominator, 1.0)
+		slope = (slope_count * sum_xy - sum_x * sum_y) / safe_denominator
+		slope = numpy.maximum(slope, 0.1)
+		value2 = (14 - slope_count) * slope / 2.0 + hour_mean
+		value2 = numpy.where(slope_count > 1, value2, -numpy.inf)
+
+		value3 = (hour_max + hour_mean + prices) / 3.0
+		predicted = numpy.maximum(numpy.maximum(value1, value2), value3)
+		return predicted
+
+#============================================
+#============================================
+class SmoothingForecaster(PriceForecaster):
+	"""
+	Exponential smoothing of the 5-minute prices.
+
+	The smoothed level, over the newest samples with weights
+	alpha * (1 - alpha)**age, stands in for the samples still to come this
+	hour. fit() picks alpha from ALPHAS by mean absolute error.
+	"""
+
+	name = 'smoothing'
+	ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+	# weights below this fraction of the newest weight are dropped
+	WEIGHT_FLOOR = 1e-4
+
+	def __init__(self, alpha: float = 0.3):
+		if not 0.0 < alpha <= 1.0:
+			raise ValueError(f"alpha must be in (0, 1], not {alpha}")
+		self.alpha = float(alpha)
+		self._weights = self._kernel(self.alpha)
+
+	#============================================
+	@classmethod
+	def _kernel(cls, alpha: float) -> numpy.ndarray:
+		"""
+		Smoothing weights, newest sample first.
+		"""
+		if alpha >= 1.0:
+			return numpy.ones(1)
+		length = int(numpy.ceil(numpy.log(cls.WEIGHT_FLOOR) / numpy.log(1.0 - alpha))) + 1
+		weights = alpha * (1.0 - alpha) ** numpy.arange(length)
+		return weights
+
+	#============================================
+	def _levels(self, prices: numpy.ndarray) -> numpy.ndarray:
+		"""
+		Smoothed level after every sample, oldest first.
+		"""
+		weights = self._weights
+		levels = numpy.convolve(prices, weights)[:len(prices)]
+		# early samples have a shorter history; renormalize their weights
+		norm = numpy.cumsum(weights)[numpy.minimum(numpy.arange(len(prices)), len(weights) - 1)]
+		return levels / norm
+
+	#============================================
+	def fit(self, prices: numpy.ndarray, hour_ids: numpy.ndarray):
+		prices = numpy.asarray(prices, dtype=numpy.float64)
+		target, _counts = hour_average_targets(prices, hour_ids)
+		best_error = None
+		for alpha in self.ALPHAS:
+			candidate = SmoothingForecaster(alpha)
+			error = _mean_absolute_error(candidate.predict_history(prices, hour_ids), target)
+			if best_error is None or error < best_error:
+				best_error = error
+				self.alpha = float(alpha)
+		self._weights = self._kernel(self.alpha)
+		return self
+
+	#============================================
+	def predict(self, series) -> float:
+		recent = series.prices[:len(self._weights)]
+		weights = self._weights[:len(recent)]
+		level = float(numpy.dot(weights, recent) / weights.sum())
+		key = series.latestHourKey()
+		count = len(series.hourPrices(key))
+		predicted = _finish_hour(count, series.hourMean(key), level)
+		return float(predicted)
+
+	#============================================
+	def predict_history(self, prices: numpy.ndarray, hour_ids: numpy.ndarray) -> numpy.ndarray:
+		prices = numpy.asarray(prices, dtype=numpy.float64)
+		count, mean = hour_progress(prices, hour_ids)
+		predicted = _finish_hour(count, mean, self._levels(prices))
+		return predicted
+
+	#============================================
+	def to_dict(self) -> dict:
+		return {'model': self.name, 'alpha': self.alpha}
+
+	#============================================
+	@classmethod
+	def from_dict(cls, params: dict):
+		return cls(params['alpha'])
+
+#============================================
+#============================================
+class SeasonalForecaster(PriceForecaster):
+	"""
+	Hour-of-day and weekday profile of the billed hourly price.
+
+	fit() learns the average billed price of each (weekday, hour) slot from
+	archived prices. The rest of the hour is expected at the profile price,
+	pulled toward the hour's running mean by anchor_weight (0 trusts the
+	profile, 1 trusts the running mean); fit() also picks anchor_weight from
+	ANCHOR_WEIGHTS by mean absolute error.
+	"""
+
+	name = 'seasonal'
+	ANCHOR_WEIGHTS = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+	def __init__(self, profile=None, anchor_weight: float = 0.5):
+		self.profile = None if profile is None else numpy.asarray(profile, dtype=numpy.float64).reshape(7, 24)
+		self.anchor_weight = float(anchor_weight)
+
+	#============================================
+	@staticmethod
+	def _slots(hour_ids):
+		"""
+		Profile slot (weekday * 24 + hour) of local hour ids.
+		"""
+		hour_ids = numpy.asarray(hour_ids, dtype=numpy.int64)
+		weekday = (hour_ids // 24 + 3) % 7
+		return weekday * 24 + hour_ids % 24
+
+	#============================================
+	def _profile_price(self, hour_ids):
+		if self.profile is None:
+			raise RuntimeError("SeasonalForecaster needs fit() or a saved profile")
+		return self.profile.reshape(-1)[self._slots(hour_ids)]
+
+	#============================================
+	def fit(self, prices: numpy.ndarray, hour_ids: numpy.ndarray):
+		prices = numpy.asarray(prices, dtype=numpy.float64)
+		hour_ids = numpy.asarray(hour_ids, dtype=numpy.int64)
+		_starts, group_index, counts = group_layout(hour_ids)
+		hour_means = numpy.bincount(group_index, weights=prices) / counts
+		first_of_hour = numpy.flatnonzero(numpy.diff(numpy.append(-1, group_index)))
+		slots = self._slots(hour_ids[first_of_hour])
+		slot_sums = numpy.bincount(slots, weights=hour_means, minlength=7 * 24)
+		slot_counts = numpy.bincount(slots, minlength=7 * 24)
+		# slots never seen fall back to the same hour on any day, then the overall mean
+		hour_sums = slot_sums.reshape(7, 24).sum(axis=0)
+		hour_counts = slot_counts.reshape(7, 24).sum(axis=0)
+		overall = hour_means.mean()
+		by_hour = numpy.where(hour_counts > 0, hour_sums / numpy.maximum(hour_counts, 1), overall)
+		profile = numpy.where(slot_counts > 0, slot_sums / numpy.maximum(slot_counts, 1),
+			numpy.tile(by_hour, 7))
+		self.profile = profile.reshape(7, 24)
+
+		target, _target_counts = hour_average_targets(prices, hour_ids)
+		best_error = None
+		for anchor_weight in self.ANCHOR_WEIGHTS:
+			candidate = SeasonalForecaster(self.profile, anchor_weight)
+			error = _mean_absolute_error(candidate.predict_history(prices, hour_ids), target)
+			if best_error is None or error < best_error:
+				best_error = error
+				self.anchor_weight = float(anchor_weight)
+		return self
+
+	#============================================
+	def predict(self, series) -> float:
+		key = series.latestHourKey()
+		hour_id = int(series.hour_ids[0])
+		mean = series.hourMean(key)
+		profile_price = self._profile_price(hour_id)
+		expected = profile_price + self.anchor_weight * (mean - profile_price)
+		predicted = _finish_hour(len(series.hourPrices(key)), mean, expected)
+		return float(predicted)
+
+	#============================================
+	def predict_history(self, prices: numpy.ndarray, hour_ids: numpy.ndarray) -> numpy.ndarray:
+		count, mean = hour_progress(prices, hour_ids)
+		profile_price = self._profile_price(hour_ids)
+		expected = profile_price + self.anchor_weight * (mean - profile_price)
+		predicted = _finish_hour(count, mean, expected)
+		return predicted
+
+	#============================================
+	def to_dict(self) -> dict:
+		profile = None if self.profile is None else numpy.round(self.profile, 4).tolist()
+		return {'model': self.name, 'anchor_weight': self.anchor_weight, 'profile': profile}
+
+	#============================================
+	@classmethod
+	def from_dict(cls, params: dict):
+		return cls(params['profile'], params['anchor_weight'])
+
+#============================================
+# forecaster classes by name, for from_dict() and the scoring script
+FORECASTERS = {
+	HeuristicForecaster.name: HeuristicForecaster,
+	SmoothingForecaster.name: SmoothingForecaster,
+	SeasonalForecaster.name: SeasonalForecaster,
+}
+
+#============================================
+def forecaster_from_dict(params: dict) -> PriceForecaster:
+	"""
+	Rebuild any forecaster from its to_dict() output.
+	"""
+	model = params.get('model')
+	if model not in FORECASTERS:
+		raise ValueError(f"unknown forecaster model {model}")
+	forecaster = FORECASTERS[model].from_dict(params)
+	return forecaster
+
+#============================================
+def save_forecaster(forecaster: PriceForecaster, path: str) -> None:
+	"""
+	Write a trained forecaster to a JSON file.
+	"""
+	with open(path, "w") as f:
+		json.dump(forecaster.to_dict(), f)
+
+#============================================
+def load_forecaster(path: str) -> PriceForecaster:
+	"""
+	Read a forecaster written by save_forecaster().
+	"""
+	with open(path, "r") as f:
+		params = json.load(f)
+	forecaster = forecaster_from_dict(params)
+	return forecaster
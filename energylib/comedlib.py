@@ -2,15 +2,719 @@
 
 # Standard Library
 import os
+import sys
 import time
 import math
 import json
 import random
+import sqlite3
 import datetime
+import tempfile
+import threading
+import collections.abc
 # PIP modules
 import numpy
-import requests
-from scipy import stats
+# local repo modules
+from energylib import comed_feed
+from energylib import comed_forecast
+from energylib import comed_archive
+from energylib import charge_planner
+
+# reasonableCutOff() anchor price and time-of-day bonuses, in cents per kWh
+CHARGING_CUTOFF_PRICE = 10.1
+WEEKEND_BONUS = 0.9
+LATE_NIGHT_BONUS = 0.8
+PEAK_SOLAR_BONUS = 1.5
+
+# ComEd publishes one 5-minute sample per interval, shortly after it ends
+SAMPLE_INTERVAL_SECONDS = 300
+PUBLISH_LAG_SECONDS = 30
+# while the next sample is overdue, look again this often
+LATE_RETRY_SECONDS = 30
+
+#======================================
+#======================================
+class HourlyPriceIndex(object):
+	"""
+	Running per-hour aggregates of 5-minute prices.
+
+	Hours are keyed by local hour id (localSeconds() // 3600). Each hour keeps
+	the sample count, sum, sum of squares, minimum, maximum and the sum of
+	prices clamped up to 1.0c, so hourly averages and std are dictionary
+	lookups. New samples are folded in with withSamples() without touching
+	the hours they do not belong to.
+	"""
+
+	def __init__(self, hour_ids, counts, sums, sumsq, mins, maxs, clamped_sums):
+		"""
+		Stores one aggregate row per hour; use fromSamples() to build one.
+
+		Args:
+			hour_ids (numpy.ndarray): Local hour ids, ascending and unique.
+			counts, sums, sumsq, mins, maxs, clamped_sums (numpy.ndarray):
+				Aggregates per hour, same order as hour_ids.
+		"""
+		self.hour_ids = hour_ids
+		self.counts = counts
+		self.sums = sums
+		self.sumsq = sumsq
+		self.mins = mins
+		self.maxs = maxs
+		self.clamped_sums = clamped_sums
+		self._position = {int(hour_id): i for i, hour_id in enumerate(hour_ids.tolist())}
+
+	#======================================
+	@classmethod
+	def fromSamples(cls, hour_ids, prices):
+		"""
+		Aggregates samples into hours in one sorted pass.
+
+		Args:
+			hour_ids (numpy.ndarray): Local hour id of each sample, any order.
+			prices (numpy.ndarray): Prices in cents per kWh, same order.
+
+		Returns:
+			HourlyPriceIndex: Aggregates of the given samples.
+		"""
+		hour_ids = numpy.asarray(hour_ids, dtype=numpy.int64)
+		prices = numpy.asarray(prices, dtype=numpy.float64)
+		if len(prices) == 0:
+			empty = numpy.empty(0, dtype=numpy.float64)
+			return cls(numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64),
+				empty, empty, empty, empty, empty)
+		order = numpy.argsort(hour_ids, kind='stable')
+		sorted_ids = hour_ids[order]
+		sorted_prices = prices[order]
+		unique_ids, starts, counts = numpy.unique(sorted_ids, return_index=True, return_counts=True)
+		index = cls(unique_ids, counts,
+			numpy.add.reduceat(sorted_prices, starts),
+			numpy.add.reduceat(sorted_prices * sorted_prices, starts),
+			numpy.minimum.reduceat(sorted_prices, starts),
+			numpy.maximum.reduceat(sorted_prices, starts),
+			numpy.add.reduceat(numpy.maximum(sorted_prices, 1.0), starts))
+		return index
+
+	#======================================
+	def withSamples(self, hour_ids, prices):
+		"""
+		Returns a new index with more samples folded in.
+
+		Only the hours of the new samples change; the cost is proportional to
+		the new samples plus the number of hours held.
+
+		Args:
+			hour_ids (numpy.ndarray): Local hour id of each new sample.
+			prices (numpy.ndarray): New prices in cents per kWh.
+
+		Returns:
+			HourlyPriceIndex: Combined aggregates.
+		"""
+		new = HourlyPriceIndex.fromSamples(hour_ids, prices)
+		if len(new.hour_ids) == 0:
+			return self
+		merged_ids = numpy.union1d(self.hour_ids, new.hour_ids)
+		old_rows = numpy.searchsorted(merged_ids, self.hour_ids)
+		new_rows = numpy.searchsorted(merged_ids, new.hour_ids)
+		columns = []
+		for name, combine, empty in (('counts', numpy.add, 0), ('sums', numpy.add, 0.0),
+				('sumsq', numpy.add, 0.0), ('mins', numpy.minimum, numpy.inf),
+				('maxs', numpy.maximum, -numpy.inf), ('clamped_sums', numpy.add, 0.0)):
+			old_column = getattr(self, name)
+			column = numpy.full(len(merged_ids), empty, dtype=old_column.dtype)
+			column[old_rows] = old_column
+			column[new_rows] = combine(column[new_rows], getattr(new, name))
+			columns.append(column)
+		index = HourlyPriceIndex(merged_ids, *columns)
+		return index
+
+	#======================================
+	def withoutHours(self, hour_ids):
+		"""
+		Returns a new index without the given hours.
+		"""
+		keep = ~numpy.isin(self.hour_ids, hour_ids)
+		index = HourlyPriceIndex(self.hour_ids[keep], self.counts[keep], self.sums[keep],
+			self.sumsq[keep], self.mins[keep], self.maxs[keep], self.clamped_sums[keep])
+		return index
+
+	#======================================
+	def __contains__(self, hour_id):
+		return int(hour_id) in self._position
+
+	#======================================
+	def count(self, hour_id):
+		"""
+		Returns the number of samples in an hour (0 when absent).
+		"""
+		position = self._position.get(int(hour_id))
+		if position is None:
+			return 0
+		return int(self.counts[position])
+
+	#======================================
+	def mean(self, hour_id, clamp=False):
+		"""
+		Returns the average price of an hour, or None when absent.
+
+		Args:
+			hour_id (int): Local hour id.
+			clamp (bool): Clamp prices below 1.0c up to 1.0c before averaging.
+		"""
+		position = self._position.get(int(hour_id))
+		if position is None:
+			return None
+		sums = self.clamped_sums if clamp is True else self.sums
+		return float(sums[position] / self.counts[position])
+
+	#======================================
+	def std(self, hour_id):
+		"""
+		Returns the population standard deviation of an hour, or None when absent.
+		"""
+		position = self._position.get(int(hour_id))
+		if position is None:
+			return None
+		count = self.counts[position]
+		mean = self.sums[position] / count
+		variance = max(self.sumsq[position] / count - mean * mean, 0.0)
+		return float(math.sqrt(variance))
+
+	#======================================
+	def minimum(self, hour_id):
+		"""
+		Returns the lowest price of an hour, or None when absent.
+		"""
+		position = self._position.get(int(hour_id))
+		if position is None:
+			return None
+		return float(self.mins[position])
+
+	#======================================
+	def maximum(self, hour_id):
+		"""
+		Returns the highest price of an hour, or None when absent.
+		"""
+		position = self._position.get(int(hour_id))
+		if position is None:
+			return None
+		return float(self.maxs[position])
+
+	#======================================
+	def means(self):
+		"""
+		Returns the average price of every hour, aligned with hour_ids.
+		"""
+		if len(self.counts) == 0:
+			return numpy.empty(0, dtype=numpy.float64)
+		return self.sums / self.counts
+
+#======================================
+#======================================
+class ComedPriceSeries(object):
+	"""
+	Columnar view of one ComEd 5-minute feed download.
+
+	Timestamps and prices are stored as contiguous numpy arrays in feed order
+	(newest sample first). Each sample also carries a local-hour bucket key that
+	matches the integer hour keys of parseComedData(): the key for a sample is
+	the local hour-of-day plus one, relative to the day of the newest sample,
+	so samples from the previous day get keys of zero or less.
+	"""
+
+	def __init__(self, millis, prices, hourly=None):
+		"""
+		Builds the derived hour and bucket arrays for the given samples.
+
+		Args:
+			millis (array-like): UTC timestamps in milliseconds, newest first.
+			prices (array-like): Prices in cents per kWh, same order as millis.
+			hourly (HourlyPriceIndex, optional): Aggregates already covering
+				exactly these samples; built from the samples when None.
+		"""
+		self.millis = numpy.ascontiguousarray(millis, dtype=numpy.int64)
+		self.prices = numpy.ascontiguousarray(prices, dtype=numpy.float64)
+		# content stamp used to invalidate everything derived from this series
+		self.version = _versionStamp(self.millis[0] if len(self.millis) > 0 else None, len(self.millis))
+		local_seconds = localSeconds(self.millis)
+		# absolute local hour of each sample, the key of the hourly aggregates
+		self.hour_ids = local_seconds // 3600
+		# whole minutes since local midnight of the newest sample
+		self.local_minutes = _minutesSinceNewestMidnight(local_seconds)
+		self.local_hours = self.local_minutes / 60.0
+		self.hour_keys = self.local_minutes // 60 + 1
+		# hour key = hour id - key offset
+		self._key_offset = int(self.hour_ids[0] - self.hour_keys[0]) if len(self.millis) > 0 else 0
+		if hourly is None:
+			hourly = HourlyPriceIndex.fromSamples(self.hour_ids, self.prices)
+		self.hourly = hourly
+		# group sample indices by hour key once; a stable sort keeps feed order
+		# (newest first) inside each bucket
+		self._bucket_order = numpy.argsort(self.hour_keys, kind='stable')
+		sorted_keys = self.hour_keys[self._bucket_order]
+		bucket_info = numpy.unique(sorted_keys, return_index=True, return_counts=True)
+		self.bucket_keys = bucket_info[0]
+		self._bucket_starts = bucket_info[1]
+		self._bucket_counts = bucket_info[2]
+
+	#======================================
+	@classmethod
+	def fromRawData(cls, data):
+		"""
+		Builds a series from the raw feed list in a single pass.
+
+		Args:
+			data (list): Raw JSON data as a list of {'millisUTC', 'price'} dictionaries.
+
+		Returns:
+			ComedPriceSeries: Parsed columnar series.
+		"""
+		millis, prices = rawColumns(data)
+		series = cls(millis, prices)
+		return series
+
+	#======================================
+	def __len__(self):
+		return len(self.millis)
+
+	#======================================
+	def latestHourKey(self):
+		"""
+		Returns the hour key of the most recent hour, or None when empty.
+		"""
+		if len(self.bucket_keys) == 0:
+			return None
+		return int(self.bucket_keys[-1])
+
+	#======================================
+	def previousHourKey(self, key):
+		"""
+		Returns the closest populated hour key before the given key, or None.
+		"""
+		position = numpy.searchsorted(self.bucket_keys, key)
+		if position == 0:
+			return None
+		return int(self.bucket_keys[position - 1])
+
+	#======================================
+	def hourPrices(self, key):
+		"""
+		Returns the prices of one hour bucket, newest sample first.
+
+		Args:
+			key (int): Hour key as used by parseComedData().
+
+		Returns:
+			numpy.ndarray: Prices in the bucket (empty when the key is absent).
+		"""
+		position = numpy.searchsorted(self.bucket_keys, key)
+		if position >= len(self.bucket_keys) or self.bucket_keys[position] != key:
+			return numpy.empty(0, dtype=numpy.float64)
+		start = self._bucket_starts[position]
+		stop = start + self._bucket_counts[position]
+		prices = self.prices[self._bucket_order[start:stop]]
+		return prices
+
+	#======================================
+	def hourMean(self, key, clamp=False):
+		"""
+		Returns the average price of one hour bucket from the hourly index.
+
+		Args:
+			key (int): Hour key as used by parseComedData().
+			clamp (bool): Clamp prices below 1.0c up to 1.0c before averaging.
+
+		Returns:
+			float: Average price, or None when the key is absent.
+		"""
+		if key is None:
+			return None
+		mean = self.hourly.mean(key + self._key_offset, clamp)
+		return mean
+
+	#======================================
+	def hourStd(self, key):
+		"""
+		Returns the standard deviation of one hour bucket, or None when absent.
+		"""
+		if key is None:
+			return None
+		std = self.hourly.std(key + self._key_offset)
+		return std
+
+	#======================================
+	def hourlyAverages(self):
+		"""
+		Returns the average price of every hour bucket.
+
+		Returns:
+			tuple: (keys, averages) arrays, oldest hour first.
+		"""
+		keys = self.hourly.hour_ids - self._key_offset
+		averages = self.hourly.means()
+		return keys, averages
+
+	#======================================
+	def latestMillis(self):
+		"""
+		Returns the newest timestamp in milliseconds, or None when empty.
+		"""
+		if len(self.millis) == 0:
+			return None
+		return int(self.millis.max())
+
+	#======================================
+	def withNewerSamples(self, millis, prices, window_millis=None):
+		"""
+		Returns a new series with samples newer than this one prepended.
+
+		Samples at or before latestMillis() are dropped, so overlapping
+		incremental downloads merge cleanly.
+
+		Args:
+			millis (array-like): UTC timestamps in milliseconds, any order.
+			prices (array-like): Prices in cents per kWh, same order as millis.
+			window_millis (int, optional): Keep only samples within this span of
+				the newest sample. Defaults to None (keep everything).
+
+		Returns:
+			ComedPriceSeries: Merged series, newest sample first.
+		"""
+		millis = numpy.asarray(millis, dtype=numpy.int64)
+		prices = numpy.asarray(prices, dtype=numpy.float64)
+		if len(self.millis) > 0:
+			newer = millis > self.latestMillis()
+			millis = millis[newer]
+			prices = prices[newer]
+		# newest first, matching the feed order
+		order = numpy.argsort(-millis, kind='stable')
+		merged_millis = numpy.concatenate((millis[order], self.millis))
+		merged_prices = numpy.concatenate((prices[order], self.prices))
+		# fold only the new samples into the hourly aggregates
+		merged_hour_ids = numpy.concatenate((localSeconds(millis[order]) // 3600, self.hour_ids))
+		hourly = self.hourly.withSamples(merged_hour_ids[:len(millis)], merged_prices[:len(millis)])
+		if window_millis is not None and len(merged_millis) > 0:
+			keep = merged_millis >= merged_millis[0] - window_millis
+			if not numpy.all(keep):
+				# rebuild the hours that lost samples from what is left of them
+				trimmed_hours = numpy.unique(merged_hour_ids[~keep])
+				refill = keep & numpy.isin(merged_hour_ids, trimmed_hours)
+				hourly = hourly.withoutHours(trimmed_hours)
+				hourly = hourly.withSamples(merged_hour_ids[refill], merged_prices[refill])
+			merged_millis = merged_millis[keep]
+			merged_prices = merged_prices[keep]
+		series = ComedPriceSeries(merged_millis, merged_prices, hourly)
+		return series
+
+	#======================================
+	def toHourDict(self):
+		"""
+		Builds the legacy parseComedData() dictionary from the buckets.
+
+		Each hour is stored under its integer key and again under key - 0.99,
+		which makes step plots look continuous near the hour boundary.
+
+		Returns:
+			dict: Hour keys mapped to lists of prices, newest sample first.
+		"""
+		yvalues = {}
+		for key in self.bucket_keys:
+			hour = int(key)
+			ylist = self.hourPrices(hour).tolist()
+			yvalues[hour] = ylist
+			yvalues[float(hour) - 0.99] = list(ylist)
+		return yvalues
+
+#======================================
+#======================================
+class FeedRecords(collections.abc.Sequence):
+	"""
+	Read-only list of {'millisUTC', 'price'} dictionaries backed by feed columns.
+
+	readFeed() returns one of these instead of building a dictionary per
+	sample: the rate accessors only use the parsed series, so the
+	dictionaries are made on first access, and only for callers that
+	still index or iterate the raw records. Indexing, slicing, iteration,
+	len() and + behave like the list from a JSON download.
+	"""
+
+	#======================================
+	def __init__(self, millis, prices):
+		"""
+		Args:
+			millis (numpy.ndarray): Timestamps in milliseconds, newest first.
+			prices (numpy.ndarray): Prices in cents per kWh, same order.
+		"""
+		self.millis = millis
+		self.prices = prices
+		self._records = None
+
+	#======================================
+	def _recordList(self):
+		"""
+		Builds the dictionaries once, for callers that walk all of them.
+		"""
+		if self._records is None:
+			self._records = [{'millisUTC': ms, 'price': price}
+				for ms, price in zip(self.millis.tolist(), self.prices.tolist())]
+		return self._records
+
+	#======================================
+	def __len__(self):
+		return len(self.millis)
+
+	#======================================
+	def __getitem__(self, index):
+		if self._records is not None or isinstance(index, slice):
+			return self._recordList()[index]
+		# a single record, e.g. data[0] for the newest sample
+		return {'millisUTC': int(self.millis[index]), 'price': float(self.prices[index])}
+
+	#======================================
+	def __iter__(self):
+		return iter(self._recordList())
+
+	#======================================
+	def __add__(self, other):
+		return self._recordList() + list(other)
+
+	#======================================
+	def __radd__(self, other):
+		return list(other) + self._recordList()
+
+	#======================================
+	def __eq__(self, other):
+		if not isinstance(other, collections.abc.Sequence):
+			return NotImplemented
+		return len(self) == len(other) and list(self) == list(other)
+
+	#======================================
+	def __repr__(self):
+		return f"FeedRecords({len(self)} samples)"
+
+#======================================
+def _versionStamp(newest_millis, count):
+	"""
+	Builds the data-version stamp for a feed download.
+
+	The feed is ordered newest first, so the stamp only needs the first
+	timestamp and the sample count; any new 5-minute sample changes it.
+
+	Args:
+		newest_millis (int): Timestamp of the first (newest) sample, or None.
+		count (int): Number of samples.
+
+	Returns:
+		tuple: (newest_millis, count) stamp.
+	"""
+	if newest_millis is not None:
+		newest_millis = int(newest_millis)
+	stamp = (newest_millis, count)
+	return stamp
+
+#======================================
+def dataVersion(data):
+	"""
+	Returns the data-version stamp of a raw feed list without parsing it.
+
+	Args:
+		data (list): Raw JSON data as a list of dictionaries, newest first.
+
+	Returns:
+		tuple: (newest millisUTC, sample count) stamp.
+	"""
+	if len(data) == 0:
+		return _versionStamp(None, 0)
+	stamp = _versionStamp(data[0]['millisUTC'], len(data))
+	return stamp
+
+#======================================
+def rawColumns(data):
+	"""
+	Converts a raw feed list into timestamp and price columns.
+
+	Args:
+		data (list): Raw JSON data as a list of {'millisUTC', 'price'} dictionaries.
+
+	Returns:
+		tuple: (millis, prices) int64 and float64 arrays in list order.
+	"""
+	if isinstance(data, FeedRecords):
+		# already columns, no dictionaries to walk
+		return data.millis, data.prices
+	count = len(data)
+	millis = numpy.fromiter((int(p['millisUTC']) for p in data), dtype=numpy.int64, count=count)
+	prices = numpy.fromiter((float(p['price']) for p in data), dtype=numpy.float64, count=count)
+	return millis, prices
+
+#======================================
+def _backoffDelay(attempt, base_seconds, max_seconds):
+	"""
+	Returns a full-jitter exponential backoff delay.
+
+	Args:
+		attempt (int): Number of failed attempts so far, starting at 1.
+		base_seconds (float): Delay scale of the first retry.
+		max_seconds (float): Cap on the delay scale.
+
+	Returns:
+		float: Seconds to sleep, uniform in [0, min(max, base * 2**attempt)].
+	"""
+	ceiling = min(max_seconds, base_seconds * 2 ** attempt)
+	delay = random.uniform(0, ceiling)
+	return delay
+
+#======================================
+def _medianAndStd(parray):
+	"""
+	Returns the 75th percentile (used as median) and standard deviation of prices.
+	"""
+	median = numpy.percentile(parray, 75)
+	std = numpy.std(parray)
+	return median, std
+
+#======================================
+def localSeconds(millis):
+	"""
+	Converts UTC timestamps to local wall-clock seconds since the epoch.
+
+	Local UTC offsets are looked up once per distinct quarter hour instead of
+	calling time.localtime() for every sample. The result divides cleanly into
+	local days (// 86400), hours of day ((// 3600) % 24) and minutes.
+
+	Args:
+		millis (numpy.ndarray): UTC timestamps in milliseconds.
+
+	Returns:
+		numpy.ndarray: Local seconds as int64, same order as millis.
+	"""
+	millis = numpy.asarray(millis, dtype=numpy.int64)
+	if len(millis) == 0:
+		return numpy.empty(0, dtype=numpy.int64)
+	seconds = millis // 1000
+	# DST transitions fall on quarter-hour boundaries in every real time zone
+	quarters, inverse = numpy.unique(seconds // 900, return_inverse=True)
+	offsets = numpy.fromiter(
+		(time.localtime(int(q) * 900).tm_gmtoff for q in quarters),
+		dtype=numpy.int64, count=len(quarters))
+	local_seconds = seconds + offsets[inverse.reshape(-1)]
+	return local_seconds
+
+#======================================
+def reasonableCutOff(median, std, hour, weekday):
+	"""
+	Computes the reasonable cutoff price from price statistics and local time.
+
+	Blends a fixed 10.1c anchor (1/3) with the data-driven cutoff
+	median + sqrt(std)/5 (2/3), then adds the weekend, late-night and
+	peak-solar bonuses, with a floor of 1.0c. Works element-wise on numpy
+	arrays, so backtests can evaluate every time step at once.
+
+	Args:
+		median (float or numpy.ndarray): 75th percentile price (see getMedianComedRate()).
+		std (float or numpy.ndarray): Standard deviation of prices.
+		hour (int or numpy.ndarray): Local hour of day, 0-23.
+		weekday (int or numpy.ndarray): Local weekday, Monday is 0.
+
+	Returns:
+		float or numpy.ndarray: The reasonable cutoff price.
+	"""
+	hour = numpy.asarray(hour)
+	weekday = numpy.asarray(weekday)
+	default_cutoff = median + numpy.sqrt(std) / 5.0
+	cutoff = (CHARGING_CUTOFF_PRICE + 2 * default_cutoff) / 3.0
+	cutoff = cutoff + numpy.where(weekday >= 5, WEEKEND_BONUS, 0.0)
+	cutoff = cutoff + numpy.where((hour >= 23) | (hour <= 5), LATE_NIGHT_BONUS, 0.0)
+	solar_adjust = numpy.exp(-1 * (hour - 12) ** 2 / 6.3) * PEAK_SOLAR_BONUS
+	cutoff = cutoff + numpy.where((hour >= 6) & (hour <= 20), solar_adjust, 0.0)
+	cutoff = numpy.maximum(cutoff, 1.0)
+	if numpy.ndim(cutoff) == 0:
+		return float(cutoff)
+	return cutoff
+
+#======================================
+def nextPublicationSeconds(latest_seconds, now_seconds, interval_seconds=SAMPLE_INTERVAL_SECONDS,
+		lag_seconds=PUBLISH_LAG_SECONDS, retry_seconds=LATE_RETRY_SECONDS):
+	"""
+	Returns when the 5-minute sample after latest_seconds should be published.
+
+	Args:
+		latest_seconds (float): Timestamp of the newest known sample, or None.
+		now_seconds (float): Current time in seconds since epoch.
+		interval_seconds (float): Time between samples.
+		lag_seconds (float): Delay between the end of an interval and its publication.
+		retry_seconds (float): Shortest wait while the next sample is overdue or unknown;
+			the wait grows with the delay, up to one interval.
+
+	Returns:
+		float: Time in seconds since epoch to look for the next sample.
+	"""
+	if latest_seconds is None:
+		return now_seconds + retry_seconds
+	expected_seconds = latest_seconds + interval_seconds + lag_seconds
+	if expected_seconds <= now_seconds:
+		overdue_seconds = now_seconds - expected_seconds
+		return now_seconds + min(max(retry_seconds, overdue_seconds / 2.0), interval_seconds)
+	return expected_seconds
+
+#======================================
+def writeJsonAtomic(path, payload):
+	"""
+	Writes JSON to a file atomically, safe against concurrent writers.
+
+	Each call writes its own temporary file next to the target and renames
+	it into place, so readers never see a partial file and two writers
+	never rename the other's temporary file away.
+
+	Args:
+		path (str): File to replace.
+		payload (object): JSON-serializable value.
+	"""
+	directory = os.path.dirname(path) or "."
+	handle, tmp_file = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+	try:
+		# mkstemp files are private; keep the usual permissions of a cache file
+		os.fchmod(handle, 0o644)
+		with os.fdopen(handle, "w") as file:
+			json.dump(payload, file)
+		os.replace(tmp_file, path)
+	except BaseException:
+		if os.path.exists(tmp_file):
+			os.remove(tmp_file)
+		raise
+
+#======================================
+def _localMinutesSinceNewestMidnight(millis):
+	"""
+	Converts UTC timestamps to local minutes since midnight of the first sample.
+
+	Local UTC offsets are looked up once per distinct quarter hour instead of
+	calling time.localtime() for every sample. Minutes are truncated, matching
+	the tm_hour + tm_min / 60 convention used by the rest of this module.
+
+	Args:
+		millis (numpy.ndarray): UTC timestamps in milliseconds, newest first.
+
+	Returns:
+		numpy.ndarray: Minutes since local midnight of the first sample; samples
+			from earlier days are negative.
+	"""
+	local_minutes = _minutesSinceNewestMidnight(localSeconds(millis))
+	return local_minutes
+
+#======================================
+def _minutesSinceNewestMidnight(local_seconds):
+	"""
+	Converts local seconds (see localSeconds()) to minutes since local
+	midnight of the first sample; samples from earlier days are negative.
+	"""
+	if len(local_seconds) == 0:
+		return numpy.empty(0, dtype=numpy.int64)
+	local_days = local_seconds // 86400
+	local_minutes = (local_seconds % 86400) // 60
+	# samples from earlier local days count back from the newest sample's midnight
+	day_shift_minutes = (local_days - local_days[0]) * 1440
+	local_minutes = local_minutes + day_shift_minutes
+	return local_minutes
 
 #======================================
 #======================================
@@ -34,61 +738,417 @@ class ComedLib(object):
 			except PermissionError:
 				print(f"WARNING: Could not set permissions for {self.cache_file}")
 
-		self.cache_expiry_seconds = 240  # Cache expiry time in seconds
-		#scriptdir = os.path.dirname(__file__)
-		self.baseurl = "https://hourlypricing.comed.com/api?type=5minutefeed"
-		self.parsed_data_cache = None  # In-memory cache for parsed data
-		self.raw_data_cache = None  # In-memory cache for raw data
+		self.cache_expiry_seconds = 240  # Cache expiry time in seconds
+		# download retries: jittered exponential backoff inside one overall deadline
+		self.download_deadline_seconds = 15.0
+		self.request_timeout_seconds = 1.0
+		self.backoff_base_seconds = 0.5
+		self.backoff_max_seconds = 4.0
+		# after a failed download, serve data up to this old ...
+		self.stale_fallback_seconds = 1800
+		# ... and wait this long before trying the network again
+		self.failure_holdoff_seconds = 60
+		self.fallback_until = None  # time.time() until which a fallback is reused
+		# client mode: read prices published by scripts/comed_feed_daemon.py when fresh
+		self.useFeed = True
+		self.feed_file = comed_feed.DEFAULT_FEED_FILE
+		#scriptdir = os.path.dirname(__file__)
+		self.baseurl = "https://hourlypricing.comed.com/api?type=5minutefeed"
+		# day-ahead hourly prices, published once a day
+		self.dayahead_url = "https://hourlypricing.comed.com/api?type=daynexttoday"
+		self.dayahead_cache_file = "/tmp/comed_dayahead_cache.json"  # nosec B108
+		self.dayahead_cache_seconds = 3600
+		self.dayahead_cache = None  # (fetch time, hour starts, prices) in memory
+		# incremental mode: poll only for samples newer than the in-memory series,
+		# with a full download at least once per resync interval
+		self.useIncremental = True
+		self.incremental_resync_seconds = 3600
+		self.last_full_download = None  # time of the last full feed download
+		self.feed_window_millis = None  # time span covered by a full feed download
+		self.http_validators = {}  # ETag and Last-Modified of the last feed response
+		# append every downloaded sample to the durable price archive; off by
+		# default so read-only users (CGI pages) never write to it, the feed
+		# publisher, supervisor, WeMo app and backfill script turn it on
+		self.useArchive = False
+		self.archive_file = comed_archive.DEFAULT_ARCHIVE_FILE
+		# hourly price forecaster behind getPredictedRate(); assign a trained one
+		# with comed_forecast.load_forecaster() to replace the default heuristic
+		self.forecaster = comed_forecast.HeuristicForecaster()
+		self.price_series_cache = None  # In-memory cache for the parsed price series
+		self.raw_data_cache = None  # In-memory cache for raw data
+		# Statistics derived from the current series, replaced as a whole when
+		# the data version changes so no stale value can outlive its data
+		self.derived_cache = {'version': None, 'values': {}}
+		# one ComedLib can be shared by threads (scripts/energy_supervisor.py):
+		# downloads and cache updates hold this lock, so they run one at a time
+		self.lock = threading.RLock()
+
+	#======================================
+	def downloadComedJsonData(self, url=None):
+		"""
+		Downloads the ComEd JSON data. Uses in-memory cache if available and valid,
+		otherwise attempts to read the shared price feed, then the persistent cache,
+		and finally downloads fresh data.
+
+		Args:
+			url (str, optional): URL to download the JSON data from. Defaults to None.
+
+		Returns:
+			list: JSON data as a list of dictionaries, or None if download or parsing fails.
+		"""
+		with self.lock:
+			# Try to use in-memory cache first
+			if self.raw_data_cache:
+				data_age = time.time() - self.raw_data_cache['timestamp']
+				if data_age < self.cache_expiry_seconds:
+					if self.debug:
+						print(f".. Using comed data from in-memory cache .. age {data_age:.1f} seconds")
+					return self.raw_data_cache['data']
+				# a download just failed: reuse the fallback during the holdoff
+				if self.fallback_until is not None and time.time() < self.fallback_until:
+					return self.raw_data_cache['data']
+
+			# Try the shared feed, which needs no download and no JSON parsing
+			if self.useFeed and (url is None or url == self.baseurl):
+				data = self.readFeed()
+				if data:
+					if self.debug:
+						print(f".. Using comed data from shared feed {self.feed_file}")
+					self.raw_data_cache = {'data': data, 'timestamp': time.time()}  # Update in-memory cache
+					return data
+
+			# Try to read from persistent cache
+			entry = self._readCacheEntry()
+			if entry is not None:
+				if self.debug:
+					print(".. Using comed data from persistent cache")
+				# keep the time of the original download, not of this read
+				self.raw_data_cache = entry
+				return entry['data']
+
+			# Download new data if cache is not available or expired.
+			data = self.refreshComedJsonData(url)
+			return data
+
+	#======================================
+	def refreshComedJsonData(self, url=None, fallback=True):
+		"""
+		Always downloads fresh ComEd JSON data and updates the caches.
+
+		For the default feed URL, an incremental download of only the newest
+		samples is tried first; see incrementalRefresh(). All attempts share one
+		deadline of download_deadline_seconds, so the call returns within a
+		bounded time even when ComEd is slow or unreachable.
+
+		Args:
+			url (str, optional): URL to download the JSON data from. Defaults to None.
+			fallback (bool, optional): Return last-known-good data when the download
+				fails instead of raising. Defaults to True.
+
+		Returns:
+			list: JSON data as a list of dictionaries, or None if download or parsing
+				fails and no last-known-good data is available.
+
+		Raises:
+			RuntimeError: If the download deadline expires and fallback is False.
+		"""
+		with self.lock:
+			deadline = time.monotonic() + self.download_deadline_seconds
+			try:
+				data = self._downloadFreshData(url, deadline)
+			except RuntimeError as error:
+				if not fallback:
+					raise
+				print(f"WARNING: {error}")
+				data = None
+			if data is None and fallback:
+				data = self.lastKnownGoodData()
+			return data
+
+	#======================================
+	def _downloadFreshData(self, url, deadline):
+		"""
+		Downloads fresh data before the deadline and updates the caches.
+
+		Args:
+			url (str): URL to download, or None for the default feed.
+			deadline (float): time.monotonic() value by which to give up.
+
+		Returns:
+			list: JSON data as a list of dictionaries, or None if parsing fails.
+		"""
+		if url is None or url == self.baseurl:
+			data = self.incrementalRefresh(deadline)
+			if data is not None:
+				return data
+		if self.debug:
+			print(".. Downloading new comed data")
+		full_feed = url is None or url == self.baseurl
+		if url is None:
+			url = self.getUrl()
+		resp = self.safeDownloadWebpage(url, deadline=deadline)
+		try:
+			data = json.loads(resp.text)
+		except ValueError:
+			return None
+
+		if full_feed and data:
+			series = self.getPriceSeries(data)
+			self.last_full_download = time.time()
+			self.feed_window_millis = int(series.millis.max() - series.millis.min())
+			self.http_validators = {}
+			self.archiveSamples(series)
+		# Save data to cache
+		self.writeCache(data)
+		self.raw_data_cache = {'data': data, 'timestamp': time.time()}  # Update in-memory cache
+		return data
+
+	#======================================
+	def incrementalRefresh(self, deadline=None):
+		"""
+		Downloads only the samples newer than the in-memory series and merges them.
+
+		Uses the datestart/dateend parameters of the feed, plus ETag and
+		Last-Modified validators when the server sent them, so a poll that finds
+		one new sample transfers and decodes one sample instead of the whole day.
+		Samples that fall out of the window of the last full download are dropped.
+
+		Args:
+			deadline (float, optional): time.monotonic() value by which to give up.
+				Defaults to None (download_deadline_seconds from now).
+
+		Returns:
+			list: Merged JSON data, newest first, or None when a full download
+				is needed (no base series, resync due, or a failed request).
+		"""
+		if not self.useIncremental or self.last_full_download is None:
+			return None
+		if time.time() - self.last_full_download > self.incremental_resync_seconds:
+			return None
+		if self.raw_data_cache is None:
+			return None
+		old_data = self.raw_data_cache['data']
+		series = self.getPriceSeries(old_data)
+		if series is None or len(series) == 0:
+			return None
+
+		url = self.getIncrementalUrl(series.latestMillis())
+		if self.debug:
+			print(f".. Downloading new comed samples from {url}")
+		resp = self.safeDownloadWebpage(url, headers=self.http_validators, deadline=deadline)
+		if resp.status_code == 304:
+			new_data = []
+		elif resp.status_code != 200:
+			return None
+		else:
+			try:
+				new_data = json.loads(resp.text)
+			except ValueError:
+				return None
+			self.http_validators = {}
+			if resp.headers.get('ETag'):
+				self.http_validators['If-None-Match'] = resp.headers['ETag']
+			if resp.headers.get('Last-Modified'):
+				self.http_validators['If-Modified-Since'] = resp.headers['Last-Modified']
+
+		data = self.mergeNewSamples(old_data, new_data)
+		if self.debug:
+			print(f".. Merged {len(new_data)} downloaded samples, {len(data)} total")
+		if data is not old_data:
+			self.writeCache(data)
+			self.archiveSamples(self.getPriceSeries(data))
+		self.raw_data_cache = {'data': data, 'timestamp': time.time()}  # Update in-memory cache
+		return data
+
+	#======================================
+	def mergeNewSamples(self, old_data, new_data):
+		"""
+		Merges newly downloaded samples into existing feed data.
+
+		The merged series is built from the cached arrays of old_data, so the
+		older samples are never parsed again.
+
+		Args:
+			old_data (list): Current raw JSON data, newest first.
+			new_data (list): Downloaded raw JSON data, any order, may overlap.
+
+		Returns:
+			list: Merged raw data, newest first; old_data itself when nothing is new.
+		"""
+		series = self.getPriceSeries(old_data)
+		newest_millis = series.latestMillis()
+		fresh = [p for p in new_data if int(p['millisUTC']) > newest_millis]
+		if not fresh:
+			return old_data
+		fresh.sort(key=lambda p: int(p['millisUTC']), reverse=True)
+		millis, prices = rawColumns(fresh)
+		merged_series = series.withNewerSamples(millis, prices, self.feed_window_millis)
+		# the window only trims the oldest samples, which sit at the end of the list
+		data = (fresh + old_data)[:len(merged_series)]
+		self.price_series_cache = {'data': data, 'series': merged_series}
+		return data
+
+	#======================================
+	def readFeed(self):
+		"""
+		Reads prices from the shared feed if it was published recently.
+
+		The feed arrays become the cached price series directly; the raw
+		records are a FeedRecords view whose dictionaries are only built for
+		callers that still index or iterate them.
+
+		Returns:
+			FeedRecords: Feed data as a read-only list of {'millisUTC', 'price'}
+				dictionaries, or None if the feed is missing, stale or empty.
+		"""
+		with self.lock:
+			feed = comed_feed.read_feed(self.feed_file, self.cache_expiry_seconds)
+			if feed is None:
+				return None
+			millis, prices, _published_seconds = feed
+			if len(millis) == 0:
+				return None
+			series = ComedPriceSeries(millis, prices)
+			data = FeedRecords(millis, prices)
+			self.price_series_cache = {'data': data, 'series': series}
+			return data
+
+	#======================================
+	def publishFeed(self, data=None):
+		"""
+		Publishes the parsed price columns to the shared feed file.
+
+		Args:
+			data (list, optional): Raw JSON data. Defaults to None.
+
+		Returns:
+			ComedPriceSeries: The published series, or None if data unavailable.
+		"""
+		series = self.getPriceSeries(data)
+		if series is None:
+			return None
+		comed_feed.publish_feed(series.millis, series.prices, self.feed_file)
+		if self.debug:
+			print(f".. Published {len(series)} samples to {self.feed_file}")
+		return series
+
+	#======================================
+	def archiveSamples(self, series):
+		"""
+		Appends the samples of a series to the durable price archive.
+
+		Archive failures only print a warning; live control must not depend on it.
+
+		Args:
+			series (ComedPriceSeries): Series to archive.
+
+		Returns:
+			int: Number of new samples written, or 0 when archiving is off or fails.
+		"""
+		if not self.useArchive or series is None or len(series) == 0:
+			return 0
+		try:
+			written = comed_archive.append_samples(series.millis, series.prices, self.archive_file)
+		except (sqlite3.Error, OSError) as error:
+			# stderr: stdout may be a CGI response
+			print(f"WARNING: Could not archive comed prices to {self.archive_file}: {error}", file=sys.stderr)
+			return 0
+		if self.debug:
+			print(f".. Archived {written} new samples to {self.archive_file}")
+		return written
 
 	#======================================
-	def downloadComedJsonData(self, url=None):
+	def getArchivedPrices(self, start_seconds=None, end_seconds=None):
 		"""
-		Downloads the ComEd JSON data. Uses in-memory cache if available and valid,
-		otherwise attempts to read from persistent cache or download fresh data.
+		Returns archived prices for a time range, read from local disk.
 
 		Args:
-			url (str, optional): URL to download the JSON data from. Defaults to None.
+			start_seconds (float, optional): Inclusive start as a Unix time. Defaults
+				to None (oldest archived sample).
+			end_seconds (float, optional): Exclusive end as a Unix time. Defaults to
+				None (newest archived sample).
 
 		Returns:
-			list: JSON data as a list of dictionaries, or None if download or parsing fails.
+			tuple: (millis, prices) numpy arrays, oldest sample first.
 		"""
-		# Try to use in-memory cache first
-		if self.raw_data_cache:
-			data_age = time.time() - self.raw_data_cache['timestamp']
-			if data_age < self.cache_expiry_seconds:
-				if self.debug:
-					print(f".. Using comed data from in-memory cache .. age {data_age:.1f} seconds")
-				return self.raw_data_cache['data']
-		self.parsed_data_cache = None
-
-		# Try to read from persistent cache
-		data = self.readCache()
-		if data:
-			if self.debug:
-				print(".. Using comed data from persistent cache")
-			self.raw_data_cache = {'data': data, 'timestamp': time.time()}  # Update in-memory cache
-			return data
+		start_millis = None if start_seconds is None else int(start_seconds * 1000)
+		end_millis = None if end_seconds is None else int(end_seconds * 1000)
+		columns = comed_archive.query_range(start_millis, end_millis, self.archive_file)
+		return columns
 
-		# Download new data if cache is not available or expired.
-		if self.debug:
-			print(".. Downloading new comed data")
-		if url is None:
-			url = self.getUrl()
-		resp = self.safeDownloadWebpage(url)
-		try:
-			data = json.loads(resp.text)
-		except ValueError:
+	#======================================
+	def getPriceSeries(self, data=None):
+		"""
+		Returns the columnar price series for the data, parsing it only once.
+
+		The series is cached with its data-version stamp (newest millisUTC plus
+		sample count), so every rate accessor called on the same download shares
+		one parse, and a different download always gets a fresh series.
+
+		Args:
+			data (list, optional): Raw JSON data as a list of dictionaries. Defaults to None.
+
+		Returns:
+			ComedPriceSeries: Parsed series, or None if data unavailable.
+		"""
+		with self.lock:
+			if data is None:
+				data = self.downloadComedJsonData()
+			if data is None:
+				return None
+			cached_series = self._lookupSeries(data)
+			if cached_series is not None:
+				return cached_series
+			if self.price_series_cache is not None:
+				version = dataVersion(data)
+				if self.price_series_cache['series'].version == version:
+					# same content re-read from a cache, keep the parsed series
+					self.price_series_cache = {'data': data, 'series': self.price_series_cache['series']}
+					return self.price_series_cache['series']
+			series = ComedPriceSeries.fromRawData(data)
+			self.price_series_cache = {'data': data, 'series': series}
+			return series
+
+	#======================================
+	def _lookupSeries(self, data):
+		"""
+		Returns the cached series when it was built from this exact list, else None.
+		"""
+		if self.price_series_cache is None:
 			return None
+		if self.price_series_cache['data'] is not data:
+			return None
+		return self.price_series_cache['series']
 
-		# Save data to cache
-		self.writeCache(data)
-		self.raw_data_cache = {'data': data, 'timestamp': time.time()}  # Update in-memory cache
-		return data
+	#======================================
+	def _derivedValue(self, series, name, compute, *args):
+		"""
+		Memoizes a statistic derived from a price series.
+
+		All memoized values share the data-version stamp of the series they came
+		from. When a series with a new stamp arrives the whole value table is
+		swapped out in one assignment, invalidating every statistic together.
+
+		Args:
+			series (ComedPriceSeries): Series the value is derived from.
+			name (hashable): Cache key for the value.
+			compute (callable): Function that computes the value from args.
+
+		Returns:
+			object: Cached or freshly computed value.
+		"""
+		with self.lock:
+			if self.derived_cache['version'] != series.version:
+				self.derived_cache = {'version': series.version, 'values': {}}
+			values = self.derived_cache['values']
+			if name not in values:
+				values[name] = compute(*args)
+			return values[name]
 
 	#======================================
 	def parseComedData(self, data=None):
 		"""
-		Parses the ComEd data and caches the result for reuse.
+		Parses the ComEd data into the legacy hour-keyed dictionary.
 
 		Args:
 			data (list, optional): Raw JSON data as a list of dictionaries. Defaults to None.
@@ -96,37 +1156,10 @@ class ComedLib(object):
 		Returns:
 			dict: Dictionary with hours as keys and lists of prices as values.
 		"""
-		if data is None:
-			data = self.downloadComedJsonData()
-		if self.parsed_data_cache is not None:
-			return self.parsed_data_cache  # Use cached parsed data
-
-		yvalues = {}
-		day = None
-		for p in data:
-			ms = int(p['millisUTC'])
-			price = float(p['price'])
-			timestruct = list(time.localtime(ms / 1000.))
-			if day is None:
-				day = timestruct[2]
-
-			hours = timestruct[3] + timestruct[4] / 60.
-			#print(f"{hours:.2f}<br/>")
-			if timestruct[2] != day:
-				hours -= 24.
-			# Duplicate each hour near the boundary to make step plots look continuous.
-			hour = int(hours) + 1
-			hour2 = float(hour) - 0.99
-			if hour in yvalues:
-				yvalues[hour].append(price)
-				yvalues[hour2].append(price)
-			else:
-				yvalues[hour] = [price]
-				yvalues[hour2] = [price]
-
-		# Cache the parsed data for reuse
-		self.parsed_data_cache = yvalues
-		#print(f"{yvalues.keys()}<br/>")
+		series = self.getPriceSeries(data)
+		if series is None:
+			return None
+		yvalues = self._derivedValue(series, 'hour_dict', series.toHourDict)
 		return yvalues
 
 	#======================================
@@ -138,26 +1171,45 @@ class ComedLib(object):
 			return
 
 		cache_data = {
-			"data": data,
+			# json only writes real lists, not FeedRecords
+			"data": list(data),
 			"timestamp": int(time.time())
 		}
-		# Atomic write to avoid partial reads during updates.
-		tmp_file = f"{self.cache_file}.tmp"
-		with open(tmp_file, "w") as file:
-			json.dump(cache_data, file)
-		os.replace(tmp_file, self.cache_file)
+		writeJsonAtomic(self.cache_file, cache_data)
 
 		if self.debug:
 			print(f".. Saved cache to {self.cache_file}")
 
 	#======================================
-	def readCache(self):
+	def readCache(self, max_age_seconds=None):
 		"""
 		Reads data from the persistent cache if available and valid.
 
+		Args:
+			max_age_seconds (float, optional): Oldest cache to accept. Defaults to
+				None (cache_expiry_seconds).
+
 		Returns:
 			list: Cached JSON data as a list of dictionaries, or None if cache is invalid or not present.
 		"""
+		entry = self._readCacheEntry(max_age_seconds)
+		if entry is None:
+			return None
+		return entry['data']
+
+	#======================================
+	def _readCacheEntry(self, max_age_seconds=None):
+		"""
+		Reads the persistent cache with the time its data was downloaded.
+
+		Args:
+			max_age_seconds (float, optional): Oldest cache to accept. Defaults to
+				None (cache_expiry_seconds).
+
+		Returns:
+			dict: {'data', 'timestamp'} like raw_data_cache, or None if the cache
+				is invalid, expired or not present.
+		"""
 		if not self.useCache:
 			return None
 		# Check if file exists
@@ -169,47 +1221,95 @@ class ComedLib(object):
 		if "timestamp" not in cache_data or "data" not in cache_data:
 			return None
 		# Check if cache is expired
-		if time.time() - cache_data["timestamp"] > self.cache_expiry_seconds:
+		if max_age_seconds is None:
+			max_age_seconds = self.cache_expiry_seconds
+		if time.time() - cache_data["timestamp"] > max_age_seconds:
+			return None
+		if not cache_data["data"]:
 			return None
 		if self.debug:
 			print(f".. Using cached data from {self.cache_file}")
-		return cache_data["data"]
+		return {'data': cache_data["data"], 'timestamp': cache_data["timestamp"]}
 
 	#======================================
-	def safeDownloadWebpage(self, url):
+	def safeDownloadWebpage(self, url, headers=None, deadline=None):
 		"""
-		Safely downloads a webpage with retry logic for handling network errors.
+		Downloads a webpage, retrying with jittered exponential backoff until a deadline.
+
+		Every attempt and every sleep is clipped to the time left, so the call
+		never blocks past the deadline. Timeouts, connection errors and SSL
+		errors are all retried; after an SSLError, verification is disabled
+		for the remaining attempts.
 
 		Args:
 			url (str): URL to download.
+			headers (dict, optional): Extra request headers. Defaults to None.
+			deadline (float, optional): time.monotonic() value by which to give up.
+				Defaults to None (download_deadline_seconds from now).
 
 		Returns:
 			requests.Response: HTTP response object.
 
-		Exits:
-			Exits the program if too many failures occur during download.
+		Raises:
+			RuntimeError: If no response arrived before the deadline.
 		"""
-		fails = 0
+		# imported on first download so clients served by the shared feed
+		# never load requests
+		import requests
+		from energylib import httpclient
+		if deadline is None:
+			deadline = time.monotonic() + self.download_deadline_seconds
+		attempt = 0
 		verify = True
-		while(fails < 9):
-			try:
-				resp = requests.get(url, timeout=1, verify=verify)
+		while True:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
 				break
-			except requests.exceptions.ReadTimeout:
-				fails += 1
-				time.sleep(random.random() + fails**2)
-				continue
-			except requests.exceptions.ConnectTimeout:
-				fails += 2
-				time.sleep(random.random() + fails**2)
-				continue
+			try:
+				timeout = min(self.request_timeout_seconds, remaining)
+				# this loop is the only retry layer, so the deadline holds
+				resp = httpclient.get(url, headers=headers, timeout=timeout, verify=verify, retry=False)
+				return resp
 			except requests.exceptions.SSLError:
-				fails += 1
 				verify = False
-		if fails >= 9:
-			# Raise to let callers decide whether to retry or continue.
-			raise RuntimeError("ERROR: too many failed requests")
-		return resp
+			except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+				pass
+			attempt += 1
+			delay = _backoffDelay(attempt, self.backoff_base_seconds, self.backoff_max_seconds)
+			if delay >= deadline - time.monotonic():
+				break
+			time.sleep(delay)
+		# Raise to let callers decide whether to retry or fall back.
+		raise RuntimeError(f"ERROR: no response from {url} after {attempt} attempts")
+
+	#======================================
+	def lastKnownGoodData(self):
+		"""
+		Returns the newest data held from an earlier successful download.
+
+		Used when a download fails, so controllers keep getting an answer. The
+		in-memory copy is tried first, then the persistent cache, each up to
+		stale_fallback_seconds after its download. The fallback keeps its
+		download time; fallback_until makes accessors called during the next
+		failure_holdoff_seconds reuse it instead of each waiting out another
+		download deadline.
+
+		Returns:
+			list: Last-known-good JSON data, or None if nothing recent enough exists.
+		"""
+		entry = None
+		if self.raw_data_cache:
+			data_age = time.time() - self.raw_data_cache['timestamp']
+			if data_age <= self.stale_fallback_seconds:
+				entry = self.raw_data_cache
+		if entry is None:
+			entry = self._readCacheEntry(self.stale_fallback_seconds)
+		if entry is None or not entry['data']:
+			return None
+		print("WARNING: using last-known-good comed data")
+		self.raw_data_cache = entry
+		self.fallback_until = time.time() + self.failure_holdoff_seconds
+		return entry['data']
 
 	#======================================
 	def getUrl(self):
@@ -221,6 +1321,77 @@ class ComedLib(object):
 		"""
 		return self.baseurl
 
+	#======================================
+	def getIncrementalUrl(self, newest_millis, now_seconds=None):
+		"""
+		Returns the feed URL restricted to samples after the given timestamp.
+
+		Args:
+			newest_millis (int): Newest timestamp already held, in milliseconds.
+			now_seconds (float, optional): Current time. Defaults to time.time().
+
+		Returns:
+			str: URL for the time-range request.
+		"""
+		if now_seconds is None:
+			now_seconds = time.time()
+		# end a few minutes ahead so a sample published right now is included
+		url = self.getRangeUrl(newest_millis / 1000.0 + 60, now_seconds + 600)
+		return url
+
+	#======================================
+	def getRangeUrl(self, start_seconds, end_seconds):
+		"""
+		Returns the feed URL for an arbitrary time range.
+
+		The API takes datestart/dateend as yyyyMMddhhmm in ComEd local time,
+		which is the local time of the hosts this library runs on.
+
+		Args:
+			start_seconds (float): Range start as a Unix time.
+			end_seconds (float): Range end as a Unix time.
+
+		Returns:
+			str: URL for the time-range request.
+		"""
+		start = time.strftime('%Y%m%d%H%M', time.localtime(start_seconds))
+		end = time.strftime('%Y%m%d%H%M', time.localtime(end_seconds))
+		url = f"{self.baseurl}&datestart={start}&dateend={end}"
+		return url
+
+	#======================================
+	def downloadRange(self, start_seconds, end_seconds):
+		"""
+		Downloads the 5-minute prices of a past time range.
+
+		Does not touch the live caches, so it is safe to call from worker threads.
+
+		Args:
+			start_seconds (float): Inclusive range start as a Unix time.
+			end_seconds (float): Exclusive range end as a Unix time.
+
+		Returns:
+			tuple: (millis, prices) numpy arrays, newest first, or None if the
+				response could not be parsed.
+
+		Raises:
+			RuntimeError: If no response arrived before the download deadline.
+		"""
+		url = self.getRangeUrl(start_seconds, end_seconds)
+		resp = self.safeDownloadWebpage(url)
+		if resp.status_code != 200:
+			return None
+		try:
+			data = json.loads(resp.text)
+		except ValueError:
+			return None
+		millis, prices = rawColumns(data)
+		# minute resolution of the API can return a boundary sample on either side
+		keep = (millis >= int(start_seconds * 1000)) & (millis < int(end_seconds * 1000))
+		order = numpy.argsort(-millis[keep], kind='stable')
+		columns = (millis[keep][order], prices[keep][order])
+		return columns
+
 	#======================================
 	def getHourUrl(self):
 		"""
@@ -231,6 +1402,138 @@ class ComedLib(object):
 		"""
 		return self.getUrl()
 
+	#======================================
+	def getDayAheadUrl(self):
+		"""
+		Returns the URL of the day-ahead hourly prices.
+
+		Returns:
+			str: URL for the day-ahead feed.
+		"""
+		return self.dayahead_url
+
+	#======================================
+	def parseDayAheadData(self, data):
+		"""
+		Converts a day-ahead response into hourly columns.
+
+		The feed has been seen both as {'millisUTC', 'price'} records and as
+		[millis, price] pairs; millis marks the start of each priced hour.
+
+		Args:
+			data (list): Parsed JSON response.
+
+		Returns:
+			tuple: (hour_start_seconds, prices) numpy arrays, oldest first.
+		"""
+		if len(data) > 0 and isinstance(data[0], dict):
+			millis, prices = rawColumns(data)
+		else:
+			pairs = numpy.asarray(data, dtype=numpy.float64).reshape(-1, 2)
+			millis = pairs[:, 0].astype(numpy.int64)
+			prices = pairs[:, 1]
+		order = numpy.argsort(millis, kind='stable')
+		hour_start_seconds = millis[order] // 1000
+		return hour_start_seconds, prices[order]
+
+	#======================================
+	def getDayAheadPrices(self, max_age_seconds=None):
+		"""
+		Returns ComEd's day-ahead hourly prices, cached in memory and on disk.
+
+		Args:
+			max_age_seconds (float, optional): Oldest cached schedule to accept.
+				Defaults to None (dayahead_cache_seconds).
+
+		Returns:
+			tuple: (hour_start_seconds, prices) numpy arrays, oldest first, or
+				None when no schedule could be downloaded or read from cache.
+		"""
+		with self.lock:
+			if max_age_seconds is None:
+				max_age_seconds = self.dayahead_cache_seconds
+			now = time.time()
+			if self.dayahead_cache is not None and now - self.dayahead_cache[0] <= max_age_seconds:
+				return self.dayahead_cache[1], self.dayahead_cache[2]
+			if self.useCache and os.path.exists(self.dayahead_cache_file):
+				try:
+					with open(self.dayahead_cache_file, "r") as file:
+						cache_data = json.load(file)
+					if now - cache_data["timestamp"] <= max_age_seconds:
+						columns = self.parseDayAheadData(cache_data["data"])
+						self.dayahead_cache = (cache_data["timestamp"], columns[0], columns[1])
+						return columns
+				except (ValueError, KeyError, OSError):
+					pass
+			try:
+				resp = self.safeDownloadWebpage(self.getDayAheadUrl())
+			except RuntimeError as error:
+				print(f"WARNING: day-ahead prices unavailable: {error}")
+				return None
+			if resp.status_code != 200:
+				return None
+			try:
+				data = json.loads(resp.text)
+				columns = self.parseDayAheadData(data)
+			except ValueError:
+				return None
+			self.dayahead_cache = (now, columns[0], columns[1])
+			if self.useCache:
+				writeJsonAtomic(self.dayahead_cache_file, {"data": data, "timestamp": int(now)})
+			return columns
+
+	#======================================
+	def planCheapestHours(self, energy_kwh, power_kw, ready_by_seconds, now_seconds=None):
+		"""
+		Plans a flexible load into the cheapest day-ahead hours before a deadline.
+
+		Hours past the published day-ahead schedule are priced like the same
+		local hour of the last day in the 5-minute feed, so an unpublished
+		night keeps its daily shape; hours missing from the feed get the 75th
+		percentile of the feed (getMedianComedRate()).
+
+		Args:
+			energy_kwh (float): Energy to deliver.
+			power_kw (float): Power drawn while on.
+			ready_by_seconds (float): Deadline as a Unix time.
+			now_seconds (float, optional): Planning start. Defaults to time.time().
+
+		Returns:
+			dict: Plan from charge_planner.plan_cheapest_hours().
+		"""
+		if now_seconds is None:
+			now_seconds = time.time()
+		columns = self.getDayAheadPrices()
+		if columns is None:
+			columns = (numpy.empty(0, dtype=numpy.int64), numpy.empty(0))
+		fallback_price = None
+		if len(columns[0]) == 0 or columns[0][-1] + 3600 < ready_by_seconds:
+			fallback_price = self.getHourOfDayPrices()
+		plan = charge_planner.plan_cheapest_hours(columns[0], columns[1], energy_kwh, power_kw,
+			now_seconds, ready_by_seconds, fallback_price)
+		return plan
+
+	#======================================
+	def getHourOfDayPrices(self, data=None):
+		"""
+		Returns the latest average price of each local hour of the day.
+
+		Args:
+			data (list, optional): Raw JSON data as a list of dictionaries. Defaults to None.
+
+		Returns:
+			numpy.ndarray: 24 prices indexed by local hour; hours without samples
+				get the 75th percentile of the data. None if data unavailable.
+		"""
+		series = self.getPriceSeries(data)
+		if series is None or len(series) == 0:
+			return None
+		median, _std = self.getMedianComedRate(data)
+		prices = numpy.full(24, float(median))
+		# hour ids ascend, so the newest day wins for every hour of day
+		prices[series.hourly.hour_ids % 24] = series.hourly.means()
+		return prices
+
 	#======================================
 	def getCurrentComedRateUnSafe(self, data=None):
 		"""
@@ -242,16 +1545,11 @@ class ComedLib(object):
 		Returns:
 			float: The average rate for the most recent hour, or None if data unavailable.
 		"""
-		if data is None:
-			data = self.downloadComedJsonData()
-		if data is None:
+		series = self.getPriceSeries(data)
+		if series is None:
 			return None
-		yvalues = self.parseComedData(data)
-		x2 = sorted(yvalues.keys())
-		key = x2[-1]
-		ylist = yvalues[key]
-		yarray = numpy.array(ylist, dtype=numpy.float64)
-		return yarray.mean()
+		current_rate = self._derivedValue(series, 'current_unsafe', self._computeCurrentRate, series, False)
+		return current_rate
 
 	#======================================
 	def getCurrentComedRate(self, data=None):
@@ -264,18 +1562,46 @@ class ComedLib(object):
 		Returns:
 			float: The average rate for the most recent hour, or None if data unavailable.
 		"""
-		if data is None:
-			data = self.downloadComedJsonData()
-		if data is None:
+		series = self.getPriceSeries(data)
+		if series is None:
+			return None
+		current_rate = self._derivedValue(series, 'current', self._computeCurrentRate, series, True)
+		return current_rate
+
+	#======================================
+	def _computeCurrentRate(self, series, clamp):
+		"""
+		Averages the most recent hour bucket of a series.
+
+		Args:
+			series (ComedPriceSeries): Parsed price series.
+			clamp (bool): Clamp prices below 1.0c up to 1.0c before averaging.
+
+		Returns:
+			float: Average rate of the most recent hour.
+		"""
+		# clamping extreme negatives/zero keeps the average from skewing too low
+		current_rate = series.hourMean(series.latestHourKey(), clamp)
+		return current_rate
+
+	#======================================
+	def getHourlyAverages(self, data=None):
+		"""
+		Returns the average rate of every hour in the data.
+
+		Args:
+			data (list, optional): Raw JSON data as a list of dictionaries. Defaults to None.
+
+		Returns:
+			dict: Integer hour keys (as in parseComedData()) mapped to average
+				rates, oldest hour first, or None if data unavailable.
+		"""
+		series = self.getPriceSeries(data)
+		if series is None:
 			return None
-		yvalues = self.parseComedData(data)
-		x2 = sorted(yvalues.keys())
-		key = x2[-1]
-		ylist = yvalues[key]
-		yarray = numpy.array(ylist, dtype=numpy.float64)
-		# Clamp extreme negatives/zero to avoid skewing the average too low.
-		ypositive = numpy.where(yarray < 1.0, 1.0, yarray)
-		return ypositive.mean()
+		keys, averages = series.hourlyAverages()
+		hourly_averages = dict(zip(keys.tolist(), averages.tolist()))
+		return hourly_averages
 
 	#======================================
 	def getMostRecentRate(self, data=None):
@@ -289,20 +1615,14 @@ class ComedLib(object):
 			float: The most recent rate, or None if data unavailable.
 		"""
 		if data is None:
-			# retry up to 3 times (downloadComedJsonData has its own retries)
-			for _attempt in range(3):
-				data = self.downloadComedJsonData()
-				if data is not None:
-					break
-		if data is None:
+			# downloadComedJsonData retries within its own deadline
+			data = self.downloadComedJsonData()
+		series = self.getPriceSeries(data)
+		if series is None:
 			return None
-		yvalues = self.parseComedData(data)
-		x2 = list(yvalues.keys())
-		x2.sort()
-		key = x2[-1]
-		ylist = yvalues[key]
+		yarray = series.hourPrices(series.latestHourKey())
 		# Data is newest -> oldest, so index 0 is the most recent sample.
-		return ylist[0]
+		return float(yarray[0])
 
 	#======================================
 	def getLastPriceTimestampSeconds(self, data=None):
@@ -315,15 +1635,10 @@ class ComedLib(object):
 		Returns:
 			float: Most recent timestamp in seconds, or None if unavailable.
 		"""
-		if data is None:
-			data = self.downloadComedJsonData()
-		if not data:
+		series = self.getPriceSeries(data)
+		if series is None:
 			return None
-		latest_ms = None
-		for item in data:
-			item_ms = int(item.get("millisUTC", 0))
-			if latest_ms is None or item_ms > latest_ms:
-				latest_ms = item_ms
+		latest_ms = series.latestMillis()
 		if latest_ms is None:
 			return None
 		latest_seconds = latest_ms / 1000.0
@@ -351,6 +1666,65 @@ class ComedLib(object):
 			age_seconds = 0.0
 		return age_seconds
 
+	#======================================
+	def waitForNewPrice(self, last_price_seconds=None, max_wait_seconds=900.0):
+		"""
+		Blocks until a 5-minute price newer than last_price_seconds is available.
+
+		Sleeps until the next sample is due (see nextPublicationSeconds()), so a
+		controller re-evaluates once per published price instead of polling.
+		With the shared feed it also wakes within a second of every republish,
+		and only downloads from ComEd itself when the feed has gone stale.
+
+		Args:
+			last_price_seconds (float, optional): Newest sample already handled;
+				defaults to the newest sample currently known.
+			max_wait_seconds (float): Longest time to block.
+
+		Returns:
+			float: Timestamp of the newest sample in seconds, unchanged when
+				max_wait_seconds passed first, or None if unavailable.
+		"""
+		now_seconds = time.time()
+		deadline = now_seconds + max_wait_seconds
+		if last_price_seconds is None:
+			last_price_seconds = self.getLastPriceTimestampSeconds()
+		latest_seconds = last_price_seconds
+		stamp = None
+		while now_seconds < deadline:
+			if stamp is None and self.useFeed:
+				stamp = comed_feed.feed_stamp(self.feed_file)
+			wake_seconds = min(nextPublicationSeconds(latest_seconds, now_seconds), deadline)
+			data = None
+			if stamp is not None:
+				new_stamp = comed_feed.wait_for_feed_update(stamp, wake_seconds - now_seconds, self.feed_file)
+				if new_stamp is not None:
+					stamp = new_stamp
+					data = self.readFeed()
+			else:
+				time.sleep(max(wake_seconds - now_seconds, 0.0))
+			now_seconds = time.time()
+			if data is None and now_seconds >= wake_seconds and stamp is not None:
+				# the sample is due: a live feed answers ...
+				data = self.readFeed()
+			if data:
+				# fresh feed data; downloads below keep their own cache times
+				with self.lock:
+					self.raw_data_cache = {'data': data, 'timestamp': now_seconds}
+			elif now_seconds >= wake_seconds:
+				# ... otherwise ask ComEd; a failed download returns last-known-good
+				# data without making it look fresh
+				data = self.refreshComedJsonData()
+			if not data:
+				continue
+			newest_seconds = self.getLastPriceTimestampSeconds(data)
+			if newest_seconds is None:
+				continue
+			if last_price_seconds is None or newest_seconds > last_price_seconds:
+				return newest_seconds
+			latest_seconds = newest_seconds
+		return latest_seconds
+
 	#======================================
 	def isLastPriceFromCurrentHour(self, data=None, now_seconds=None):
 		"""
@@ -378,7 +1752,7 @@ class ComedLib(object):
 	#======================================
 	def getPredictedRate(self, data=None):
 		"""
-		Predicts the future rate based on the current trend using linear regression.
+		Predicts the average rate of the current hour with self.forecaster.
 
 		Args:
 			data (list, optional): Raw JSON data. Defaults to None.
@@ -387,126 +1761,76 @@ class ComedLib(object):
 			float: Predicted future rate, or None if data unavailable.
 		"""
 		if data is None:
-			# retry up to 3 times (downloadComedJsonData has its own retries)
-			for _attempt in range(3):
-				data = self.downloadComedJsonData()
-				if data is not None:
-					break
-		if data is None:
+			# downloadComedJsonData retries within its own deadline
+			data = self.downloadComedJsonData()
+		series = self.getPriceSeries(data)
+		if series is None:
 			return None
-		median, std = self.getMedianComedRate()
-
-		yvalues = self.parseComedData(data)
-		x2 = list(yvalues.keys())
-		x2.sort()
-
-		key = x2[-1]
-		ylist = yvalues[key]
-		yarray = numpy.array(ylist, dtype=numpy.float64)
-		ymean = yarray.mean()
-		ypositive = numpy.where(yarray < 1.0, 1.0, yarray)
-		ystd = ypositive.std()
-		weight = min((8-len(ylist))/8., 1)
-		if abs(key - float(int(key))) < 0.001:
-			if self.debug is True:
-				print((".. %03d:00 -> %2.2f +- %2.2f / %2.2f -> %.1f/%.1f"
-					%(key, ymean, ystd, ystd*weight, yarray.min(), yarray.max())))
-			pass
-		value1 = ymean + math.sqrt(ystd)*weight
-
-		if len(ypositive) > 3:
-			yslopedata = numpy.flip(ypositive, axis=0)
-		else:
-			key2 = x2[-3]
-			ylist2 = yvalues[key2]
-			yarray2 = numpy.array(ylist2, dtype=numpy.float64)
-			ypositive2 = numpy.where(yarray2 < 1.0, 1.0, yarray2)
-			yslopedata = numpy.flip(numpy.hstack((ypositive, ypositive2[:4])), axis=0)
-			xarray = numpy.arange(0,len(yslopedata))
-
-		xarray = numpy.arange(0,len(yslopedata))
-		slope, intercept, r_value, p_value, std_err = stats.linregress(xarray, yslopedata)
-		if self.debug is True:
-			print(yslopedata)
-			print(xarray)
-			print(".. Slope = {0:.3f}".format(slope))
+		# key on the forecaster object, not id(): the key keeps it alive, so a
+		# forecaster assigned later can never reuse its id and hit its value
+		predicted_rate = self._derivedValue(series, ('predicted', self.forecaster),
+			self._computePredictedRate, series)
+		return predicted_rate
 
-		if slope < 0.1:
-			slope = 0.1
-		value2 = (14 - len(yslopedata))*slope/2.0 + yarray.mean()
+	#======================================
+	def _computePredictedRate(self, series):
+		"""
+		Computes the predicted rate of the most recent hour of a series.
 
-		value3 = (yarray.max() + yarray.mean() + yarray[0])/3.0
+		Args:
+			series (ComedPriceSeries): Parsed price series.
 
+		Returns:
+			float: Predicted rate for the most recent hour, from self.forecaster.
+		"""
+		predicted_rate = self.forecaster.predict(series)
 		if self.debug is True:
-			print(".. Value 1 = {0:.3f} (mean + std*weight)".format(value1))
-			print(".. Value 2 = {0:.3f} (slope based)".format(value2))
-			print(".. Value 3 = {0:.3f} (avg of: max, mean, recent)".format(value3))
-		return max(value1, value2, value3)
+			key = series.latestHourKey()
+			yarray = series.hourPrices(key)
+			print((".. %03d:00 -> mean %2.2f, %.1f/%.1f -> %s forecast %.3f"
+				%(key, yarray.mean(), yarray.min(), yarray.max(), self.forecaster.name, predicted_rate)))
+		return predicted_rate
 
 	#======================================
-	def getReasonableCutOff(self):
+	def getReasonableCutOff(self, data=None):
 		"""
 		Calculates a reasonable cutoff price for energy usage based on time of day, day of the week,
 		and solar peak hours. Includes bonuses for weekends and late-night usage.
 
+		Args:
+			data (list, optional): Raw JSON data as a list of dictionaries. Defaults to None.
+
 		Returns:
 			float: The calculated reasonable cutoff price.
 		"""
-		if self.debug:
-			print("\ngetReasonableCutOff():")
-
-		chargingCutoffPrice = 10.1
-		weekendBonus = 0.9
-		lateNightBonus = 0.8
-		peakSolarBonus = 1.5
+		now = datetime.datetime.now()
+		series = self.getPriceSeries(data)
+		if series is None:
+			cutoff = self._computeReasonableCutOff(now, data)
+			return cutoff
+		# the cutoff only depends on the data, the hour and the weekday
+		cache_key = ('cutoff', now.hour, now.weekday())
+		cutoff = self._derivedValue(series, cache_key, self._computeReasonableCutOff, now, data)
+		return cutoff
 
-		# Start calculating the cutoff
-		if self.debug:
-			print(f".. Starting cutoff {chargingCutoffPrice:.2f}c")
+	#======================================
+	def _computeReasonableCutOff(self, now, data=None):
+		"""
+		Computes the reasonable cutoff price for a given local time.
 
-		median, std = self.getMedianComedRate()
+		Args:
+			now (datetime.datetime): Local time used for the time-of-day bonuses.
+			data (list, optional): Raw JSON data as a list of dictionaries. Defaults to None.
 
+		Returns:
+			float: The calculated reasonable cutoff price.
+		"""
+		median, std = self.getMedianComedRate(data)
+		reasonableCutoff = reasonableCutOff(median, std, now.hour, now.weekday())
 		if self.debug:
+			print("\ngetReasonableCutOff():")
 			print(f".. Median Rate {median:.2f} +/- {std:.3f}c")
-
-		# Calculate a default cutoff based on the median and standard deviation
-		defaultCutoff = median + math.sqrt(std) / 5.0
-
-		if self.debug:
-			print(f".. Calculated Cutoff {defaultCutoff:.3f}c")
-
-		reasonableCutoff = (chargingCutoffPrice + 2 * defaultCutoff) / 3.0
-
-		if self.debug:
-			print(f".. Combined Cutoff {reasonableCutoff:.3f}c")
-
-		# Adjust the cutoff for weekends
-		now = datetime.datetime.now()
-		if now.weekday() >= 5:  # Saturday or Sunday
-			if self.debug:
-				print(f".. Sat/Sun weekend bonus of {weekendBonus:.2f}c")
-			reasonableCutoff += weekendBonus
-
-		# Adjust the cutoff for late-night usage
-		if now.hour >= 23 or now.hour <= 5:
-			if self.debug:
-				print(f".. Late night bonus of {lateNightBonus:.2f}c")
-			reasonableCutoff += lateNightBonus
-
-		# Adjust the cutoff for peak solar hours
-		if 6 <= now.hour <= 20:
-			solar_adjust = math.exp(-1 * (now.hour - 12) ** 2 / 6.3) * peakSolarBonus
-			if self.debug:
-				print(f".. Peak solar bonus of {solar_adjust:.2f}c")
-			reasonableCutoff += solar_adjust
-
-		# Ensure the cutoff is not below 1.0
-		if reasonableCutoff < 1.0:
-			reasonableCutoff = 1.0
-
-		if self.debug:
-			print(f".. Final Cutoff {reasonableCutoff:.3f}c")
-
+			print(f".. Final Cutoff {reasonableCutoff:.3f}c (hour {now.hour}, weekday {now.weekday()})")
 		return reasonableCutoff
 
 	#======================================
@@ -520,22 +1844,19 @@ class ComedLib(object):
 		Returns:
 			tuple: A tuple containing the median (75th percentile) and the standard deviation of rates.
 		"""
-		# check cache before downloading or computing
-		if hasattr(self, '_median_cache') and data is None:
-			return self._median_cache
-
-		if data is None:
-			data = self.downloadComedJsonData()
 		if data is None:
-			return (0.0, 0.0)
-
-		prices = [float(item['price']) for item in data]
-		parray = numpy.array(prices, dtype=numpy.float64)
+			series = self.getPriceSeries()
+			if series is None:
+				return (0.0, 0.0)
+		else:
+			series = self._lookupSeries(data)
 
-		# calculate the 75th percentile and standard deviation
-		median = numpy.percentile(parray, 75)
-		std = numpy.std(parray)
-		self._median_cache = (median, std)
+		if series is not None:
+			median, std = self._derivedValue(series, 'median_std', _medianAndStd, series.prices)
+		else:
+			# explicit lists that were never parsed are computed directly
+			parray = numpy.fromiter((float(item['price']) for item in data), dtype=numpy.float64)
+			median, std = _medianAndStd(parray)
 
 		if self.debug:
 			print(f".. 24 hour median price: {median:.3f} +/- {std:.3f}")
@@ -0,0 +1,271 @@
+"""
+Shared Ecobee OAuth token store.
+
+Only the tokens and their expiry times are kept, as JSON keyed by
+thermostat name, instead of a pickle of the whole pyecobee.EcobeeService.
+Every write is a read-modify-write under an exclusive flock on a sidecar
+lock file, finished with an atomic os.replace, so the dashboard, the
+thermostat app and the supervisor can refresh at the same time without
+clobbering each other. refresh_if_needed() re-reads the store under the
+lock before refreshing: when another process already refreshed, its tokens
+are adopted without a round-trip to Ecobee.
+
+Run refresh_if_needed() ahead of expiry from a long-lived process (the
+energy supervisor does) and short-lived consumers always find a valid
+access token in the store.
+
+Permissions: a rewritten store keeps the mode and group of the file it
+replaces; a new store is created 0640. Give the store to a group shared by
+the energy jobs and the web server (for the CGI pages) to let them all read
+it. Writing, refreshing and the sidecar lock need write access to the
+store's directory (/etc/energy). A store that exists but cannot be read or
+parsed raises instead of reading as empty, so no process silently falls
+back to interactive authorization.
+"""
+
+# Standard Library
+import os
+import json
+import fcntl
+import pickle
+import datetime
+import tempfile
+import contextlib
+
+#============================================
+DEFAULT_TOKEN_FILE = "/etc/energy/ecobee_tokens.json"
+# the whole-service pickle written by older versions, migrated on first read
+LEGACY_PICKLE_FILE = "/etc/energy/pyecobee_db.pickle"
+
+TOKEN_FIELDS = (
+	'authorization_token',
+	'access_token',
+	'refresh_token',
+	'access_token_expires_on',
+	'refresh_token_expires_on',
+)
+DATE_FIELDS = ('access_token_expires_on', 'refresh_token_expires_on')
+
+# refresh this long before the access token expires
+DEFAULT_REFRESH_MARGIN_SECONDS = 600
+
+# mode of a newly created store: the owner writes, the group reads
+NEW_FILE_MODE = 0o640
+# the group also takes the lock, so it may write the (empty) lock file
+LOCK_FILE_MODE = 0o660
+
+#============================================
+@contextlib.contextmanager
+def locked(token_file: str = DEFAULT_TOKEN_FILE):
+	"""
+	Hold an exclusive lock on the token store for the duration of the block.
+
+	Raises:
+		PermissionError: when the lock file cannot be created or opened.
+	"""
+	lock_path = token_file + ".lock"
+	try:
+		handle = os.open(lock_path, os.O_RDWR | os.O_CREAT, LOCK_FILE_MODE)
+	except PermissionError as error:
+		raise PermissionError(f"cannot open the token store lock {lock_path}; writing or "
+			f"refreshing Ecobee tokens needs write access to {os.path.dirname(lock_path)}") from error
+	with os.fdopen(handle, "r+") as lock_file:
+		fcntl.flock(lock_file, fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+#============================================
+def _load_store(token_file: str) -> dict:
+	"""
+	Read the whole store; only a missing file is an empty store.
+
+	Raises:
+		PermissionError: when the store exists but cannot be read.
+		ValueError: when the store is not a JSON object.
+	"""
+	try:
+		with open(token_file, "r") as f:
+			store = json.load(f)
+	except FileNotFoundError:
+		return {}
+	except ValueError as error:
+		raise ValueError(f"Ecobee token store {token_file} is damaged: {error}") from error
+	if not isinstance(store, dict):
+		raise ValueError(f"Ecobee token store {token_file} does not hold a JSON object")
+	return store
+
+#============================================
+def _encode(tokens: dict) -> dict:
+	encoded = {}
+	for field in TOKEN_FIELDS:
+		value = tokens.get(field)
+		if field in DATE_FIELDS and value is not None:
+			value = value.isoformat()
+		encoded[field] = value
+	return encoded
+
+#============================================
+def _decode(entry: dict) -> dict:
+	tokens = {}
+	for field in TOKEN_FIELDS:
+		value = entry.get(field)
+		if field in DATE_FIELDS and value is not None:
+			value = datetime.datetime.fromisoformat(value)
+			if value.tzinfo is None:
+				value = value.replace(tzinfo=datetime.timezone.utc)
+		tokens[field] = value
+	return tokens
+
+#============================================
+def read_tokens(thermostat_name: str, token_file: str = DEFAULT_TOKEN_FILE) -> dict | None:
+	"""
+	Return the stored tokens of one thermostat.
+
+	Writes are atomic, so reading needs no lock.
+
+	Returns:
+		dict: TOKEN_FIELDS with timezone-aware expiry datetimes, or None when
+			the store has no entry for the thermostat.
+
+	Raises:
+		PermissionError: when the store exists but cannot be read.
+		ValueError: when the store is damaged.
+	"""
+	entry = _load_store(token_file).get(thermostat_name)
+	if entry is None:
+		return None
+	return _decode(entry)
+
+#============================================
+def _write_store(store: dict, token_file: str) -> None:
+	"""
+	Replace the store file atomically; the caller holds the lock.
+
+	The new file takes the mode and group of the file it replaces, so the
+	readers that could read the old store can read the new one.
+	"""
+	token_dir = os.path.dirname(token_file) or "."
+	try:
+		old_stat = os.stat(token_file)
+	except FileNotFoundError:
+		old_stat = None
+	handle, temp_path = tempfile.mkstemp(dir=token_dir, prefix=".ecobee_tokens.", suffix=".tmp")
+	try:
+		if old_stat is None:
+			# tokens grant control of the thermostat: never world-readable
+			os.fchmod(handle, NEW_FILE_MODE)
+		else:
+			os.fchmod(handle, old_stat.st_mode & 0o777)
+			if old_stat.st_gid != os.fstat(handle).st_gid:
+				try:
+					os.fchown(handle, -1, old_stat.st_gid)
+				except PermissionError:
+					print(f"WARNING: could not keep group {old_stat.st_gid} on {token_file}")
+		with os.fdopen(handle, "w") as f:
+			json.dump(store, f, indent=2, sort_keys=True)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(temp_path, token_file)
+	except BaseException:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+		raise
+
+#============================================
+def write_tokens(thermostat_name: str, tokens: dict, token_file: str = DEFAULT_TOKEN_FILE) -> None:
+	"""
+	Store the tokens of one thermostat, keeping every other entry.
+	"""
+	with locked(token_file):
+		store = _load_store(token_file)
+		store[thermostat_name] = _encode(tokens)
+		_write_store(store, token_file)
+
+#============================================
+def tokens_from_service(ecobee_service) -> dict:
+	"""
+	Extract TOKEN_FIELDS from a pyecobee.EcobeeService (or any object with them).
+	"""
+	tokens = {field: getattr(ecobee_service, field, None) for field in TOKEN_FIELDS}
+	return tokens
+
+#============================================
+def apply_tokens(ecobee_service, tokens: dict) -> None:
+	"""
+	Set stored tokens on a pyecobee.EcobeeService.
+	"""
+	for field in TOKEN_FIELDS:
+		if tokens.get(field) is not None:
+			setattr(ecobee_service, field, tokens[field])
+
+#============================================
+def migrate_pickle(thermostat_name: str, pickle_file: str = LEGACY_PICKLE_FILE,
+		token_file: str = DEFAULT_TOKEN_FILE) -> dict | None:
+	"""
+	Copy the tokens out of the legacy whole-service pickle into the store.
+
+	Returns:
+		dict: the migrated tokens, or None when there is nothing to migrate.
+	"""
+	if not os.path.exists(pickle_file) or os.path.getsize(pickle_file) == 0:
+		return None
+	# the pickle was written by this application, see MyEcobee before the store
+	with open(pickle_file, 'rb') as f:
+		data = pickle.load(f)  # nosec B301
+	ecobee_service = data.get(thermostat_name)
+	if ecobee_service is None:
+		return None
+	tokens = tokens_from_service(ecobee_service)
+	write_tokens(thermostat_name, tokens, token_file)
+	return tokens
+
+#============================================
+def needs_refresh(tokens: dict, margin_seconds: float = DEFAULT_REFRESH_MARGIN_SECONDS,
+		now: datetime.datetime = None) -> bool:
+	"""
+	Return True when the access token is missing or expires within margin_seconds.
+	"""
+	if tokens is None or not tokens.get('access_token'):
+		return True
+	expires_on = tokens.get('access_token_expires_on')
+	if expires_on is None:
+		return False
+	if now is None:
+		now = datetime.datetime.now(datetime.timezone.utc)
+	return now + datetime.timedelta(seconds=margin_seconds) >= expires_on
+
+#============================================
+def refresh_if_needed(ecobee_service, thermostat_name: str, token_file: str = DEFAULT_TOKEN_FILE,
+		margin_seconds: float = DEFAULT_REFRESH_MARGIN_SECONDS) -> bool:
+	"""
+	Refresh the access token unless the store already holds one that is fresh enough.
+
+	The store is re-read under the lock first, so concurrent callers refresh
+	once and the rest adopt the new tokens. The service always ends up with
+	the newest tokens.
+
+	Args:
+		ecobee_service: pyecobee.EcobeeService with a refresh token.
+		thermostat_name: key of the store entry.
+		token_file: path of the store.
+		margin_seconds: refresh when the access token expires within this long.
+
+	Returns:
+		bool: True when this call refreshed the tokens with Ecobee.
+	"""
+	with locked(token_file):
+		store = _load_store(token_file)
+		entry = store.get(thermostat_name)
+		stored = _decode(entry) if entry is not None else None
+		if stored is not None and not needs_refresh(stored, margin_seconds):
+			apply_tokens(ecobee_service, stored)
+			return False
+		if stored is not None:
+			# another process may have rotated the refresh token
+			apply_tokens(ecobee_service, stored)
+		ecobee_service.refresh_tokens()
+		store[thermostat_name] = _encode(tokens_from_service(ecobee_service))
+		_write_store(store, token_file)
+	return True
@@ -5,22 +5,39 @@ import sys
 import pytz
 import yaml
 import numpy
-import pickle
+import time
 import logging
 import pyecobee
 import datetime
 from six import moves
 
+from energylib import ecobee_token_store
+
+# thermostat sections read by the data functions, and the Selection flag of each;
+# one snapshot request asks for all of them at once
+SNAPSHOT_INCLUDES = {
+	'runtime': 'include_runtime',
+	'equipment_status': 'include_equipment_status',
+	'sensors': 'include_sensors',
+	'events': 'include_events',
+	'weather': 'include_weather',
+	'settings': 'include_settings',
+}
+
 class MyEcobee(object):
 	def __init__(self):
+		self.ecobee_service = None
 		self.setPyEcobee_Database_File()
 		self.setPyEcobee_Defs_File()
+		# parsed thermostat reused by every data function until it is this old
+		self.snapshot_ttl_seconds = 60
+		self.snapshot_cache = None  # (monotonic fetch time, sections, thermostat object)
 
 	def setPyEcobee_Database_File(self):
-		if os.path.exists('/etc/energy/pyecobee_db.pickle'):
-			self.db_file = '/etc/energy/pyecobee_db.pickle'
-		else:
-			self.db_file = '/etc/energy/pyecobee_db.pickle'
+		# tokens live in a JSON store; the old whole-service pickle is only
+		# read once to migrate it
+		self.token_file = ecobee_token_store.DEFAULT_TOKEN_FILE
+		self.db_file = ecobee_token_store.LEGACY_PICKLE_FILE
 		return
 
 	def setPyEcobee_Defs_File(self):
@@ -33,32 +50,34 @@ class MyEcobee(object):
 		return
 
 	def _persist_data(self):
-		data = {
-			self.thermostat_name: self.ecobee_service,
-		}
-		# Open file in binary write mode
-		with open(self.db_file, 'wb') as file:
-			pickle.dump(data, file)
+		tokens = ecobee_token_store.tokens_from_service(self.ecobee_service)
+		ecobee_token_store.write_tokens(self.thermostat_name, tokens, self.token_file)
 
 	def _load_data(self):
-		self.ecobee_service = None
-		if os.path.exists(self.db_file) and os.path.getsize(self.db_file) > 0:
-			# Open file in binary read mode
-			with open(self.db_file, 'rb') as file:
-				data = pickle.load(file)
-				self.ecobee_service = data.get(self.thermostat_name)
-
+		self.ecobee_service = pyecobee.EcobeeService(
+			thermostat_name=self.thermostat_name,
+			application_key=self.api_key)
+		tokens = ecobee_token_store.read_tokens(self.thermostat_name, self.token_file)
+		if tokens is None:
+			tokens = ecobee_token_store.migrate_pickle(self.thermostat_name, self.db_file, self.token_file)
+		if tokens is not None:
+			ecobee_token_store.apply_tokens(self.ecobee_service, tokens)
+
+	def _refresh_tokens(self, margin_seconds=0):
+		# locked re-read first: when another process already refreshed, its
+		# tokens are used without asking Ecobee again
+		refreshed = ecobee_token_store.refresh_if_needed(self.ecobee_service, self.thermostat_name,
+			self.token_file, margin_seconds)
+		if refreshed:
+			self.logger.debug('Access token refreshed, expires {0}'.format(self.ecobee_service.access_token_expires_on))
+		return refreshed
+
+	def refreshTokensAhead(self, margin_seconds=ecobee_token_store.DEFAULT_REFRESH_MARGIN_SECONDS):
+		# for a background job: keep the stored access token valid so other
+		# processes never refresh on their critical path
 		if self.ecobee_service is None:
-			# Setup new app, by going to web service
-			self.ecobee_service = pyecobee.EcobeeService(
-				thermostat_name=self.thermostat_name,
-				application_key=self.api_key)
-
-
-	def _refresh_tokens(self):
-		token_response = self.ecobee_service.refresh_tokens()
-		self.logger.debug('TokenResponse returned from self.ecobee_service.refresh_tokens():\n{0}'.format(token_response.pretty_format()))
-		self._persist_data()
+			self._load_data()
+		return self._refresh_tokens(margin_seconds)
 
 	def _request_tokens(self):
 		try:
@@ -69,6 +88,10 @@ class MyEcobee(object):
 		self._persist_data()
 
 	def _authorize(self):
+		# waits for a person at a terminal; never block a CGI request or daemon
+		if not sys.stdin or not sys.stdin.isatty():
+			raise RuntimeError(f"Ecobee tokens for {self.thermostat_name} are missing from {self.token_file}; "
+				"authorize once from an interactive terminal")
 		authorize_response = self.ecobee_service.authorize()
 		self.logger.debug('AuthorizeResponse returned from self.ecobee_service.authorize():\n{0}'.format(authorize_response.pretty_format()))
 		self._persist_data()
@@ -131,6 +154,20 @@ class MyEcobee(object):
 		elif self.ecobee_service.access_token_expires_on and now_utc > self.ecobee_service.access_token_expires_on:
 			self._refresh_tokens()
 
+	def ensureConnection(self):
+		# cheap check for long-lived objects: reuse the loaded service and
+		# only go back through openConnection() when a token is missing or expired
+		if self.ecobee_service is None or not self.ecobee_service.access_token:
+			self.openConnection()
+			return
+		now_utc = datetime.datetime.now(pytz.utc)
+		if self.ecobee_service.refresh_token_expires_on and now_utc > self.ecobee_service.refresh_token_expires_on:
+			self.openConnection()
+		else:
+			# picks up tokens another process refreshed; refreshes only when
+			# the access token is about to expire
+			self._refresh_tokens(margin_seconds=60)
+
 	def openConnection_OLD(self):
 		if not self.ecobee_service.authorization_token:
 			self._authorize()
@@ -170,19 +207,75 @@ class MyEcobee(object):
 		assert thermostat_summary_response.status.code == 0, 'Failure while executing request_thermostats:\n{0}'.format(
 			thermostat_summary_response.pretty_format())
 
-	def sensors(self):
-		# Only set the include options you need to True. I've set most of them to True for illustrative purposes only.
+	def snapshot(self, sections=None, max_age_seconds=None):
+		"""
+		Return the thermostat object with every snapshot section, in one request.
+
+		The runtime, equipment status, sensors, events, weather and settings
+		are requested together with one request_thermostats call and the
+		result is reused by all data functions for snapshot_ttl_seconds, so a
+		control run costs one round-trip instead of one per accessor. Holds
+		and messages set through this object clear the snapshot.
+
+		Args:
+			sections: names from SNAPSHOT_INCLUDES the caller needs; a cached
+				snapshot without them is refetched. Defaults to all.
+			max_age_seconds: oldest acceptable snapshot, default snapshot_ttl_seconds.
+
+		Returns:
+			thermostat object from pyecobee, or None when the request fails.
+		"""
+		if sections is None:
+			sections = tuple(SNAPSHOT_INCLUDES)
+		if max_age_seconds is None:
+			max_age_seconds = self.snapshot_ttl_seconds
+		if self.snapshot_cache is not None:
+			fetch_time, cached_sections, thermostat_obj = self.snapshot_cache
+			if time.monotonic() - fetch_time <= max_age_seconds and set(sections) <= cached_sections:
+				return thermostat_obj
+		# always fetch every section: the next accessor is then free
+		requested = set(SNAPSHOT_INCLUDES) | set(sections)
+		thermostat_obj = self._request_sections(requested)
+		if thermostat_obj is None:
+			return None
+		self.snapshot_cache = (time.monotonic(), requested, thermostat_obj)
+		return thermostat_obj
+
+	def _request_sections(self, sections):
+		"""
+		Request only the given SNAPSHOT_INCLUDES sections, bypassing the snapshot.
+
+		Returns:
+			thermostat object from pyecobee, or None when the request fails.
+		"""
+		include_flags = {SNAPSHOT_INCLUDES[name]: True for name in sections}
 		selection = pyecobee.Selection(
 			selection_type=pyecobee.SelectionType.REGISTERED.value,
 			selection_match=self.thermostat_id,
-			include_sensors=True,
+			**include_flags,
 		)
 		thermostat_response = self._request_data(selection)
 		if thermostat_response is None:
 			return None
-
 		thermostat_obj = thermostat_response.thermostat_list[0]
 		self.logger.debug(thermostat_obj.pretty_format())
+		return thermostat_obj
+
+	def invalidateSnapshot(self):
+		self.snapshot_cache = None
+
+	def _object_dict(self, ecobee_obj):
+		keys = list(ecobee_obj.attribute_type_map.keys())
+		keys.sort()
+		objdict = {}
+		for key in keys:
+			objdict[key] = getattr(ecobee_obj, key)
+		return objdict
+
+	def sensors(self):
+		thermostat_obj = self.snapshot(('sensors',))
+		if thermostat_obj is None:
+			return None
 
 		sensordict = {}
 		for sensor in thermostat_obj.remote_sensors:
@@ -202,14 +295,17 @@ class MyEcobee(object):
 				'temperature': temp, 'occupancy': occupancy, 'humidity': humid, 'raw_temp': rawtemp, }
 		return sensordict
 
-	def getMedianTemp(self):
+	def _sensor_temperatures(self):
 		sensordict = self.sensors()
-		keys = list(sensordict.keys())
 		templist = []
-		for name in keys:
+		for name in list(sensordict.keys()):
 			temp = sensordict[name].get('temperature')
 			if temp is not None:
 				templist.append(temp)
+		return templist
+
+	def getMedianTemp(self):
+		templist = self._sensor_temperatures()
 		tempstr = ' '
 		for tempnum in templist:
 			tempstr += '{0:.1f}F '.format(tempnum)
@@ -219,106 +315,43 @@ class MyEcobee(object):
 		return median_temp
 
 	def getStdevTemp(self):
-		sensordict = self.sensors()
-		keys = list(sensordict.keys())
-		templist = []
-		for name in keys:
-			temp = sensordict[name].get('temperature')
-			if temp is not None:
-				templist.append(temp)
-		temparr = numpy.array(templist)
+		temparr = numpy.array(self._sensor_temperatures())
 		stdev_temp = temparr.std()
 		return stdev_temp
 
 	def weather(self):
-		# Only set the include options you need to True. I've set most of them to True for illustrative purposes only.
-		selection = pyecobee.Selection(
-			selection_type=pyecobee.SelectionType.REGISTERED.value,
-			selection_match=self.thermostat_id,
-			include_weather=True,
-		)
-		thermostat_response = self._request_data(selection)
-		weather_obj = thermostat_response.thermostat_list[0].weather.forecasts[0]
-
+		thermostat_obj = self.snapshot(('weather',))
+		weather_obj = thermostat_obj.weather.forecasts[0]
 		self.logger.debug(weather_obj.pretty_format())
-		self.logger.debug(dir(weather_obj))
-		keys = list(weather_obj.attribute_type_map.keys())
-		keys.sort()
-		weatherdict = {}
-		for key in keys:
-			weatherdict[key] = getattr(weather_obj, key)
+		weatherdict = self._object_dict(weather_obj)
 		return weatherdict
 
 	def equipment_status(self):
-		selection = pyecobee.Selection(
-			selection_type=pyecobee.SelectionType.REGISTERED.value,
-			selection_match=self.thermostat_id,
-			include_equipment_status=True,
-		)
-		thermostat_response = self._request_data(selection)
-
-		thermostat_obj = thermostat_response.thermostat_list[0]
-		self.logger.debug(thermostat_obj.pretty_format())
-		self.logger.debug(dir(thermostat_obj))
-
+		thermostat_obj = self.snapshot(('equipment_status',))
 		equipment_status = thermostat_obj.equipment_status.split(',')
 		return equipment_status
 
 	def runtime(self):
-		#print("runtime")
-		selection = pyecobee.Selection(
-			selection_type=pyecobee.SelectionType.REGISTERED.value,
-			selection_match=self.thermostat_id,
-			include_equipment_status=True,
-			include_runtime=True,
-		)
-		#print("thermostat_response")
-		thermostat_response = self._request_data(selection)
-
-		#print("thermostat_obj")
-		thermostat_obj = thermostat_response.thermostat_list[0]
-
-		self.logger.debug(thermostat_obj.pretty_format())
-		self.logger.debug(dir(thermostat_obj))
-
-		#print(help(thermostat_response.thermostat_list[0]))
-		runtime_obj = thermostat_response.thermostat_list[0].runtime
-
+		thermostat_obj = self.snapshot(('runtime', 'equipment_status'))
+		runtime_obj = thermostat_obj.runtime
 		self.logger.debug(runtime_obj.pretty_format())
-		self.logger.debug(dir(runtime_obj))
-		keys = list(runtime_obj.attribute_type_map.keys())
-		keys.sort()
-		runtimedict = {}
-		for key in keys:
-			runtimedict[key] = getattr(runtime_obj, key)
+		runtimedict = self._object_dict(runtime_obj)
 		return runtimedict
 
-	def events(self):
-		selection = pyecobee.Selection(
-			selection_type=pyecobee.SelectionType.REGISTERED.value,
-			selection_match=self.thermostat_id,
-			include_events=True,
-		)
-		thermostat_response = self._request_data(selection)
-		if thermostat_response is None:
+	def events(self, fresh=False):
+		# fresh: request the events alone, e.g. to re-check holds just before
+		# acting, and leave the snapshot of the other sections in place
+		if fresh:
+			thermostat_obj = self._request_sections(('events',))
+		else:
+			thermostat_obj = self.snapshot(('events',))
+		if thermostat_obj is None:
 			return None
 
-		thermostat_obj = thermostat_response.thermostat_list[0]
-		self.logger.debug(thermostat_obj.pretty_format())
-		self.logger.debug(dir(thermostat_obj))
-
-		events_list = thermostat_response.thermostat_list[0].events
-
 		events_tree = []
-		for event_obj in events_list:
+		for event_obj in thermostat_obj.events:
 			self.logger.debug(event_obj.pretty_format())
-			self.logger.debug(dir(event_obj))
-			keys = list(event_obj.attribute_type_map.keys())
-			keys.sort()
-			eventdict = {}
-			for key in keys:
-				eventdict[key] = getattr(event_obj, key)
-			events_tree.append(eventdict)
+			events_tree.append(self._object_dict(event_obj))
 		return events_tree
 
 
@@ -340,26 +373,10 @@ class MyEcobee(object):
 		return
 
 	def settings(self):
-		selection = pyecobee.Selection(
-			selection_type=pyecobee.SelectionType.REGISTERED.value,
-			selection_match=self.thermostat_id,
-			include_settings=True,
-		)
-		thermostat_response = self._request_data(selection)
-
-		thermostat_obj = thermostat_response.thermostat_list[0]
-		self.logger.debug(thermostat_obj.pretty_format())
-		self.logger.debug(dir(thermostat_obj))
-
-		settings_obj = thermostat_response.thermostat_list[0].settings
-
+		thermostat_obj = self.snapshot(('settings',))
+		settings_obj = thermostat_obj.settings
 		self.logger.debug(settings_obj.pretty_format())
-		self.logger.debug(dir(settings_obj))
-		keys = list(settings_obj.attribute_type_map.keys())
-		keys.sort()
-		settingsdict = {}
-		for key in keys:
-			settingsdict[key] = getattr(settings_obj, key)
+		settingsdict = self._object_dict(settings_obj)
 		return settingsdict
 
 	def startOfNextHour(self):
@@ -393,6 +410,8 @@ class MyEcobee(object):
 		self.setHoldTemperature(cooltemp, heattemp, end_time)
 
 	def setHoldTemperature(self, cooltemp=80, heattemp=55, endtime=None):
+		# the hold changes runtime and events; read them fresh next time
+		self.invalidateSnapshot()
 		central = pytz.timezone('US/Central')
 		update_thermostat_response = self.ecobee_service.set_hold(
 			cool_hold_temp=cooltemp,
@@ -406,6 +425,7 @@ class MyEcobee(object):
 		update_thermostat_response.pretty_format())
 
 	def setHoldClimate(self, climate_setting='away', message=None):
+		self.invalidateSnapshot()
 		update_thermostat_response = self.ecobee_service.set_hold(hold_climate_ref='away', hold_type=pyecobee.HoldType.NEXT_TRANSITION)
 		self.logger.info(update_thermostat_response.pretty_format())
 		assert update_thermostat_response.status.code == 0, 'Failure while executing set_hold:\n{0}'.format(update_thermostat_response.pretty_format())
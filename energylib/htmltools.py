@@ -1,10 +1,9 @@
-import math
 import time
 import numpy
 import colorsys
 import datetime
 from energylib import comedlib
-from energylib import ecobeelib
+from energylib import comed_billing
 
 def numberToHtmlColor(hue, saturation=0.9, value=0.6):
 	hue = max(0, min(hue, 1))  # Clamp hue between 0 and 1
@@ -27,6 +26,8 @@ def colorTemperature(temperature, precision=1):
 
 
 def htmlEcobee(weather=False):
+	# pyecobee is only loaded by pages that show the thermostat
+	from energylib import ecobeelib
 	htmltext = "<h3>Ecobee Stats</h3>"
 	myecobee = ecobeelib.MyEcobee()
 	myecobee.setLogger()
@@ -137,12 +138,14 @@ def htmlEcobee(weather=False):
 
 	return htmltext
 
-def htmlComedData(showPlot: bool = False) -> str:
+def htmlComedData(showPlot: bool = False, comlib=None, comed_data=None) -> str:
 	"""
 	Generate HTML content summarizing ComEd electricity pricing data.
 
 	Args:
 		showPlot (bool): Whether to include a plot image link in the HTML output.
+		comlib (ComedLib): Instance to reuse; a new one when None.
+		comed_data (list): Already downloaded feed data; downloaded when None.
 
 	Returns:
 		str: An HTML-formatted string containing ComEd pricing information.
@@ -152,12 +155,14 @@ def htmlComedData(showPlot: bool = False) -> str:
 	htmltext = "<h3>Comed Prices</h3>"
 
 	# Set up the ComEd library instance
-	comlib = comedlib.ComedLib()
-	comlib.msg = False  # Suppress console messages from the library
-	comlib.useCache = False  # Disable caching to ensure fresh data is downloaded
+	if comlib is None:
+		comlib = comedlib.ComedLib()
+		comlib.msg = False  # Suppress console messages from the library
+		comlib.useCache = False  # Disable caching to ensure fresh data is downloaded
 
-	# Download ComEd JSON data
-	comed_data = comlib.downloadComedJsonData()
+	# Download ComEd JSON data unless the caller already has it
+	if comed_data is None:
+		comed_data = comlib.downloadComedJsonData()
 	if comed_data is None:
 		# If no data is available, display an error message in the HTML
 		htmltext += "comed data failed or not available"
@@ -170,8 +175,8 @@ def htmlComedData(showPlot: bool = False) -> str:
 	htmltext += _generate_recent_rates_table(comed_data)
 
 	# Add a table displaying hourly averages
-	hourlyRates = comlib.parseComedData(comed_data)
-	htmltext += _generate_hourly_averages_table(hourlyRates)
+	hourlyAverages = comlib.getHourlyAverages(comed_data)
+	htmltext += _generate_hourly_averages_table(hourlyAverages)
 
 	# Optionally include a plot of ComEd rates as an image in the HTML
 	if showPlot:
@@ -246,15 +251,15 @@ def _generate_status_header_html(comlib, comed_data) -> str:
 	currentRate = comlib.getCurrentComedRateUnSafe(comed_data)
 	# Get the predicted electricity rate and cutoff rate for usage
 	predictRate = comlib.getPredictedRate(comed_data)
-	cutoffRate = comlib.getReasonableCutOff()
+	cutoffRate = comlib.getReasonableCutOff(comed_data)
 
 	# Generate the HTML content
 	html = ""
 	html += "<span style='color: &#35;448844'>24hr Median Rate:"
 	html += f" {colorPrice(median, 1)} &pm; {std:.2f} &cent;</span><br/>"
 
-	# Variable delivery rate from most recent ComEd bill (Winter 2025-26)
-	delivery_cents_per_kwh = 6.354
+	# Variable delivery rate from the most recent ComEd bill
+	delivery_cents_per_kwh = comed_billing.delivery_rate()
 	html += "&nbsp;<span style='color: &#35;448844'>Equivalent Gas Rate:"
 	med_gas_equiv = equivalent_gas_cost(median + delivery_cents_per_kwh)
 	std_gas_equiv = equivalent_gas_cost(std)
@@ -334,13 +339,13 @@ def _generate_recent_rates_table(comed_data: list) -> str:
 	return html
 
 
-def _generate_hourly_averages_table(hourlyRates: dict) -> str:
+def _generate_hourly_averages_table(hourlyAverages: dict) -> str:
 	"""
 	Generate an HTML table for hourly average electricity rates.
 
 	Args:
-		hourlyRates (dict): Dictionary of hourly rates, with keys as hours
-		                    and values as lists of rates for each hour.
+		hourlyAverages (dict): Average rate per hour, with integer hour keys
+		                       as returned by ComedLib.getHourlyAverages().
 
 	Returns:
 		str: HTML-formatted string for the hourly averages table.
@@ -350,17 +355,12 @@ def _generate_hourly_averages_table(hourlyRates: dict) -> str:
 	html += "<tr><th>Range</th><th>Cost</th></tr>\n"
 
 	# Sort hour keys in descending order
-	hour_keys = list(hourlyRates.keys())
+	hour_keys = list(hourlyAverages.keys())
 	hour_keys.sort(reverse=True)
 
 	# Generate rows for hourly averages
 	for hour_key in hour_keys:
-		# Skip invalid keys that are not close to integers
-		if not math.isclose(hour_key, round(hour_key), abs_tol=1e-6):
-			continue
-
-		# Calculate average rate for the current hour
-		averageRate = numpy.array(hourlyRates[hour_key]).mean()
+		averageRate = hourlyAverages[hour_key]
 		hour = int(hour_key)
 
 		# Adjust hour for rows after midnight
@@ -0,0 +1,154 @@
+"""
+Shared pooled HTTP client for every energy fetcher.
+
+All HTTP traffic (ComEd, the solar inverter, AWTRIX, ESPN) goes through one
+keep-alive requests.Session per process, so repeated polls of the same host
+reuse an open TCP/TLS connection instead of paying a fresh handshake.
+
+Callers that run their own retry loop (ComedLib.safeDownloadWebpage,
+solarProduction.safeDownloadWebpage) pass retry=False and get a second pooled session without urllib3 retries or
+Retry-After sleeps, so one attempt never outlasts its timeout.
+"""
+
+# Standard Library
+import threading
+
+# PIP modules
+import requests
+import requests.adapters
+import urllib3.util.retry
+
+#============================================
+# (connect, read) seconds applied when a caller does not pass a timeout
+DEFAULT_TIMEOUT = (3.05, 10.0)
+# number of distinct hosts whose connection pools are kept
+POOL_HOSTS = 8
+# keep-alive connections kept per host
+POOL_PER_HOST = 4
+# retries for failed connects and gateway errors; a request that reached the
+# server and timed out on read is never retried here, callers decide that
+RETRY_TOTAL = 2
+RETRY_BACKOFF_SECONDS = 0.5
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+_session = None
+_no_retry_session = None
+_session_lock = threading.Lock()
+
+#============================================
+def build_session(retries: int = RETRY_TOTAL, backoff_seconds: float = RETRY_BACKOFF_SECONDS,
+		pool_hosts: int = POOL_HOSTS, pool_per_host: int = POOL_PER_HOST) -> requests.Session:
+	"""
+	Build a requests.Session with pooled keep-alive adapters and a retry policy.
+
+	Args:
+		retries: retries for connect errors and RETRY_STATUS_CODES responses;
+			0 disables urllib3 retries and Retry-After sleeps entirely.
+		backoff_seconds: urllib3 backoff factor between retries.
+		pool_hosts: number of per-host connection pools to keep.
+		pool_per_host: keep-alive connections per host.
+
+	Returns:
+		requests.Session: configured session.
+	"""
+	if retries == 0:
+		# requests' plain int: no retries, no status retries, no Retry-After sleep
+		return _mounted_session(0, pool_hosts, pool_per_host)
+	retry = urllib3.util.retry.Retry(
+		total=retries,
+		connect=retries,
+		# re-raise read timeouts as requests.exceptions.ReadTimeout
+		read=False,
+		status=retries,
+		status_forcelist=RETRY_STATUS_CODES,
+		allowed_methods=frozenset(['GET', 'HEAD']),
+		backoff_factor=backoff_seconds,
+		respect_retry_after_header=True,
+		# hand the last response back instead of raising RetryError
+		raise_on_status=False,
+	)
+	session = _mounted_session(retry, pool_hosts, pool_per_host)
+	return session
+
+#============================================
+def _mounted_session(max_retries, pool_hosts: int, pool_per_host: int) -> requests.Session:
+	"""
+	Build a session with one pooled adapter for http and https.
+	"""
+	adapter = requests.adapters.HTTPAdapter(
+		pool_connections=pool_hosts, pool_maxsize=pool_per_host, max_retries=max_retries)
+	session = requests.Session()
+	session.mount('https://', adapter)
+	session.mount('http://', adapter)
+	return session
+
+#============================================
+def get_session(retry: bool = True) -> requests.Session:
+	"""
+	Return a process-wide pooled session, creating it on first use.
+
+	Args:
+		retry: False for the session without urllib3 retries, for callers
+			that bound the total time with their own retry loop.
+
+	Returns:
+		requests.Session: shared session.
+	"""
+	global _session, _no_retry_session
+	if retry:
+		if _session is None:
+			with _session_lock:
+				if _session is None:
+					_session = build_session()
+		return _session
+	if _no_retry_session is None:
+		with _session_lock:
+			if _no_retry_session is None:
+				_no_retry_session = build_session(retries=0)
+	return _no_retry_session
+
+#============================================
+def close_session() -> None:
+	"""
+	Close the shared sessions and drop their pooled connections.
+	"""
+	global _session, _no_retry_session
+	with _session_lock:
+		for session in (_session, _no_retry_session):
+			if session is not None:
+				session.close()
+		_session = None
+		_no_retry_session = None
+
+#============================================
+def get(url: str, timeout=DEFAULT_TIMEOUT, retry: bool = True, **kwargs) -> requests.Response:
+	"""
+	GET through the shared session.
+
+	Args:
+		url: request URL.
+		timeout: seconds, or a (connect, read) tuple.
+		retry: False to make exactly one attempt (see get_session()).
+		**kwargs: passed to requests.Session.get (headers, auth, verify, ...).
+
+	Returns:
+		requests.Response: the response.
+	"""
+	response = get_session(retry).get(url, timeout=timeout, **kwargs)
+	return response
+
+#============================================
+def post(url: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+	"""
+	POST through the shared session.
+
+	Args:
+		url: request URL.
+		timeout: seconds, or a (connect, read) tuple.
+		**kwargs: passed to requests.Session.post (json, auth, ...).
+
+	Returns:
+		requests.Response: the response.
+	"""
+	response = get_session().post(url, timeout=timeout, **kwargs)
+	return response
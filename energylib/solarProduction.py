@@ -7,6 +7,8 @@ import ephem
 import random
 import requests
 
+from energylib import httpclient
+
 inverter_ip = "192.168.2.188"
 
 #======================================
@@ -14,7 +16,8 @@ def safeDownloadWebpage(url):
 	fails = 0
 	while(fails < 9):
 		try:
-			resp = requests.get(url, timeout=1)
+			# this loop does the retrying; one attempt per pass
+			resp = httpclient.get(url, timeout=1, retry=False)
 			break
 		except requests.exceptions.ReadTimeout:
 			#print "FAILED request"
@@ -0,0 +1,240 @@
+"""
+Run periodic jobs inside one long-lived process.
+
+A TaskScheduler holds PeriodicTask entries (a callable, an interval, random
+jitter and an optional timeout) and starts each one on its own daemon thread
+when it is due, so a slow WeMo actuation never delays the dashboard and a
+crash in one job is logged and retried without touching the others. A job
+is never run twice at once; the next run is scheduled from the end of the
+previous one, like the `while true; do ...; sleep N; done` shell loops this
+replaces.
+
+A job may return a number of seconds to hold on top of its interval (for
+example until the end of a high-price hour). Python threads cannot be
+killed, so a job that overruns its timeout is reported and simply not
+restarted until it returns.
+"""
+
+# Standard Library
+import time
+import random
+import threading
+import traceback
+
+#============================================
+class PeriodicTask(object):
+	"""
+	One periodic job and its run statistics.
+	"""
+
+	def __init__(self, name: str, function, interval_seconds: float, jitter_seconds: float = 0.0,
+			timeout_seconds: float = None, initial_delay_seconds: float = 0.0,
+			max_backoff_seconds: float = None):
+		"""
+		Args:
+			name: label used in log lines.
+			function: callable run with no arguments; may return extra hold seconds.
+			interval_seconds: pause between the end of one run and the next.
+			jitter_seconds: up to this many random seconds added to each pause.
+			timeout_seconds: report the run as stuck after this long; None for never.
+			initial_delay_seconds: wait before the first run.
+			max_backoff_seconds: cap of the doubling pause after consecutive
+				failures; defaults to 8 intervals.
+		"""
+		if interval_seconds <= 0:
+			raise ValueError(f"interval_seconds must be positive, not {interval_seconds}")
+		self.name = name
+		self.function = function
+		self.interval_seconds = float(interval_seconds)
+		self.jitter_seconds = max(float(jitter_seconds), 0.0)
+		self.timeout_seconds = timeout_seconds
+		if max_backoff_seconds is None:
+			max_backoff_seconds = 8 * self.interval_seconds
+		self.max_backoff_seconds = max_backoff_seconds
+		self.initial_delay_seconds = max(float(initial_delay_seconds), 0.0)
+		self.next_run = None  # monotonic time of the next start
+		self.thread = None  # thread of the run in progress
+		self.started = None  # monotonic start time of the run in progress
+		self.timed_out = False  # the run in progress has been reported stuck
+		self.runs = 0
+		self.failures = 0
+		self.consecutive_failures = 0
+		self.timeouts = 0
+		self.last_duration = None
+		self.last_error = None
+
+	#============================================
+	def isRunning(self) -> bool:
+		"""
+		Return True while a run of this task is in progress.
+		"""
+		return self.thread is not None and self.thread.is_alive()
+
+	#============================================
+	def pauseSeconds(self, hold_seconds: float = 0.0) -> float:
+		"""
+		Seconds to wait after a run, including jitter, failure backoff and hold.
+		"""
+		pause = self.interval_seconds
+		if self.consecutive_failures > 0:
+			pause = min(self.interval_seconds * 2 ** (self.consecutive_failures - 1), self.max_backoff_seconds)
+			pause = max(pause, self.interval_seconds)
+		pause += random.uniform(0, self.jitter_seconds)
+		pause += max(hold_seconds, 0.0)
+		return pause
+
+	#============================================
+	def status(self) -> dict:
+		"""
+		Return the run statistics as a plain dictionary.
+		"""
+		status = {
+			'name': self.name,
+			'running': self.isRunning(),
+			'runs': self.runs,
+			'failures': self.failures,
+			'timeouts': self.timeouts,
+			'last_duration': self.last_duration,
+			'last_error': self.last_error,
+		}
+		return status
+
+#============================================
+class TaskScheduler(object):
+	"""
+	Start due PeriodicTask jobs on daemon threads, isolating their failures.
+	"""
+
+	def __init__(self, clock=time.monotonic):
+		"""
+		Args:
+			clock: monotonic time source, replaceable in tests.
+		"""
+		self.clock = clock
+		self.tasks = []
+		self.lock = threading.Lock()
+		# set whenever a run finishes so run_forever() can reschedule at once
+		self.wakeup = threading.Event()
+
+	#============================================
+	def addTask(self, name: str, function, interval_seconds: float, **kwargs) -> PeriodicTask:
+		"""
+		Register a periodic job; keyword arguments are passed to PeriodicTask.
+
+		Returns:
+			PeriodicTask: the registered task.
+		"""
+		if any(task.name == name for task in self.tasks):
+			raise ValueError(f"task {name!r} is already registered")
+		task = PeriodicTask(name, function, interval_seconds, **kwargs)
+		task.next_run = self.clock() + task.initial_delay_seconds
+		self.tasks.append(task)
+		return task
+
+	#============================================
+	def _runTask(self, task: PeriodicTask) -> None:
+		"""
+		Thread body: run the job once, record the outcome and schedule the next run.
+		"""
+		hold_seconds = 0.0
+		try:
+			result = task.function()
+			if isinstance(result, (int, float)) and not isinstance(result, bool):
+				hold_seconds = float(result)
+			task.consecutive_failures = 0
+		except (Exception, SystemExit) as error:
+			# SystemExit too: legacy app code calls sys.exit() on hardware errors
+			task.failures += 1
+			task.consecutive_failures += 1
+			task.last_error = f"{type(error).__name__}: {error}"
+			print(f"ERROR: task {task.name} failed ({task.consecutive_failures} in a row): {task.last_error}")
+			traceback.print_exc()
+		finally:
+			with self.lock:
+				now = self.clock()
+				task.runs += 1
+				task.last_duration = now - task.started
+				if task.timed_out:
+					print(f"task {task.name} finished after {task.last_duration:.0f} seconds")
+				task.next_run = now + task.pauseSeconds(hold_seconds)
+				task.thread = None
+				task.started = None
+				task.timed_out = False
+			self.wakeup.set()
+
+	#============================================
+	def runPending(self) -> float:
+		"""
+		Start every due task that is not already running and report overruns.
+
+		Returns:
+			float: seconds until the next start or timeout check is due.
+		"""
+		with self.lock:
+			now = self.clock()
+			wait_seconds = None
+			for task in self.tasks:
+				if task.thread is not None:
+					if task.timeout_seconds is None or task.timed_out:
+						continue
+					overrun = task.started + task.timeout_seconds - now
+					if overrun <= 0:
+						task.timed_out = True
+						task.timeouts += 1
+						print(f"WARNING: task {task.name} exceeded its {task.timeout_seconds:.0f} second "
+							"timeout; it will not restart until it returns")
+						continue
+					wait_seconds = overrun if wait_seconds is None else min(wait_seconds, overrun)
+					continue
+				if task.next_run <= now:
+					task.started = now
+					task.thread = threading.Thread(target=self._runTask, args=(task,),
+						name=f"task-{task.name}", daemon=True)
+					task.thread.start()
+					if task.timeout_seconds is not None:
+						wait_seconds = (task.timeout_seconds if wait_seconds is None
+							else min(wait_seconds, task.timeout_seconds))
+					continue
+				until = task.next_run - now
+				wait_seconds = until if wait_seconds is None else min(wait_seconds, until)
+		if wait_seconds is None:
+			# everything is running without a timeout; wait for a run to finish
+			wait_seconds = 60.0
+		return max(wait_seconds, 0.0)
+
+	#============================================
+	def runForever(self, stop_event: threading.Event = None) -> None:
+		"""
+		Run the schedule until stop_event is set (or forever).
+		"""
+		if stop_event is None:
+			stop_event = threading.Event()
+		while not stop_event.is_set():
+			self.wakeup.clear()
+			wait_seconds = self.runPending()
+			# a finished run wakes the loop early so its next start is counted
+			self.wakeup.wait(min(wait_seconds, 60.0))
+
+	#============================================
+	def join(self, timeout_seconds: float = None) -> bool:
+		"""
+		Wait for the runs in progress to finish.
+
+		Returns:
+			bool: True when no task is still running.
+		"""
+		deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+		for task in list(self.tasks):
+			thread = task.thread
+			if thread is None:
+				continue
+			remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+			thread.join(remaining)
+		return not any(task.isRunning() for task in self.tasks)
+
+	#============================================
+	def status(self) -> list:
+		"""
+		Return the run statistics of every task.
+		"""
+		return [task.status() for task in self.tasks]
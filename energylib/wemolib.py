@@ -0,0 +1,449 @@
+"""
+Event-driven WeMo plug tracking.
+
+A WemoPlugManager connects each plug once, registers it with pywemo's UPnP
+SubscriptionRegistry and keeps the last BinaryState the plug pushed, so
+reading a plug's state costs no network round-trip. Switching a plug
+returns as soon as the plug reports the new state instead of sleeping a
+fixed time and polling with get_state(force_update=True). A plug is only
+re-probed after its subscription fails.
+
+A PlugActuator switches one plug with bounded retries, exponential backoff
+and a circuit breaker, and reports the plug's health.
+
+pywemo is imported when the first manager starts, so modules that only
+import energylib never load it.
+"""
+
+# Standard Library
+import time
+import threading
+
+#============================================
+# UPnP event carrying the relay state ("1", or "8|..." from an Insight plug)
+BINARY_STATE_EVENT = "BinaryState"
+# plug states that mean the relay is closed: 1 on, 8 on and idle (Insight)
+ON_STATES = (1, 8)
+OFF_STATE = 0
+# seconds to wait for a plug to confirm a switch
+DEFAULT_CONFIRM_SECONDS = 20.0
+# a cached state older than this without any event is re-read from the plug
+DEFAULT_MAX_STATE_AGE_SECONDS = 1800.0
+
+#============================================
+def parse_binary_state(value) -> int:
+	"""
+	Return the relay state from a BinaryState event value.
+
+	Args:
+		value: event value, e.g. "1", "0" or "8|1700000000|..." (Insight).
+
+	Returns:
+		int: relay state.
+	"""
+	return int(str(value).split('|')[0])
+
+#============================================
+def connect_device(address: str):
+	"""
+	Probe a plug and build its pywemo device object.
+	"""
+	import pywemo
+	pywemo.ouimeaux_device.probe_wemo(address)
+	url = pywemo.setup_url_for_address(address)
+	device = pywemo.discovery.device_from_description(url)
+	return device
+
+#============================================
+class WemoPlugManager(object):
+	"""
+	Track many WeMo plugs through one pywemo SubscriptionRegistry.
+	"""
+
+	def __init__(self, registry=None, device_factory=connect_device,
+			max_state_age_seconds: float = DEFAULT_MAX_STATE_AGE_SECONDS, clock=time.monotonic):
+		"""
+		Args:
+			registry: started subscription registry; a pywemo.SubscriptionRegistry
+				is created on start() when None.
+			device_factory: callable returning the device object of an address.
+			max_state_age_seconds: poll a plug whose cached state is older.
+			clock: monotonic time source, replaceable in tests.
+		"""
+		self.registry = registry
+		self.device_factory = device_factory
+		self.max_state_age_seconds = max_state_age_seconds
+		self.clock = clock
+		# address -> {'device', 'state', 'updated', 'events'}
+		self.plugs = {}
+		self.condition = threading.Condition()
+
+	#============================================
+	def start(self) -> None:
+		"""
+		Start the subscription registry (its HTTP event server) once.
+		"""
+		if self.registry is not None:
+			return
+		import pywemo
+		registry = pywemo.SubscriptionRegistry()
+		registry.start()
+		self.registry = registry
+
+	#============================================
+	def stop(self) -> None:
+		"""
+		Unsubscribe every plug and stop the event server.
+		"""
+		if self.registry is None:
+			return
+		for address in list(self.plugs):
+			self._unregister(address)
+		self.registry.stop()
+		self.registry = None
+
+	#============================================
+	def addPlug(self, address: str) -> None:
+		"""
+		Connect to a plug and subscribe to its events, replacing an older connection.
+		"""
+		self.start()
+		device = self.device_factory(address)
+		with self.condition:
+			if address in self.plugs:
+				self._unregister(address)
+			self.plugs[address] = {'device': device, 'state': None, 'updated': None, 'events': 0}
+		self.registry.register(device)
+		self.registry.on(device, BINARY_STATE_EVENT,
+			lambda device, event_type, value: self._onEvent(address, device, value))
+		# one read so the state is known before the first event arrives
+		self.pollState(address)
+
+	#============================================
+	def _unregister(self, address: str) -> None:
+		"""
+		Drop a plug's subscription, ignoring errors from a plug already gone.
+		"""
+		plug = self.plugs.pop(address, None)
+		if plug is None:
+			return
+		try:
+			self.registry.unregister(plug['device'])
+		except Exception:
+			pass
+
+	#============================================
+	def _onEvent(self, address: str, device, value) -> None:
+		"""
+		Registry callback: record a pushed BinaryState and wake waiting switches.
+		"""
+		try:
+			state = parse_binary_state(value)
+		except ValueError:
+			return
+		with self.condition:
+			plug = self.plugs.get(address)
+			# events from a replaced connection are stale
+			if plug is None or plug['device'] is not device:
+				return
+			plug['state'] = state
+			plug['updated'] = self.clock()
+			plug['events'] += 1
+			self.condition.notify_all()
+
+	#============================================
+	def _setState(self, address: str, state: int) -> None:
+		with self.condition:
+			plug = self.plugs[address]
+			plug['state'] = state
+			plug['updated'] = self.clock()
+			self.condition.notify_all()
+
+	#============================================
+	def pollState(self, address: str) -> int:
+		"""
+		Read the state from the plug itself and update the cache.
+		"""
+		state = self.plugs[address]['device'].get_state(force_update=True)
+		self._setState(address, state)
+		return state
+
+	#============================================
+	def getState(self, address: str) -> int:
+		"""
+		Return the cached state, polling only when it is unknown or too old.
+		"""
+		with self.condition:
+			plug = self.plugs[address]
+			state = plug['state']
+			updated = plug['updated']
+		if state is None or self.clock() - updated > self.max_state_age_seconds:
+			state = self.pollState(address)
+		return state
+
+	#============================================
+	def isOn(self, address: str) -> bool:
+		return self.getState(address) in ON_STATES
+
+	#============================================
+	def switch(self, address: str, turn_on: bool, confirm_seconds: float = DEFAULT_CONFIRM_SECONDS) -> bool:
+		"""
+		Switch a plug and wait until it reports the new state.
+
+		Args:
+			address: IP address of the plug.
+			turn_on: True to close the relay, False to open it.
+			confirm_seconds: time allowed for the plug's event.
+
+		Returns:
+			bool: True when the plug confirmed the new state; False when no
+				event arrived in time and one direct read disagrees.
+		"""
+		wanted = ON_STATES if turn_on else (OFF_STATE,)
+		with self.condition:
+			plug = self.plugs[address]
+			device = plug['device']
+			events_before = plug['events']
+		if turn_on:
+			device.on()
+		else:
+			device.off()
+		deadline = self.clock() + confirm_seconds
+		with self.condition:
+			# only an event sent after the command counts as confirmation
+			while plug['events'] == events_before or plug['state'] not in wanted:
+				remaining = deadline - self.clock()
+				if remaining <= 0 or self.plugs.get(address) is not plug:
+					break
+				self.condition.wait(remaining)
+			else:
+				return True
+		# no event: the subscription may have lapsed, ask the plug once
+		return self.pollState(address) in wanted
+
+	#============================================
+	def isSubscribed(self, address: str) -> bool:
+		"""
+		Return False when the registry reports the plug's subscription as failed.
+		"""
+		device = self.plugs[address]['device']
+		is_subscribed = getattr(self.registry, 'is_subscribed', None)
+		if is_subscribed is None:
+			# older pywemo renews silently and cannot report failures
+			return True
+		return bool(is_subscribed(device))
+
+	#============================================
+	def ensureSubscribed(self, address: str) -> bool:
+		"""
+		Reconnect a plug only when its subscription has failed.
+
+		Returns:
+			bool: True when the plug was reconnected.
+		"""
+		if address in self.plugs and self.isSubscribed(address):
+			return False
+		self.addPlug(address)
+		return True
+
+#============================================
+# outcomes of PlugActuator.actuate()
+UNCHANGED = "unchanged"  # the plug was already in the wanted state
+SWITCHED = "switched"  # the plug was switched and confirmed the new state
+FAILED = "failed"  # every attempt failed
+SKIPPED = "skipped"  # the circuit is open, the plug was left alone
+
+# circuit breaker states
+CIRCUIT_CLOSED = "closed"  # healthy, actuate normally
+CIRCUIT_OPEN = "open"  # failing, skip the plug until the cool-down ends
+CIRCUIT_HALF_OPEN = "half_open"  # cool-down over, one trial actuation
+
+#============================================
+class PlugActuator(object):
+	"""
+	Bounded, non-recursive switching of one plug with a circuit breaker.
+
+	Each actuate() call runs a small state machine: read the state, switch,
+	let the relay settle, verify, and on failure back off exponentially and
+	try again, up to `attempts` times. A plug whose actuations keep failing
+	opens its circuit and is skipped for `open_seconds`, then gets one trial
+	actuation; the other plugs are never held up or stopped by it.
+	"""
+
+	def __init__(self, manager: WemoPlugManager, address: str, attempts: int = 4,
+			settle_seconds: float = 0.0, verify_seconds: float = DEFAULT_CONFIRM_SECONDS,
+			backoff_seconds: float = 2.0, max_backoff_seconds: float = 30.0,
+			failure_threshold: int = 3, open_seconds: float = 900.0,
+			clock=time.monotonic, sleep=time.sleep):
+		"""
+		Args:
+			manager: WemoPlugManager the plug is registered with.
+			address: IP address of the plug.
+			attempts: switch attempts per actuation.
+			settle_seconds: pause after a confirmed switch before the final check.
+			verify_seconds: time the plug has to confirm a switch.
+			backoff_seconds: pause after the first failed attempt, doubled after each.
+			max_backoff_seconds: cap of the pause between attempts.
+			failure_threshold: failed actuations in a row that open the circuit.
+			open_seconds: how long an open circuit skips the plug.
+			clock: monotonic time source, replaceable in tests.
+			sleep: sleep function, replaceable in tests.
+		"""
+		if attempts < 1:
+			raise ValueError(f"attempts must be at least 1, not {attempts}")
+		self.manager = manager
+		self.address = address
+		self.attempts = attempts
+		self.settle_seconds = settle_seconds
+		self.verify_seconds = verify_seconds
+		self.backoff_seconds = backoff_seconds
+		self.max_backoff_seconds = max_backoff_seconds
+		self.failure_threshold = failure_threshold
+		self.open_seconds = open_seconds
+		self.clock = clock
+		self.sleep = sleep
+		self.circuit = CIRCUIT_CLOSED
+		self.opened_at = None
+		self.consecutive_failures = 0
+		self.switches = 0
+		self.failures = 0
+		self.skips = 0
+		self.last_error = None
+
+	#============================================
+	def _circuitAllows(self) -> bool:
+		"""
+		Return True when the breaker lets an actuation through.
+		"""
+		if self.circuit != CIRCUIT_OPEN:
+			return True
+		if self.clock() - self.opened_at < self.open_seconds:
+			return False
+		self.circuit = CIRCUIT_HALF_OPEN
+		return True
+
+	#============================================
+	def _attempt(self, turn_on: bool, wanted: tuple) -> str:
+		"""
+		One pass of read, switch, settle and verify.
+
+		Returns:
+			str: UNCHANGED, SWITCHED or FAILED.
+		"""
+		if self.address not in self.manager.plugs:
+			self.last_error = "not connected"
+			return FAILED
+		if self.manager.getState(self.address) in wanted:
+			return UNCHANGED
+		if not self.manager.switch(self.address, turn_on, self.verify_seconds):
+			self.last_error = f"no {'on' if turn_on else 'off'} confirmation within {self.verify_seconds:.0f} seconds"
+			return FAILED
+		if self.settle_seconds > 0:
+			self.sleep(self.settle_seconds)
+			if self.manager.pollState(self.address) not in wanted:
+				self.last_error = "state changed back while settling"
+				return FAILED
+		return SWITCHED
+
+	#============================================
+	def ensureConnected(self) -> bool:
+		"""
+		Connect the plug when it never connected or its subscription failed.
+
+		A failed connection counts against the circuit breaker like a failed
+		actuation, so an unreachable plug is tried again once per cool-down
+		instead of holding up every cycle.
+
+		Returns:
+			bool: True when the plug was (re)connected, False when it already
+				was or its circuit is open.
+
+		Raises:
+			Exception: the connection error, after it was recorded.
+		"""
+		if self.address in self.manager.plugs and self.manager.isSubscribed(self.address):
+			return False
+		if not self._circuitAllows():
+			self.skips += 1
+			return False
+		try:
+			self.manager.ensureSubscribed(self.address)
+		except Exception as error:
+			self.last_error = f"connect {type(error).__name__}: {error}"
+			self._record(FAILED)
+			raise
+		return True
+
+	#============================================
+	def actuate(self, turn_on: bool) -> str:
+		"""
+		Bring the plug to the wanted state.
+
+		Never raises for plug errors and never exits; the outcome and health()
+		say what happened.
+
+		Args:
+			turn_on: True to close the relay, False to open it.
+
+		Returns:
+			str: UNCHANGED, SWITCHED, FAILED or SKIPPED.
+		"""
+		if not self._circuitAllows():
+			self.skips += 1
+			return SKIPPED
+		wanted = ON_STATES if turn_on else (OFF_STATE,)
+		outcome = FAILED
+		for attempt in range(self.attempts):
+			if attempt > 0:
+				backoff = min(self.backoff_seconds * 2 ** (attempt - 1), self.max_backoff_seconds)
+				self.sleep(backoff)
+			try:
+				outcome = self._attempt(turn_on, wanted)
+			except Exception as error:
+				self.last_error = f"{type(error).__name__}: {error}"
+				outcome = FAILED
+			if outcome != FAILED:
+				break
+		self._record(outcome)
+		return outcome
+
+	#============================================
+	def _record(self, outcome: str) -> None:
+		"""
+		Update the statistics and the circuit breaker after an actuation.
+		"""
+		if outcome == FAILED:
+			self.failures += 1
+			self.consecutive_failures += 1
+			if self.circuit == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+				self.circuit = CIRCUIT_OPEN
+				self.opened_at = self.clock()
+			return
+		if outcome != SWITCHED:
+			# an unchanged cached state proves nothing about the plug
+			return
+		self.switches += 1
+		self.consecutive_failures = 0
+		self.circuit = CIRCUIT_CLOSED
+		self.opened_at = None
+		self.last_error = None
+
+	#============================================
+	def isHealthy(self) -> bool:
+		return self.circuit == CIRCUIT_CLOSED and self.consecutive_failures == 0
+
+	#============================================
+	def health(self) -> dict:
+		"""
+		Return the plug's actuation health as a plain dictionary.
+		"""
+		health = {
+			'address': self.address,
+			'circuit': self.circuit,
+			'consecutive_failures': self.consecutive_failures,
+			'switches': self.switches,
+			'failures': self.failures,
+			'skips': self.skips,
+			'last_error': self.last_error,
+		}
+		return health
@@ -1,131 +1,158 @@
 #!/usr/bin/env python3
 
+"""
+CGI script that draws today's ComEd 5-minute prices as a PNG.
+
+The feed only changes every five minutes, so the rendered image is cached
+in /tmp keyed by the feed's data-version stamp; matplotlib is imported only
+when the cache is stale and a new image has to be drawn.
+"""
+
+# Standard Library
 import io
 import os
 import sys
+import json
 import time
+
+# PIP modules
 import numpy
 
 REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if REPO_ROOT not in sys.path:
 	sys.path.insert(0, REPO_ROOT)
 
+# local repo modules
 from energylib import comedlib
-from matplotlib import use
-use('Agg')
-from matplotlib import pyplot
-
-#comedurl = "https://hourlypricing.comed.com/api?type=5minutefeed"
-testmode = False
-
-if testmode is True:
-	print("Content-Type: text/html")
-	print("\n")
-	print("<title>CGI script output</title>")
-	print("<h1>This is my first CGI script</h1>")
-	print("<ul>")
-	print(("<li> time: %s</li>"%(time.asctime())))
-
-comlib = comedlib.ComedLib()
-comlib.msg = testmode
-comlib.useCache = False
-if testmode: print("<li>import comed</li>")
-
-
-comedurl = comlib.getUrl()
-if testmode: print("<li>getUrl comed</li>")
-
-data = comlib.downloadComedJsonData(comedurl)
-if testmode: print("<li>downloaded comed data</li>")
-
-x = []
-yvalues = {}
-y = []
-mintime = int(data[-1]['millisUTC'])
-day = None
-for p in data:
-	ms = int(p['millisUTC'])
-	price = float(p['price'])
-	timestruct = list(time.localtime(ms/1000.))
-	if day is None:
-		day = timestruct[2]
-
-	hours = timestruct[3] + timestruct[4]/60.
-	if timestruct[2] != day:
-		hours -= 24.
-		continue
-	hour = int(hours)+1
-	hour2 = float(hour) - 0.99
+
+PLOT_CACHE_FILE = "/tmp/comed_plot_cache.png"
+PLOT_STAMP_FILE = "/tmp/comed_plot_cache.json"
+IMAGE_FORMAT = "png"
+
+#============================================
+def todays_points(data: list) -> tuple:
+	"""
+	Collect today's samples and their hourly means.
+
+	Args:
+		data: raw feed list, newest first.
+
+	Returns:
+		tuple: (x, y, x2, y2, peakvalue) with x in hours since midnight, y the
+			5-minute prices, x2/y2 the hourly mean line and peakvalue the top
+			of the y axis.
+	"""
+	x = []
+	y = []
+	yvalues = {}
+	day = None
+	for p in data:
+		ms = int(p['millisUTC'])
+		price = float(p['price'])
+		timestruct = list(time.localtime(ms/1000.))
+		if day is None:
+			day = timestruct[2]
+		if timestruct[2] != day:
+			continue
+		hours = timestruct[3] + timestruct[4]/60.
+		hour = int(hours)+1
+		hour2 = float(hour) - 0.99
+		yvalues.setdefault(hour, []).append(price)
+		yvalues.setdefault(hour2, []).append(price)
+		x.append(hours)
+		y.append(price)
+
+	x2 = sorted(yvalues.keys())
+	y2 = []
+	peakvalue = 0
+	for key in x2:
+		yarray = numpy.array(yvalues[key], dtype=numpy.float64)
+		yp = yarray.mean()
+		ypstd = yarray.std()
+		if yp+ypstd > peakvalue:
+			peakvalue = yp+ypstd+0.1
+		y2.append(yp)
+	peakvalue = max(peakvalue, 4)
+	return x, y, x2, y2, peakvalue
+
+#============================================
+def render_plot(data: list) -> bytes:
+	"""
+	Draw the price plot and return the encoded image.
+	"""
+	# matplotlib costs more to import than the rest of the request, so it
+	# is only loaded when the cached image is stale
+	from matplotlib import use
+	use('Agg')
+	from matplotlib import pyplot
+
+	x, y, x2, y2, peakvalue = todays_points(data)
+	pyplot.figure(figsize=(6.0, 8.0), dpi=100)
+	pyplot.ioff()
+	pyplot.plot(x, y, '+', color='darkgreen')
+	pyplot.plot(x2, y2, '-', color='darkblue', mew=0, ms=5, alpha=50)
+	pyplot.xticks(numpy.arange(int(min(x)/1.)*1, max(x), 1))
+	pyplot.ylim(ymin=0, ymax=peakvalue)
+
+	ax = pyplot.gca()
+	ax.xaxis.grid() # vertical lines
+	ax.yaxis.grid() # horizontal lines
+	pyplot.xlabel('Time (hours since midnight)')
+	pyplot.ylabel('Cents per kW hr')
+
+	pyplot.tight_layout()
+	figdata = io.BytesIO()
+	pyplot.savefig(figdata, format=IMAGE_FORMAT, dpi=100)
+	pyplot.close()
+	return figdata.getvalue()
+
+#============================================
+def cached_plot(stamp: list) -> bytes | None:
+	"""
+	Return the cached image when it was drawn from the same feed data, else None.
+	"""
+	try:
+		with open(PLOT_STAMP_FILE, "r") as f:
+			cached_stamp = json.load(f)
+		if cached_stamp != stamp:
+			return None
+		with open(PLOT_CACHE_FILE, "rb") as f:
+			return f.read()
+	except (OSError, ValueError):
+		return None
+
+#============================================
+def save_plot(image: bytes, stamp: list) -> None:
+	"""
+	Store the image and its data-version stamp, replacing both atomically.
+	"""
 	try:
-		yvalues[hour].append(price)
-		yvalues[hour2].append(price)
-	except KeyError:
-		yvalues[hour] = [price,]
-		yvalues[hour2] = [price,]
-	#hours = (ms - mintime)/1000./60./60.
-	x.append(hours)
-	y.append(price)
-if testmode: print("<li>sorted comed data</li>")
-
-y2 = []
-x2 = list(yvalues.keys())
-x2.sort()
-peakvalue = 0
-for key in x2:
-	ylist = yvalues[key]
-	yarray = numpy.array(ylist, dtype=numpy.float64)
-	yp = yarray.mean()
-	ypstd = yarray.std()
-	if yp+ypstd > peakvalue:
-		peakvalue = yp+ypstd+0.1
-	ypstr = "%2.3f"%(yp)
-	if key <= 12:
-		keyst = "%02da-%02da"%(key-1, key)
-	else:
-		keyst = "%02dp-%02dp"%(key-13, key-12)
-	y2.append(yp)
-
-if testmode: print("<li>second sort of comed data</li>")
-
-#median, std = comlib.getMedianComedRate()
-pyplot.figure(figsize=(6.0, 8.0), dpi=100)
-pyplot.ioff()
-pyplot.plot(x, y,  '+', color='darkgreen')
-pyplot.plot(x2, y2, '-', color='darkblue', mew=0, ms=5, alpha=50)
-pyplot.xticks(numpy.arange(int(min(x)/1.)*1, max(x), 1))
-peakvalue = max(peakvalue, 4)
-pyplot.ylim(ymin=0, ymax=peakvalue)
-
-if testmode: print("<li>pyplot part one of comed data</li>")
-
-ax = pyplot.gca()
-ax.xaxis.grid() # vertical lines
-ax.yaxis.grid() # horizontal lines
-
-pyplot.xlabel('Time (hours since midnight)')
-pyplot.ylabel('Cents per kW hr')
-
-if testmode: print("<li>pyplot part two of comed data</li>")
-
-
-format = "png"
-pyplot.tight_layout()
-#fig = pyplot.figure()
-#figdata = io.StringIO()
-figdata = io.BytesIO()
-pyplot.savefig(figdata, format=format, dpi=100)
-if testmode: print("<li>save fig completed</li>")
-
-#if testmode: pyplot.savefig("comed.png", format=format, dpi=200)
-
-if not testmode: print(("Content-Type: image/%s\n"%(format)))
-#if not testmode: sys.stdout.write(figdata.getvalue())
-if not testmode: sys.stdout.buffer.write(figdata.getvalue())
-
-print(("<li> time: %s</li>"%(time.asctime())))
-if testmode: print("<li>ready to write image...</li>")
-if testmode: print("</ul>")
-if testmode:
-	print(("<img src='data:image/png;base64,%s'/>"
-		%(figdata.getvalue().encode("base64").strip())))
-if testmode: print("</body></html>")
+		for path, content, mode in ((PLOT_CACHE_FILE, image, "wb"), (PLOT_STAMP_FILE, json.dumps(stamp), "w")):
+			temp_path = f"{path}.{os.getpid()}.tmp"
+			with open(temp_path, mode) as f:
+				f.write(content)
+			os.replace(temp_path, path)
+	except OSError:
+		# a read-only /tmp only costs the next request a redraw
+		pass
+
+#============================================
+def main():
+	comlib = comedlib.ComedLib()
+	comlib.msg = False
+	comlib.useCache = False
+	data = comlib.downloadComedJsonData(comlib.getUrl())
+
+	stamp = list(comedlib.dataVersion(data))
+	image = cached_plot(stamp)
+	if image is None:
+		image = render_plot(data)
+		save_plot(image, stamp)
+
+	sys.stdout.write(f"Content-Type: image/{IMAGE_FORMAT}\n\n")
+	sys.stdout.flush()
+	sys.stdout.buffer.write(image)
+
+#============================================
+if __name__ == '__main__':
+	main()
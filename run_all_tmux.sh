@@ -38,26 +38,22 @@ print_last_tmux_output() {
 }
 
 # Launch sessions
-# Generates comed.html + dashboard JSON files (replaces separate gen_html session)
-launch_session gen_dashboard $ENERGY_DIR "python3 scripts/generate_dashboard_data.py" 150
-launch_session wemo $ENERGY_DIR "python3 apps/wemoPlug-comed-multi.py" 300
-launch_session awtrix3 $ENERGY_DIR/awtrix3/ "python3 send_price.py" 90
+# One resident supervisor runs the ComEd feed publisher, dashboard generator,
+# AWTRIX sender, WeMo controller and (May-September) thermostat job as
+# scheduled tasks, importing energylib once; the loop only restarts it if it dies
+launch_session supervisor $ENERGY_DIR "python3 -u scripts/energy_supervisor.py" 10
 #launch_session log_energy $ENERGY_DIR "python3 logEnergy.py" 300
-# Only launch 'summer_ac' during May through September
-current_month=$(date +%m)
-if (( 5 <= 10#$current_month && 10#$current_month <= 9 )); then
-  launch_session summer_ac $ENERGY_DIR "python3 apps/thermostat-comed.py" 300
-fi
+# Standalone sessions, if a job has to run outside the supervisor:
+#launch_session comed_feed $ENERGY_DIR "python3 scripts/comed_feed_daemon.py" 10
+#launch_session gen_dashboard $ENERGY_DIR "python3 scripts/generate_dashboard_data.py" 150
+#launch_session wemo $ENERGY_DIR "python3 apps/wemoPlug-comed-multi.py" 300
+#launch_session awtrix3 $ENERGY_DIR/awtrix3/ "python3 send_price.py" 90
+#launch_session summer_ac $ENERGY_DIR "python3 apps/thermostat-comed.py" 300
 
 echo
 echo "Updated tmux sessions:"
 tmux list-sessions 2>/dev/null || echo "  (no tmux sessions)"
 
 # Show last few lines of session output
-print_last_tmux_output gen_dashboard
-print_last_tmux_output wemo
-print_last_tmux_output awtrix3
+print_last_tmux_output supervisor
 #print_last_tmux_output log_energy
-if (( 6 <= 10#$current_month && 10#$current_month <= 8 )); then
-  print_last_tmux_output summer_ac
-fi
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""
+Backfill the local ComEd price archive from the ComEd API.
+
+Walks the requested span one calendar month at a time, downloading several
+months concurrently, and appends every 5-minute sample to the SQLite archive
+in energylib/comed_archive.py. Months that are already archived are skipped,
+and a partly archived month (for example an interrupted run, or the current
+month) downloads only the span from its first to its last missing sample.
+Overlapping samples are ignored by the archive, so re-running is safe.
+
+Example:
+	python3 scripts/backfill_comed_archive.py --months 12
+"""
+
+# Standard Library
+import os
+import sys
+import time
+import argparse
+import datetime
+import concurrent.futures
+
+# Determine repo root and add to path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+# local repo modules
+from energylib import comedlib
+from energylib import comed_archive
+
+# ComEd publishes one price every 5 minutes
+SAMPLE_MILLIS = 5 * 60 * 1000
+# a month with this fraction of its samples is treated as complete
+COMPLETE_FRACTION = 0.98
+
+#============================================
+def parse_args():
+	"""
+	Parse command-line arguments.
+
+	Returns:
+		argparse.Namespace: parsed arguments.
+	"""
+	parser = argparse.ArgumentParser(description="Backfill the ComEd price archive month by month")
+	parser.add_argument('-m', '--months', dest='months', type=int, default=12,
+		help="Number of calendar months to backfill, counting the current one")
+	parser.add_argument('-s', '--start', dest='start',
+		help="First month to backfill as YYYY-MM (overrides --months)")
+	parser.add_argument('-w', '--workers', dest='workers', type=int, default=3,
+		help="Months downloaded concurrently")
+	parser.add_argument('-a', '--archive-file', dest='archive_file',
+		default=comed_archive.DEFAULT_ARCHIVE_FILE, help="Path of the SQLite archive")
+	args = parser.parse_args()
+	return args
+
+#============================================
+def month_ranges(first_month: datetime.datetime, now: datetime.datetime) -> list:
+	"""
+	Split the span from first_month to now into local calendar months.
+
+	Args:
+		first_month: local midnight of the first day of the first month.
+		now: local end of the span.
+
+	Returns:
+		list: (start_seconds, end_seconds) Unix time tuples, oldest first.
+	"""
+	ranges = []
+	month_start = first_month
+	while month_start < now:
+		if month_start.month == 12:
+			next_month = month_start.replace(year=month_start.year + 1, month=1)
+		else:
+			next_month = month_start.replace(month=month_start.month + 1)
+		month_end = min(next_month, now)
+		ranges.append((month_start.timestamp(), month_end.timestamp()))
+		month_start = next_month
+	return ranges
+
+#============================================
+def first_month_start(args: argparse.Namespace, now: datetime.datetime) -> datetime.datetime:
+	"""
+	Resolve the first month to backfill from the arguments.
+
+	Args:
+		args: parsed arguments.
+		now: current local time.
+
+	Returns:
+		datetime.datetime: local midnight of the first day of that month.
+	"""
+	if args.start:
+		first = datetime.datetime.strptime(args.start, "%Y-%m")
+		return first
+	year = now.year
+	month = now.month - (args.months - 1)
+	while month < 1:
+		month += 12
+		year -= 1
+	first = datetime.datetime(year, month, 1)
+	return first
+
+#============================================
+def pending_range(start_seconds: float, end_seconds: float, archive_file: str) -> tuple | None:
+	"""
+	Return the part of a month that still needs downloading.
+
+	The range runs from the first missing sample to the end of the last gap
+	(comed_archive.missing_ranges()), so holes left anywhere in the month by
+	an interrupted run or a failed poll are filled; archived samples inside
+	the range are downloaded again and ignored.
+
+	Args:
+		start_seconds: month start as a Unix time.
+		end_seconds: month end as a Unix time.
+		archive_file: path of the SQLite archive.
+
+	Returns:
+		tuple: (start_seconds, end_seconds) to download, or None when complete.
+	"""
+	start_millis = int(start_seconds * 1000)
+	end_millis = int(end_seconds * 1000)
+	count, _oldest, _newest = comed_archive.range_summary(start_millis, end_millis, archive_file)
+	expected = (end_millis - start_millis) // SAMPLE_MILLIS
+	if count >= COMPLETE_FRACTION * expected:
+		return None
+	gaps = comed_archive.missing_ranges(start_millis, end_millis, SAMPLE_MILLIS, archive_file)
+	if not gaps:
+		return None
+	return (gaps[0][0] / 1000.0, gaps[-1][1] / 1000.0)
+
+#============================================
+def download_month(comlib: comedlib.ComedLib, start_seconds: float, end_seconds: float) -> tuple | None:
+	"""
+	Download one month in a worker thread.
+
+	Args:
+		comlib: ComedLib used for the request.
+		start_seconds: range start as a Unix time.
+		end_seconds: range end as a Unix time.
+
+	Returns:
+		tuple: (millis, prices) arrays, or None on failure.
+	"""
+	try:
+		columns = comlib.downloadRange(start_seconds, end_seconds)
+	except RuntimeError as error:
+		print(f"WARNING: {error}")
+		return None
+	return columns
+
+#============================================
+def main():
+	args = parse_args()
+	now = datetime.datetime.now()
+	ranges = month_ranges(first_month_start(args, now), now)
+
+	comlib = comedlib.ComedLib()
+	comlib.useArchive = True
+	comlib.archive_file = args.archive_file
+	# a whole month is a large response; give it time
+	comlib.request_timeout_seconds = 30.0
+	comlib.download_deadline_seconds = 120.0
+
+	jobs = []
+	for start_seconds, end_seconds in ranges:
+		label = time.strftime('%Y-%m', time.localtime(start_seconds))
+		pending = pending_range(start_seconds, end_seconds, args.archive_file)
+		if pending is None:
+			print(f"{label}: already archived")
+			continue
+		jobs.append((label, pending))
+
+	total_written = 0
+	with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+		futures = {}
+		for label, (start_seconds, end_seconds) in jobs:
+			future = executor.submit(download_month, comlib, start_seconds, end_seconds)
+			futures[future] = label
+		# the archive is written only from this thread, one transaction per month
+		for future in concurrent.futures.as_completed(futures):
+			label = futures[future]
+			columns = future.result()
+			if columns is None:
+				print(f"{label}: download failed, re-run to retry")
+				continue
+			millis, prices = columns
+			written = comed_archive.append_samples(millis, prices, args.archive_file)
+			total_written += written
+			print(f"{label}: {len(millis)} samples downloaded, {written} new")
+	print(f"Archived {total_written} new samples in {args.archive_file}")
+
+#============================================
+if __name__ == '__main__':
+	main()
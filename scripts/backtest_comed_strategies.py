@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Backtest the WeMo plug and battery arbitrage rules on archived ComEd prices.
+
+Loads 5-minute prices from the local archive (fill it with
+scripts/backfill_comed_archive.py), replays the live decision rules over
+every sample for every combination of the given thresholds, and prints the
+best settings next to the current defaults.
+
+Example:
+	python3 scripts/backtest_comed_strategies.py --days 90 \\
+		--lower-bound 2.4 2.8 3.2 --buffer-rate 0.25 0.5 1.0
+"""
+
+# Standard Library
+import os
+import sys
+import time
+import argparse
+
+# PIP modules
+import numpy
+
+# Determine repo root and add to path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+# local repo modules
+from energylib import comed_archive
+from energylib import comed_backtest
+from energylib import charging_decision
+
+#============================================
+def parse_args():
+	"""
+	Parse command-line arguments.
+
+	Returns:
+		argparse.Namespace: parsed arguments.
+	"""
+	parser = argparse.ArgumentParser(description="Backtest price-based load decisions on archived ComEd prices")
+	parser.add_argument('-d', '--days', dest='days', type=float, default=30.0,
+		help="Days of history to replay, ending now")
+	parser.add_argument('-a', '--archive-file', dest='archive_file',
+		default=comed_archive.DEFAULT_ARCHIVE_FILE, help="Path of the SQLite archive")
+	for name, default in charging_decision.DEFAULT_PARAMS.items():
+		flag = '--' + name.replace('_', '-')
+		parser.add_argument(flag, dest=name, type=float, nargs='+', default=[default],
+			help=f"Values of {name} to try (default {default})")
+	parser.add_argument('-k', '--load-kw', dest='load_kw', type=float, default=1.0,
+		help="Plug load while on, in kW")
+	parser.add_argument('-f', '--fudge-factor', dest='fudge_factors', type=float, nargs='+',
+		default=[1.0], help="Battery arbitrage margins to try, in cents")
+	parser.add_argument('-t', '--top', dest='top', type=int, default=10,
+		help="Number of plug settings to list")
+	args = parser.parse_args()
+	return args
+
+#============================================
+def load_history(archive_file: str, days: float) -> tuple:
+	"""
+	Load archived prices, adding the median warm-up window before the span.
+
+	Args:
+		archive_file: path of the SQLite archive.
+		days: days of history to replay.
+
+	Returns:
+		tuple: (millis, prices) arrays, oldest first.
+	"""
+	end_millis = int(time.time() * 1000)
+	warmup_millis = comed_backtest.MEDIAN_WINDOW * 5 * 60 * 1000
+	start_millis = end_millis - int(days * 86400 * 1000) - warmup_millis
+	columns = comed_archive.query_range(start_millis, None, archive_file)
+	return columns
+
+#============================================
+def print_plug_report(report: dict, top: int) -> None:
+	"""
+	Print the cheapest plug settings and the current defaults.
+
+	Args:
+		report: output of comed_backtest.simulate_plug().
+		top: number of settings to list.
+	"""
+	names = list(charging_decision.DEFAULT_PARAMS)
+	header = "".join(f"{name:>14s}" for name in names)
+	print(f"{header}{'kWh':>9s}{'avg c/kWh':>11s}{'saved $':>9s}{'toggles':>9s}{'on %':>7s}")
+	# cheapest average price first, settings that never turn on last
+	order = numpy.argsort(numpy.nan_to_num(report['avg_price'], nan=numpy.inf))
+	defaults = numpy.ones(len(report['kwh']), dtype=bool)
+	for name in names:
+		defaults &= report[name] == charging_decision.DEFAULT_PARAMS[name]
+	rows = list(order[:top])
+	rows += [i for i in numpy.flatnonzero(defaults) if i not in rows]
+	for i in rows:
+		values = "".join(f"{report[name][i]:14.2f}" for name in names)
+		marker = "  <- current" if defaults[i] else ""
+		print(f"{values}{report['kwh'][i]:9.1f}{report['avg_price'][i]:11.3f}"
+			f"{report['savings_cents'][i] / 100.0:9.2f}{report['toggles'][i]:9d}"
+			f"{100.0 * report['on_fraction'][i]:7.1f}{marker}")
+
+#============================================
+def main():
+	args = parse_args()
+	millis, prices = load_history(args.archive_file, args.days)
+	if len(prices) < comed_backtest.MEDIAN_WINDOW + 1:
+		raise RuntimeError(f"only {len(prices)} archived samples; run scripts/backfill_comed_archive.py first")
+
+	start_time = time.time()
+	features = comed_backtest.build_features(millis, prices)
+	values = {name: getattr(args, name) for name in charging_decision.DEFAULT_PARAMS}
+	grid = comed_backtest.parameter_grid(**values)
+	report = comed_backtest.simulate_plug(features, grid, args.load_kw)
+	battery = comed_backtest.simulate_battery(features, args.fudge_factors)
+	elapsed = time.time() - start_time
+
+	span_days = (features['millis'][-1] - features['millis'][0]) / 86400000.0
+	print(f"Replayed {len(features['price'])} ticks over {span_days:.1f} days, "
+		f"{len(report['kwh'])} plug settings in {elapsed:.2f} seconds")
+	print(f"Average billed price {features['hour_mean_price'].mean():.3f} c/kWh\n")
+	print_plug_report(report, args.top)
+	print("\nBattery arbitrage (no state-of-charge limits)")
+	for i, fudge in enumerate(battery['fudge_factor']):
+		print(f"  fudge {fudge:5.2f}c: charged {battery['kwh_charged'][i]:8.1f} kWh, "
+			f"discharged {battery['kwh_discharged'][i]:8.1f} kWh, "
+			f"value ${battery['value_cents'][i] / 100.0:8.2f}")
+
+#============================================
+if __name__ == '__main__':
+	main()
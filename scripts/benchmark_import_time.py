@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+"""
+Measure the cold import time of the energylib modules and the scripts' entry points.
+
+Every import runs in a fresh interpreter with -X importtime, several times
+per module, and the median cumulative time is reported together with the
+heavy third-party packages the import pulled in. Use it to confirm that
+cron- and tmux-launched scripts only pay for the dependencies they use.
+
+Example:
+	python3 scripts/benchmark_import_time.py --repeats 7
+	python3 scripts/benchmark_import_time.py energylib.comedlib energylib.htmltools
+"""
+
+# Standard Library
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+# Determine repo root and add to path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# modules timed when none are given
+DEFAULT_MODULES = (
+	'energylib.comedlib',
+	'energylib.comed_feed',
+	'energylib.htmltools',
+	'energylib.charging_decision',
+	'energylib.comed_billing',
+	'energylib.comed_forecast',
+	'energylib.ecobeelib',
+	'energylib.solarProduction',
+)
+# packages worth reporting when an import loads them
+HEAVY_PACKAGES = ('numpy', 'requests', 'urllib3', 'pyecobee', 'pywemo', 'matplotlib', 'scipy', 'yaml')
+
+#============================================
+def parse_args():
+	"""
+	Parse command-line arguments.
+
+	Returns:
+		argparse.Namespace: parsed arguments.
+	"""
+	parser = argparse.ArgumentParser(description="Benchmark cold import times of energylib modules")
+	parser.add_argument('modules', nargs='*', default=list(DEFAULT_MODULES),
+		help="Dotted module names to import (default: the main energylib modules)")
+	parser.add_argument('-r', '--repeats', dest='repeats', type=int, default=5,
+		help="Fresh interpreters per module; the median is reported")
+	args = parser.parse_args()
+	return args
+
+#============================================
+def parse_importtime(stderr: str) -> dict:
+	"""
+	Parse -X importtime output into cumulative microseconds per module.
+
+	Args:
+		stderr: stderr of an interpreter run with -X importtime.
+
+	Returns:
+		dict: module name -> cumulative import time in microseconds.
+	"""
+	cumulative = {}
+	for line in stderr.splitlines():
+		if not line.startswith("import time:"):
+			continue
+		fields = line[len("import time:"):].split("|")
+		if len(fields) != 3 or not fields[1].strip().isdigit():
+			# header line
+			continue
+		cumulative[fields[2].strip()] = int(fields[1])
+	return cumulative
+
+#============================================
+def time_import(module: str) -> tuple:
+	"""
+	Import one module in a fresh interpreter.
+
+	Args:
+		module: dotted module name.
+
+	Returns:
+		tuple: (cumulative milliseconds, sorted heavy packages loaded), or
+			(None, error message) when the import fails.
+	"""
+	command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+	result = subprocess.run(command, capture_output=True, text=True, cwd=REPO_ROOT)
+	if result.returncode != 0:
+		last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+		return None, last_line
+	cumulative = parse_importtime(result.stderr)
+	milliseconds = cumulative.get(module, 0) / 1000.0
+	heavy = sorted(name for name in HEAVY_PACKAGES if name in cumulative)
+	return milliseconds, heavy
+
+#============================================
+def main():
+	args = parse_args()
+	print(f"{'module':<32s}{'median ms':>10s}{'min ms':>9s}  heavy packages loaded")
+	for module in args.modules:
+		times = []
+		heavy = []
+		for _ in range(max(args.repeats, 1)):
+			milliseconds, heavy = time_import(module)
+			if milliseconds is None:
+				break
+			times.append(milliseconds)
+		if not times:
+			print(f"{module:<32s}{'-':>10s}{'-':>9s}  not importable: {heavy}")
+			continue
+		print(f"{module:<32s}{statistics.median(times):10.1f}{min(times):9.1f}  {', '.join(heavy) or '-'}")
+
+#============================================
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""
+Resident fetcher for the shared ComEd price feed.
+
+Downloads the ComEd 5-minute feed once per interval and publishes the
+parsed columns with energylib.comed_feed. Every other ComedLib in the
+house (dashboard, wemo, awtrix3, thermostat) reads the published feed
+instead of making its own HTTP request.
+
+Designed to run in a tmux loop (see run_all_tmux.sh).
+"""
+
+# Standard Library
+import os
+import sys
+import time
+import random
+import argparse
+
+# Determine repo root and add to path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+# local repo modules
+from energylib import comedlib
+from energylib import comed_feed
+
+#============================================
+def parse_args():
+	"""
+	Parse command-line arguments.
+
+	Returns:
+		argparse.Namespace: parsed arguments.
+	"""
+	parser = argparse.ArgumentParser(description="Publish the shared ComEd price feed")
+	parser.add_argument('-i', '--interval', dest='interval', type=float, default=60.0,
+		help="Seconds between downloads")
+	parser.add_argument('-f', '--feed-file', dest='feed_file', default=comed_feed.DEFAULT_FEED_FILE,
+		help="Path of the published feed file")
+	parser.add_argument('-1', '--once', dest='once', action='store_true',
+		help="Publish a single time and exit")
+	parser.add_argument('-d', '--debug', dest='debug', action='store_true',
+		help="Print cache and download details")
+	args = parser.parse_args()
+	return args
+
+#============================================
+def publish_once(comlib: comedlib.ComedLib) -> bool:
+	"""
+	Download fresh prices and publish them to the feed.
+
+	Args:
+		comlib: ComedLib instance configured to bypass the feed.
+
+	Returns:
+		bool: True when new prices were published.
+	"""
+	# never republish last-known-good data, readers would take it as fresh
+	try:
+		data = comlib.refreshComedJsonData(fallback=False)
+	except RuntimeError as error:
+		print(f"{time.strftime('%H:%M:%S')} WARNING: {error}")
+		return False
+	if not data:
+		print(f"{time.strftime('%H:%M:%S')} WARNING: no ComEd data downloaded")
+		return False
+	series = comlib.publishFeed(data)
+	if series is None:
+		return False
+	latest_price = float(series.prices[0])
+	age_seconds = time.time() - series.latestMillis() / 1000.0
+	print(f"{time.strftime('%H:%M:%S')} published {len(series)} samples, "
+		f"latest {latest_price:.1f}c, {age_seconds:.0f}s old")
+	return True
+
+#============================================
+def main():
+	args = parse_args()
+	comlib = comedlib.ComedLib()
+	# the publisher must never read its own feed back
+	comlib.useFeed = False
+	comlib.useArchive = True
+	comlib.feed_file = args.feed_file
+	comlib.debug = args.debug
+	while True:
+		publish_once(comlib)
+		if args.once:
+			break
+		# small jitter keeps this off the exact minute boundary
+		time.sleep(args.interval + random.uniform(0, 5))
+
+#============================================
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+"""
+Run the house energy jobs as periodic tasks in one resident process.
+
+Replaces the per-job `while true; do python3 ...; sleep N; done` loops of
+run_all_tmux.sh: energylib is imported once, and the ComEd feed publisher,
+dashboard generator, AWTRIX sender, WeMo plug controller and summer
+thermostat job run on an energylib.task_scheduler.TaskScheduler with their
+own intervals, jitter and timeouts. All jobs share one ComedLib, so prices
+fetched by the feed task are served from memory to the others, and a
+token task keeps the shared Ecobee token store fresh. A job that
+raises is logged and retried with backoff without affecting the rest;
+each job's modules are loaded on its first run, so a missing dependency
+(pywemo, pyecobee) only disables that job.
+
+Example:
+	python3 scripts/energy_supervisor.py --no-thermostat
+"""
+
+# Standard Library
+import os
+import sys
+import time
+import argparse
+import datetime
+import importlib.util
+
+# Determine repo root and add to path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+# local repo modules
+from energylib import comedlib
+from energylib import task_scheduler
+
+# job scripts, loaded by path because several names are not importable
+JOB_SCRIPTS = {
+	'feed': 'scripts/comed_feed_daemon.py',
+	'dashboard': 'scripts/generate_dashboard_data.py',
+	'awtrix': 'awtrix3/send_price.py',
+	'wemo': 'apps/wemoPlug-comed-multi.py',
+	'thermostat': 'apps/thermostat-comed.py',
+}
+# pause of the wemo task on top of its wait for the next published price
+WEMO_RECHECK_SECONDS = 5.0
+
+#============================================
+def parse_args():
+	"""
+	Parse command-line arguments.
+
+	Returns:
+		argparse.Namespace: parsed arguments.
+	"""
+	parser = argparse.ArgumentParser(description="Run the energy jobs as scheduled tasks in one process")
+	parser.add_argument('--feed-interval', dest='feed_interval', type=float, default=60.0,
+		help="Seconds between ComEd feed downloads")
+	parser.add_argument('--dashboard-interval', dest='dashboard_interval', type=float, default=150.0,
+		help="Seconds between dashboard updates")
+	parser.add_argument('--awtrix-interval', dest='awtrix_interval', type=float, default=90.0,
+		help="Seconds between AWTRIX updates")
+	parser.add_argument('--wemo-max-wait', dest='wemo_max_wait', type=float, default=900.0,
+		help="Longest wait between WeMo pricing checks when no new price is published")
+	parser.add_argument('--thermostat-interval', dest='thermostat_interval', type=float, default=300.0,
+		help="Seconds between thermostat checks")
+	parser.add_argument('--thermostat-months', dest='thermostat_months', type=int, nargs=2,
+		default=[5, 9], metavar=('FIRST', 'LAST'), help="Months the thermostat job is active")
+	parser.add_argument('-o', '--output-dir', dest='output_dir', default='/var/www/html/api',
+		help="Directory for the dashboard JSON files")
+	parser.add_argument('-i', '--wemo-ip', dest='wemo_ips', action='append',
+		help="WeMo IP address (repeat for multiple plugs)")
+	parser.add_argument('-k', '--charge-kwh', dest='charge_kwh', type=float,
+		help="Energy the WeMo plugs deliver before --ready-by; enables day-ahead planning")
+	parser.add_argument('-p', '--charge-kw', dest='charge_kw', type=float, default=1.4,
+		help="Charger power draw in kW while on (default 1.4, Level 1)")
+	parser.add_argument('-b', '--ready-by', dest='ready_by', default='07:00',
+		help="Local time HH:MM by which the energy must be delivered")
+	for job in JOB_SCRIPTS:
+		parser.add_argument(f'--no-{job}', dest=f'run_{job}', action='store_false',
+			help=f"Do not run the {job} job")
+	parser.add_argument('--no-ecobee-tokens', dest='run_ecobee_tokens', action='store_false',
+		help="Do not refresh the Ecobee tokens ahead of expiry")
+	parser.add_argument('-s', '--status-seconds', dest='status_seconds', type=float, default=3600.0,
+		help="Seconds between task status summaries")
+	args = parser.parse_args()
+	return args
+
+#============================================
+def load_script(job: str):
+	"""
+	Import a job script by path, once.
+
+	Args:
+		job: key of JOB_SCRIPTS.
+
+	Returns:
+		module: the loaded script module.
+	"""
+	module_name = f"energy_job_{job}"
+	if module_name in sys.modules:
+		return sys.modules[module_name]
+	path = os.path.join(REPO_ROOT, JOB_SCRIPTS[job])
+	# awtrix3 scripts import their sibling modules without a package
+	script_dir = os.path.dirname(path)
+	if script_dir not in sys.path:
+		sys.path.append(script_dir)
+	spec = importlib.util.spec_from_file_location(module_name, path)
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[module_name] = module
+	try:
+		spec.loader.exec_module(module)
+	except BaseException:
+		del sys.modules[module_name]
+		raise
+	return module
+
+#============================================
+def feed_job(comlib: comedlib.ComedLib):
+	"""
+	Return the task that downloads and publishes the shared feed.
+	"""
+	def run():
+		load_script('feed').publish_once(comlib)
+	return run
+
+#============================================
+def dashboard_job(comlib: comedlib.ComedLib, output_dir: str):
+	"""
+	Return the task that writes the dashboard files.
+	"""
+	def run():
+		load_script('dashboard').generate_all(output_dir, comlib)
+	return run
+
+#============================================
+def awtrix_job(comlib: comedlib.ComedLib):
+	"""
+	Return the task that pushes prices, solar and date apps to the AWTRIX clock.
+	"""
+	def run():
+		load_script('awtrix').main(comlib)
+	return run
+
+#============================================
+def wemo_job(comlib: comedlib.ComedLib, wemo_ips: list, max_wait_seconds: float,
+		charge_kwh: float | None = None, charge_kw: float = 1.4, ready_by: str = '07:00'):
+	"""
+	Return the task that runs one WeMo pricing cycle, connecting on first use.
+
+	The plugs and the decision engine live for the whole process: each cycle
+	reconnects only the plugs whose subscription failed, so a failed cycle
+	keeps the engine's dwell times and toggle budget. After a cycle the task
+	holds until ComEd should publish the next 5-minute price (at most
+	max_wait_seconds), so the plugs are re-evaluated once per price instead
+	of on a random timer. With charge_kwh the plugs follow a day-ahead
+	cheapest-hours plan instead, and the task holds until the plan next
+	switches.
+	"""
+	context = {'plugs': None, 'state': None}
+
+	def run():
+		wemo = load_script('wemo')
+		if context['plugs'] is None:
+			context['plugs'] = wemo.connect_plugs(wemo_ips or wemo.wemoIpAddresses)
+			if charge_kwh is None:
+				context['state'] = wemo.new_cycle_state()
+			else:
+				context['state'] = wemo.new_plan_state()
+		if charge_kwh is not None:
+			return wemo.run_plan_cycle(context['plugs'], comlib, context['state'], charge_kwh,
+				charge_kw, ready_by)
+		hold_seconds = wemo.run_cycle(context['plugs'], comlib, context['state'])
+		if hold_seconds > 0:
+			return hold_seconds
+		now_seconds = time.time()
+		next_seconds = comedlib.nextPublicationSeconds(comlib.getLastPriceTimestampSeconds(), now_seconds)
+		return min(max(next_seconds - now_seconds, 0.0), max_wait_seconds)
+	return run
+
+#============================================
+def thermostat_job(comlib: comedlib.ComedLib, first_month: int, last_month: int):
+	"""
+	Return the task that adjusts the thermostat, only in the cooling months.
+
+	One controller is kept across runs, so the Ecobee session is opened once.
+	"""
+	context = {'controller': None}
+
+	def run():
+		month = datetime.date.today().month
+		if not first_month <= month <= last_month:
+			return
+		if context['controller'] is None:
+			thermostat = load_script('thermostat')
+			context['controller'] = thermostat.ThermoStat(thermostat.parse_args([]), comlib)
+		context['controller'].runCycle()
+	return run
+
+#============================================
+def ecobee_tokens_job(margin_seconds: float):
+	"""
+	Return the task that refreshes the stored Ecobee tokens ahead of expiry.
+
+	Every Ecobee consumer (dashboard, htmltools, thermostat) then finds a
+	valid access token in the shared token store instead of refreshing it
+	on its own request path.
+	"""
+	context = {'ecobee': None}
+
+	def run():
+		if context['ecobee'] is None:
+			from energylib import ecobeelib
+			myecobee = ecobeelib.MyEcobee()
+			myecobee.setLogger()
+			myecobee.readThermostatDefs()
+			context['ecobee'] = myecobee
+		if context['ecobee'].refreshTokensAhead(margin_seconds):
+			print(f"{time.strftime('%H:%M:%S')} refreshed the Ecobee access token")
+	return run
+
+#============================================
+def print_status(scheduler: task_scheduler.TaskScheduler) -> None:
+	"""
+	Print one line of run statistics per task.
+	"""
+	print(f"{time.strftime('%H:%M:%S')} task status:")
+	for status in scheduler.status():
+		duration = status['last_duration']
+		duration_text = f"{duration:.1f}s" if duration is not None else "-"
+		line = (f"  {status['name']:<12s} runs {status['runs']:5d}  failures {status['failures']:4d}"
+			f"  timeouts {status['timeouts']:3d}  last {duration_text}")
+		if status['running']:
+			line += "  (running)"
+		if status['last_error']:
+			line += f"  last error: {status['last_error']}"
+		print(line)
+
+#============================================
+def build_scheduler(args) -> task_scheduler.TaskScheduler:
+	"""
+	Register every enabled job on a new scheduler.
+	"""
+	comlib = comedlib.ComedLib()
+	comlib.msg = False
+	# the resident process keeps the price archive growing
+	comlib.useArchive = True
+	if args.run_feed:
+		# this process is the publisher: never read the feed back, the other
+		# jobs get the fresh download from the shared in-memory cache
+		comlib.useFeed = False
+	scheduler = task_scheduler.TaskScheduler()
+	if args.run_feed:
+		scheduler.addTask('feed', feed_job(comlib), args.feed_interval,
+			jitter_seconds=5, timeout_seconds=60)
+	# later jobs start a few seconds apart so the feed lands first
+	if args.run_dashboard:
+		scheduler.addTask('dashboard', dashboard_job(comlib, args.output_dir), args.dashboard_interval,
+			jitter_seconds=10, timeout_seconds=120, initial_delay_seconds=5)
+	if args.run_awtrix:
+		scheduler.addTask('awtrix', awtrix_job(comlib), args.awtrix_interval,
+			jitter_seconds=10, timeout_seconds=90, initial_delay_seconds=8)
+	if args.run_wemo:
+		# the job holds until the next price is due (or the plan switches);
+		# the interval only adds a few seconds for the feed task to publish it
+		job = wemo_job(comlib, args.wemo_ips, args.wemo_max_wait, args.charge_kwh, args.charge_kw, args.ready_by)
+		scheduler.addTask('wemo', job, WEMO_RECHECK_SECONDS,
+			timeout_seconds=600, initial_delay_seconds=10, max_backoff_seconds=300)
+	if args.run_ecobee_tokens:
+		# Ecobee access tokens last an hour; refresh with 15 minutes to spare
+		scheduler.addTask('ecobee_tokens', ecobee_tokens_job(900), 300,
+			jitter_seconds=30, timeout_seconds=60, initial_delay_seconds=2)
+	if args.run_thermostat:
+		scheduler.addTask('thermostat', thermostat_job(comlib, *args.thermostat_months),
+			args.thermostat_interval, jitter_seconds=30, timeout_seconds=180, initial_delay_seconds=12)
+	return scheduler
+
+#============================================
+def main():
+	args = parse_args()
+	scheduler = build_scheduler(args)
+	if not scheduler.tasks:
+		raise ValueError("every job is disabled")
+	# status summaries are just another task
+	scheduler.addTask('status', lambda: print_status(scheduler), args.status_seconds,
+		initial_delay_seconds=args.status_seconds)
+	print(f"{time.strftime('%H:%M:%S')} energy supervisor running: "
+		f"{', '.join(task.name for task in scheduler.tasks)}")
+	try:
+		scheduler.runForever()
+	except KeyboardInterrupt:
+		print_status(scheduler)
+
+#============================================
+if __name__ == '__main__':
+	main()
@@ -4,10 +4,12 @@
 Generate JSON data files for the energy dashboard.
 
 Fetches ComEd pricing, Ecobee thermostat, and solar production data
-using existing energylib modules and writes three JSON files atomically.
-Each data source is independent -- one failure does not block others.
+using existing energylib modules and writes three JSON files atomically,
+plus the static comed.html page from the same ComEd download. The sources
+are collected concurrently, each with its own timeout, and are
+independent -- one failure or slow device does not block the others.
 
-Designed to run in a tmux loop (see run_all_tmux.sh).
+Runs once per call; scripts/energy_supervisor.py schedules generate_all().
 """
 
 # Standard Library
@@ -15,9 +17,9 @@ import os
 import sys
 import json
 import time
-import math
 import argparse
 import datetime
+import threading
 
 # PIP modules
 import numpy
@@ -29,10 +31,27 @@ if REPO_ROOT not in sys.path:
 
 # local repo modules
 from energylib import comedlib
-from energylib import ecobeelib
 from energylib import solarProduction
 from energylib import htmltools
 
+# static ComEd page, written next to the dashboard
+COMED_HTML_PATH = "/var/www/html/comed.html"
+# seconds each source may take before the cycle reports it failed
+SOURCE_TIMEOUTS = {
+	'comed': 30.0,
+	'ecobee': 45.0,
+	'solar': 20.0,
+}
+# files each source writes, for failure reports
+SOURCE_FILES = {
+	'comed': ('comed.json', 'comed.html'),
+	'ecobee': ('ecobee.json',),
+	'solar': ('solar.json',),
+}
+# collector thread of each source; a source whose previous fetch is still
+# running is skipped, so a hung fetch holds at most one thread
+_source_threads = {}
+
 #============================================
 def write_json_atomic(filepath: str, data: dict) -> None:
 	"""
@@ -48,55 +67,66 @@ def write_json_atomic(filepath: str, data: dict) -> None:
 	os.replace(tmp_path, filepath)
 
 #============================================
-def generate_comed_data() -> dict:
+def new_comed_lib() -> comedlib.ComedLib:
+	"""
+	Return a ComedLib configured for one dashboard cycle.
+	"""
+	comlib = comedlib.ComedLib()
+	comlib.debug = False
+	comlib.useCache = False
+	return comlib
+
+#============================================
+def generate_comed_data(comlib: comedlib.ComedLib = None, comed_data: list = None) -> dict:
 	"""
 	Fetch ComEd pricing data and return a dashboard-ready dictionary.
 
+	Args:
+		comlib: ComedLib shared with other jobs; a new one when None.
+		comed_data: feed data already downloaded with comlib; fetched when None.
+
 	Returns:
 		dict with median, current, predicted rates, recent samples,
 		hourly averages, and raw prices for charting.
 	"""
-	comlib = comedlib.ComedLib()
-	comlib.debug = False
-	comlib.useCache = False
+	if comlib is None:
+		comlib = new_comed_lib()
 
-	comed_data = comlib.downloadComedJsonData()
+	if comed_data is None:
+		comed_data = comlib.downloadComedJsonData()
 	if comed_data is None:
 		raise RuntimeError("ComEd data download returned None")
+	# One columnar parse shared by the rate accessors and the tables below
+	series = comlib.getPriceSeries(comed_data)
 
 	# Compute rates
 	median, std = comlib.getMedianComedRate(comed_data)
 	current_rate = comlib.getCurrentComedRateUnSafe(comed_data)
 	predicted_rate = comlib.getPredictedRate(comed_data)
-	cutoff_rate = comlib.getReasonableCutOff()
+	cutoff_rate = comlib.getReasonableCutOff(comed_data)
 
 	# Recent samples (newest first from API)
 	now = datetime.datetime.now()
 	current_hour = now.hour
 	recent_samples = []
 	previous_samples = []
-	for item in comed_data[:24]:
-		ms = int(item['millisUTC'])
-		price = float(item['price'])
-		timestruct = time.localtime(ms / 1000.0)
+	for i in range(min(24, len(series))):
+		minutes = int(series.local_minutes[i])
+		time_hour = (minutes // 60) % 24
 		sample = {
-			"time_hour": timestruct.tm_hour,
-			"time_min": timestruct.tm_min,
-			"price": round(price, 2),
+			"time_hour": time_hour,
+			"time_min": minutes % 60,
+			"price": round(float(series.prices[i]), 2),
 		}
-		if timestruct.tm_hour == current_hour:
+		if time_hour == current_hour:
 			recent_samples.append(sample)
 		else:
 			previous_samples.append(sample)
 
-	# Hourly averages from parsed data
-	yvalues = comlib.parseComedData(comed_data)
+	# Hourly averages from the precomputed hourly index
 	hourly_averages = []
-	for hour_key in sorted(yvalues.keys(), reverse=True):
-		# Skip fractional keys (the 0.01 offset duplicates)
-		if not math.isclose(hour_key, round(hour_key), abs_tol=1e-6):
-			continue
-		avg_price = numpy.array(yvalues[hour_key]).mean()
+	hour_keys, averages = series.hourlyAverages()
+	for hour_key, avg_price in zip(hour_keys[::-1].tolist(), averages[::-1].tolist()):
 		hour = int(hour_key)
 		hourly_averages.append({
 			"hour_start": hour - 1,
@@ -104,22 +134,13 @@ def generate_comed_data() -> dict:
 			"avg_price": round(float(avg_price), 3),
 		})
 
-	# Raw prices for chart (today only)
+	# Raw prices for chart (today only, previous days have negative hours)
 	raw_prices = []
-	day = None
-	for item in comed_data:
-		ms = int(item['millisUTC'])
-		price = float(item['price'])
-		timestruct = time.localtime(ms / 1000.0)
-		if day is None:
-			day = timestruct.tm_mday
-		# Skip data from previous days
-		if timestruct.tm_mday != day:
-			continue
-		hours = timestruct.tm_hour + timestruct.tm_min / 60.0
+	today_mask = series.local_minutes >= 0
+	for hours, price in zip(series.local_hours[today_mask], series.prices[today_mask]):
 		raw_prices.append({
-			"hours_since_midnight": round(hours, 3),
-			"price": round(price, 2),
+			"hours_since_midnight": round(float(hours), 3),
+			"price": round(float(price), 2),
 		})
 
 	result = {
@@ -144,6 +165,8 @@ def generate_ecobee_data() -> dict:
 	Returns:
 		dict with cool/heat settings, sensor readings, and averages.
 	"""
+	# imported here so a missing pyecobee only disables this section
+	from energylib import ecobeelib
 	myecobee = ecobeelib.MyEcobee()
 	myecobee.setLogger()
 	myecobee.readThermostatDefs()
@@ -244,75 +267,173 @@ def parse_args() -> argparse.Namespace:
 	return args
 
 #============================================
-def main():
-	args = parse_args()
-
-	# Ensure output directory exists
-	os.makedirs(args.output_dir, exist_ok=True)
-
-	timestamp = time.strftime("%H:%M:%S")
+def comed_html_page(comlib: comedlib.ComedLib, comed_data: list) -> str:
+	"""
+	Build the static comed.html page (replaces html/generate_comed_html.py).
+	"""
+	comed_page = "<!DOCTYPE html>\n<html lang='en'>\n<head>\n"
+	comed_page += "    <meta charset='UTF-8'>\n"
+	comed_page += "    <meta name='viewport' content='width=device-width, initial-scale=1.0'>\n"
+	comed_page += "    <title>Comed Hourly Prices</title>\n"
+	comed_page += "<style>\n"
+	comed_page += "  body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Helvetica, Arial, sans-serif; }\n"
+	comed_page += "  .rate-table { border: 1px solid darkblue; border-spacing: 3px; display: inline-block; vertical-align: top; }\n"
+	comed_page += "  .row-past { background-color: #d8d8d8; }\n"
+	comed_page += "  @media (prefers-color-scheme: dark) {\n"
+	comed_page += "    body { background: #1a1a1a; color: #e0e0e0; }\n"
+	comed_page += "    a { color: #88aacc; }\n"
+	comed_page += "    .rate-table { border-color: #555; }\n"
+	comed_page += "    table { border-color: #555; }\n"
+	comed_page += "    td, th { border-color: #555; }\n"
+	comed_page += "    .row-past { background-color: #333; }\n"
+	comed_page += "  }\n"
+	comed_page += "</style>\n"
+	comed_page += "</head>\n<body>\n"
+	comed_page += "    <h1>Comed Hourly Prices</h1>\n"
+	comed_page += "    <a href='dashboard.html'>Full Dashboard</a><br/>\n"
+	comed_page += f"    <h3>Current time:</h3> {time.asctime()}\n    <br/>\n"
+	comed_page += htmltools.htmlComedData(comlib=comlib, comed_data=comed_data)
+	comed_page += "\n</body>\n</html>"
+	return comed_page
 
-	# ComEd data
-	try:
-		comed = generate_comed_data()
-		comed_path = os.path.join(args.output_dir, "comed.json")
-		write_json_atomic(comed_path, comed)
-		print(f"[{timestamp}] comed.json: OK (current={comed['current_rate']:.1f}c, median={comed['median_rate']:.1f}c)")
-	except Exception as e:
-		print(f"[{timestamp}] comed.json: FAILED - {e}")
+#============================================
+def collect_comed(output_dir: str, comlib: comedlib.ComedLib = None) -> list:
+	"""
+	Download ComEd prices once and write both comed.json and comed.html from them.
 
-	# Ecobee data
+	Returns:
+		list: status line per file.
+	"""
+	if comlib is None:
+		comlib = new_comed_lib()
+	comed_data = comlib.downloadComedJsonData()
+	if comed_data is None:
+		raise RuntimeError("ComEd data download returned None")
+	lines = []
 	try:
-		ecobee = generate_ecobee_data()
-		ecobee_path = os.path.join(args.output_dir, "ecobee.json")
-		write_json_atomic(ecobee_path, ecobee)
-		avg_temp = ecobee['avg_temperature']
-		temp_str = f"{avg_temp:.1f}F" if avg_temp is not None else "N/A"
-		print(f"[{timestamp}] ecobee.json: OK (avg temp={temp_str})")
+		comed = generate_comed_data(comlib, comed_data)
+		write_json_atomic(os.path.join(output_dir, "comed.json"), comed)
+		lines.append(f"comed.json: OK (current={comed['current_rate']:.1f}c, median={comed['median_rate']:.1f}c)")
 	except Exception as e:
-		print(f"[{timestamp}] ecobee.json: FAILED - {e}")
-
-	# Static comed.html page (replaces html/generate_comed_html.py)
-	comed_html_path = "/var/www/html/comed.html"
+		lines.append(f"comed.json: FAILED - {e}")
 	try:
-		comed_page = "<!DOCTYPE html>\n<html lang='en'>\n<head>\n"
-		comed_page += "    <meta charset='UTF-8'>\n"
-		comed_page += "    <meta name='viewport' content='width=device-width, initial-scale=1.0'>\n"
-		comed_page += "    <title>Comed Hourly Prices</title>\n"
-		comed_page += "<style>\n"
-		comed_page += "  body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Helvetica, Arial, sans-serif; }\n"
-		comed_page += "  .rate-table { border: 1px solid darkblue; border-spacing: 3px; display: inline-block; vertical-align: top; }\n"
-		comed_page += "  .row-past { background-color: #d8d8d8; }\n"
-		comed_page += "  @media (prefers-color-scheme: dark) {\n"
-		comed_page += "    body { background: #1a1a1a; color: #e0e0e0; }\n"
-		comed_page += "    a { color: #88aacc; }\n"
-		comed_page += "    .rate-table { border-color: #555; }\n"
-		comed_page += "    table { border-color: #555; }\n"
-		comed_page += "    td, th { border-color: #555; }\n"
-		comed_page += "    .row-past { background-color: #333; }\n"
-		comed_page += "  }\n"
-		comed_page += "</style>\n"
-		comed_page += "</head>\n<body>\n"
-		comed_page += "    <h1>Comed Hourly Prices</h1>\n"
-		comed_page += "    <a href='dashboard.html'>Full Dashboard</a><br/>\n"
-		comed_page += f"    <h3>Current time:</h3> {time.asctime()}\n    <br/>\n"
-		comed_page += htmltools.htmlComedData()
-		comed_page += "\n</body>\n</html>"
-		with open(comed_html_path, "w") as f:
+		comed_page = comed_html_page(comlib, comed_data)
+		# written in place: /var/www/html/ is file-writable but not directory-writable
+		with open(COMED_HTML_PATH, "w") as f:
 			f.write(comed_page)
-		print(f"[{timestamp}] comed.html: OK")
+		lines.append("comed.html: OK")
 	except Exception as e:
-		print(f"[{timestamp}] comed.html: FAILED - {e}")
+		lines.append(f"comed.html: FAILED - {e}")
+	return lines
 
-	# Solar data
-	try:
-		solar = generate_solar_data()
-		solar_path = os.path.join(args.output_dir, "solar.json")
-		write_json_atomic(solar_path, solar)
-		reading_count = len(solar['readings'])
-		print(f"[{timestamp}] solar.json: OK ({reading_count} active readings, daytime={solar['is_daytime']})")
-	except Exception as e:
-		print(f"[{timestamp}] solar.json: FAILED - {e}")
+#============================================
+def collect_ecobee(output_dir: str) -> list:
+	"""
+	Fetch thermostat data and write ecobee.json.
+
+	Returns:
+		list: status line.
+	"""
+	ecobee = generate_ecobee_data()
+	write_json_atomic(os.path.join(output_dir, "ecobee.json"), ecobee)
+	avg_temp = ecobee['avg_temperature']
+	temp_str = f"{avg_temp:.1f}F" if avg_temp is not None else "N/A"
+	return [f"ecobee.json: OK (avg temp={temp_str})"]
+
+#============================================
+def collect_solar(output_dir: str) -> list:
+	"""
+	Fetch inverter data and write solar.json.
+
+	Returns:
+		list: status line.
+	"""
+	solar = generate_solar_data()
+	write_json_atomic(os.path.join(output_dir, "solar.json"), solar)
+	reading_count = len(solar['readings'])
+	return [f"solar.json: OK ({reading_count} active readings, daytime={solar['is_daytime']})"]
+
+#============================================
+def _start_source(name: str, function, args: tuple) -> tuple:
+	"""
+	Run one collector on its own daemon thread.
+
+	Returns:
+		tuple: (thread, outcome); outcome gets 'lines' or 'error' when it ends.
+	"""
+	outcome = {}
+
+	def run():
+		try:
+			outcome['lines'] = function(*args)
+		except Exception as error:
+			outcome['error'] = error
+	# daemon: a hung fetch must not keep the interpreter from exiting
+	thread = threading.Thread(target=run, name=f"dashboard-{name}", daemon=True)
+	thread.start()
+	_source_threads[name] = thread
+	return thread, outcome
+
+#============================================
+def generate_all(output_dir: str, comlib: comedlib.ComedLib = None, timeouts: dict = None) -> None:
+	"""
+	Write every dashboard file once, collecting the sources concurrently.
+
+	Each source runs on its own thread, so a cycle takes as long as the
+	slowest source instead of the sum. A source that fails or misses its
+	timeout is reported without holding up the rest. Python cannot stop a
+	thread, so a timed-out fetch keeps running in the background (bounded
+	only by its own request timeouts) and may still update its files late;
+	until it returns, later cycles skip that source instead of starting
+	another fetch, and it never delays interpreter exit.
+
+	Args:
+		output_dir: directory for the JSON files.
+		comlib: ComedLib shared with other jobs (see scripts/energy_supervisor.py).
+		timeouts: seconds allowed per source, default SOURCE_TIMEOUTS.
+	"""
+	if timeouts is None:
+		timeouts = SOURCE_TIMEOUTS
+	# Ensure output directory exists
+	os.makedirs(output_dir, exist_ok=True)
+
+	timestamp = time.strftime("%H:%M:%S")
+	collectors = {
+		'comed': (collect_comed, (output_dir, comlib)),
+		'ecobee': (collect_ecobee, (output_dir,)),
+		'solar': (collect_solar, (output_dir,)),
+	}
+	start_time = time.monotonic()
+	running = {}
+	for name, (function, args) in collectors.items():
+		previous = _source_threads.get(name)
+		if previous is not None and previous.is_alive():
+			running[name] = None
+			continue
+		running[name] = _start_source(name, function, args)
+	for name, started in running.items():
+		if started is None:
+			lines = [f"{filename}: SKIPPED - previous fetch still running" for filename in SOURCE_FILES[name]]
+			for line in lines:
+				print(f"[{timestamp}] {line}")
+			continue
+		thread, outcome = started
+		thread.join(max(start_time + timeouts[name] - time.monotonic(), 0.0))
+		if thread.is_alive():
+			lines = [f"{filename}: FAILED - no answer within {timeouts[name]:.0f} seconds"
+				for filename in SOURCE_FILES[name]]
+		elif 'error' in outcome:
+			lines = [f"{filename}: FAILED - {outcome['error']}" for filename in SOURCE_FILES[name]]
+		else:
+			lines = outcome['lines']
+		for line in lines:
+			print(f"[{timestamp}] {line}")
+	print(f"[{timestamp}] cycle took {time.monotonic() - start_time:.1f} seconds")
+
+#============================================
+def main():
+	args = parse_args()
+	generate_all(args.output_dir)
 
 #============================================
 if __name__ == '__main__':
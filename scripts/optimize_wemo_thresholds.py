@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+Sweep the WeMo charging thresholds over archived ComEd prices in parallel.
+
+Builds the backtest features once, places them in shared memory, and lets
+a process pool simulate slices of a large threshold grid (lower_bound,
+upper_bound, cutoff_adjust, buffer_rate) without copying the price arrays
+into every worker. Prints the Pareto front of average price paid against
+plug toggles, next to the current defaults.
+
+Example:
+	python3 scripts/optimize_wemo_thresholds.py --days 180 --workers 4
+"""
+
+# Standard Library
+import os
+import sys
+import csv
+import time
+import argparse
+import concurrent.futures
+from multiprocessing import shared_memory
+
+# PIP modules
+import numpy
+
+# Determine repo root and add to path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+# local repo modules
+from energylib import comed_archive
+from energylib import comed_backtest
+from energylib import charging_decision
+
+# default sweep per threshold: (start, stop, step), stop inclusive
+DEFAULT_RANGES = {
+	'lower_bound': (1.5, 4.0, 0.25),
+	'upper_bound': (5.0, 10.0, 0.5),
+	'cutoff_adjust': (-2.0, 0.5, 0.25),
+	'buffer_rate': (0.0, 1.5, 0.25),
+}
+# grid combinations handed to a worker per task
+TASK_SIZE = 256
+
+# features attached from shared memory, set in each worker by _attach_features()
+_WORKER_FEATURES = None
+_WORKER_BLOCKS = []
+
+#============================================
+def parse_args():
+	"""
+	Parse command-line arguments.
+
+	Returns:
+		argparse.Namespace: parsed arguments.
+	"""
+	parser = argparse.ArgumentParser(description="Parallel sweep of the WeMo charging thresholds")
+	parser.add_argument('-d', '--days', dest='days', type=float, default=90.0,
+		help="Days of archived history to replay, ending now")
+	parser.add_argument('-a', '--archive-file', dest='archive_file',
+		default=comed_archive.DEFAULT_ARCHIVE_FILE, help="Path of the SQLite archive")
+	for name, (start, stop, step) in DEFAULT_RANGES.items():
+		flag = '--' + name.replace('_', '-')
+		parser.add_argument(flag, dest=name, type=float, nargs=3, default=[start, stop, step],
+			metavar=('START', 'STOP', 'STEP'), help=f"Sweep of {name} (default {start} {stop} {step})")
+	parser.add_argument('-m', '--min-on-fraction', dest='min_on_fraction', type=float, default=0.25,
+		help="Ignore settings that leave the plug on less than this fraction of the time")
+	parser.add_argument('-w', '--workers', dest='workers', type=int, default=os.cpu_count(),
+		help="Worker processes")
+	parser.add_argument('-o', '--output', dest='output_csv',
+		help="Also write every setting and its results to this CSV file")
+	args = parser.parse_args()
+	return args
+
+#============================================
+def sweep_values(start: float, stop: float, step: float) -> numpy.ndarray:
+	"""
+	Return start, start + step, ... up to and including stop.
+	"""
+	count = int(round((stop - start) / step)) + 1
+	values = numpy.round(start + step * numpy.arange(count), 6)
+	return values
+
+#============================================
+def share_features(features: dict) -> tuple:
+	"""
+	Copy every feature array into its own shared memory block.
+
+	Args:
+		features: output of comed_backtest.build_features().
+
+	Returns:
+		tuple: (specs, blocks) where specs maps names to (block name, shape,
+			dtype) for the workers and blocks must be closed and unlinked.
+	"""
+	specs = {}
+	blocks = []
+	for name, array in features.items():
+		array = numpy.ascontiguousarray(array)
+		block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+		shared = numpy.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+		shared[:] = array
+		specs[name] = (block.name, array.shape, array.dtype.str)
+		blocks.append(block)
+	return specs, blocks
+
+#============================================
+def _attach_features(specs: dict) -> None:
+	"""
+	Process pool initializer: map the shared feature arrays read-only.
+	"""
+	global _WORKER_FEATURES
+	features = {}
+	for name, (block_name, shape, dtype) in specs.items():
+		block = shared_memory.SharedMemory(name=block_name)
+		# keep the block referenced for the life of the worker
+		_WORKER_BLOCKS.append(block)
+		array = numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=block.buf)
+		array.flags.writeable = False
+		features[name] = array
+	_WORKER_FEATURES = features
+
+#============================================
+def _simulate_slice(params: dict) -> dict:
+	"""
+	Process pool task: simulate one slice of the grid on the shared features.
+	"""
+	report = comed_backtest.simulate_plug(_WORKER_FEATURES, params)
+	return report
+
+#============================================
+def run_sweep(features: dict, grid: dict, workers: int) -> dict:
+	"""
+	Simulate every grid setting across a process pool.
+
+	Args:
+		features: output of comed_backtest.build_features().
+		grid: parameter arrays from comed_backtest.parameter_grid().
+		workers: number of worker processes.
+
+	Returns:
+		dict: simulate_plug() report covering the whole grid, in grid order.
+	"""
+	combos = len(grid['lower_bound'])
+	slices = []
+	for first in range(0, combos, TASK_SIZE):
+		slices.append({name: values[first:first + TASK_SIZE] for name, values in grid.items()})
+	specs, blocks = share_features(features)
+	try:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+				initializer=_attach_features, initargs=(specs,)) as executor:
+			reports = list(executor.map(_simulate_slice, slices))
+	finally:
+		for block in blocks:
+			block.close()
+			block.unlink()
+	report = {name: numpy.concatenate([part[name] for part in reports]) for name in reports[0]}
+	return report
+
+#============================================
+def write_csv(report: dict, output_csv: str) -> None:
+	"""
+	Write every setting and its results to a CSV file.
+	"""
+	names = list(report)
+	with open(output_csv, "w", newline="") as f:
+		writer = csv.writer(f)
+		writer.writerow(names)
+		for row in zip(*(report[name].tolist() for name in names)):
+			writer.writerow(row)
+
+#============================================
+def print_front(report: dict, front: numpy.ndarray) -> None:
+	"""
+	Print the Pareto front and the current default setting.
+	"""
+	names = list(charging_decision.DEFAULT_PARAMS)
+	header = "".join(f"{name:>14s}" for name in names)
+	print(f"{header}{'avg c/kWh':>11s}{'toggles':>9s}{'kWh':>9s}{'on %':>7s}")
+	defaults = numpy.ones(len(report['kwh']), dtype=bool)
+	for name in names:
+		defaults &= numpy.isclose(report[name], charging_decision.DEFAULT_PARAMS[name])
+	rows = list(front) + [i for i in numpy.flatnonzero(defaults) if i not in front]
+	for i in rows:
+		values = "".join(f"{report[name][i]:14.2f}" for name in names)
+		marker = "  <- current" if defaults[i] else ""
+		print(f"{values}{report['avg_price'][i]:11.3f}{report['toggles'][i]:9d}"
+			f"{report['kwh'][i]:9.1f}{100.0 * report['on_fraction'][i]:7.1f}{marker}")
+
+#============================================
+def main():
+	args = parse_args()
+	end_millis = int(time.time() * 1000)
+	warmup_millis = comed_backtest.MEDIAN_WINDOW * 5 * 60 * 1000
+	start_millis = end_millis - int(args.days * 86400 * 1000) - warmup_millis
+	millis, prices = comed_archive.query_range(start_millis, None, args.archive_file)
+	if len(prices) < comed_backtest.MEDIAN_WINDOW + 1:
+		raise RuntimeError(f"only {len(prices)} archived samples; run scripts/backfill_comed_archive.py first")
+
+	start_time = time.time()
+	features = comed_backtest.build_features(millis, prices)
+	values = {}
+	for name in DEFAULT_RANGES:
+		values[name] = numpy.union1d(sweep_values(*getattr(args, name)), [charging_decision.DEFAULT_PARAMS[name]])
+	grid = comed_backtest.parameter_grid(**values)
+	report = run_sweep(features, grid, args.workers)
+	elapsed = time.time() - start_time
+	print(f"Simulated {len(grid['lower_bound'])} settings over {len(features['price'])} ticks "
+		f"with {args.workers} workers in {elapsed:.1f} seconds")
+
+	# settings that barely run the load are trivially cheap, leave them out
+	cost = numpy.where(report['on_fraction'] >= args.min_on_fraction, report['avg_price'], numpy.nan)
+	front = comed_backtest.pareto_front(cost, report['toggles'])
+	print(f"Pareto front of average price vs toggles (plug on at least {100 * args.min_on_fraction:.0f}% of the time)\n")
+	print_front(report, front)
+	if args.output_csv:
+		write_csv(report, args.output_csv)
+		print(f"\nWrote {args.output_csv}")
+
+#============================================
+if __name__ == '__main__':
+	main()
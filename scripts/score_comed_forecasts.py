@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+Score the hourly price forecasters against the local ComEd price archive.
+
+Trains every forecaster in energylib/comed_forecast.py on the first part of
+the archived history, scores each against the billed hourly averages of the
+rest, and times one live prediction. --save writes the forecaster with the
+lowest mean absolute error to JSON for comed_forecast.load_forecaster().
+
+Example:
+	python3 scripts/score_comed_forecasts.py --days 120 --save ~/.energy/forecaster.json
+"""
+
+# Standard Library
+import os
+import sys
+import time
+import argparse
+
+# Determine repo root and add to path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+# local repo modules
+from energylib import comedlib
+from energylib import comed_archive
+from energylib import comed_backtest
+from energylib import comed_forecast
+
+# live predictions timed per forecaster
+TIMING_REPEATS = 1000
+
+#============================================
+def parse_args():
+	"""
+	Parse command-line arguments.
+
+	Returns:
+		argparse.Namespace: parsed arguments.
+	"""
+	parser = argparse.ArgumentParser(description="Score ComEd hourly price forecasters on archived prices")
+	parser.add_argument('-d', '--days', dest='days', type=float, default=90.0,
+		help="Days of archived history to use, ending now")
+	parser.add_argument('-a', '--archive-file', dest='archive_file',
+		default=comed_archive.DEFAULT_ARCHIVE_FILE, help="Path of the SQLite archive")
+	parser.add_argument('-t', '--train-fraction', dest='train_fraction', type=float, default=0.5,
+		help="Share of the history used for training")
+	parser.add_argument('-s', '--save', dest='save_file',
+		help="Write the best forecaster to this JSON file")
+	args = parser.parse_args()
+	return args
+
+#============================================
+def live_microseconds(forecaster: comed_forecast.PriceForecaster, series: comedlib.ComedPriceSeries) -> float:
+	"""
+	Average time of one live prediction on a 24 hour series, in microseconds.
+	"""
+	start_time = time.perf_counter()
+	for _ in range(TIMING_REPEATS):
+		forecaster.predict(series)
+	elapsed = time.perf_counter() - start_time
+	return elapsed / TIMING_REPEATS * 1e6
+
+#============================================
+def main():
+	args = parse_args()
+	end_millis = int(time.time() * 1000)
+	start_millis = end_millis - int(args.days * 86400 * 1000)
+	millis, prices = comed_archive.query_range(start_millis, None, args.archive_file)
+	if len(prices) < 2 * 288:
+		raise RuntimeError(f"only {len(prices)} archived samples; run scripts/backfill_comed_archive.py first")
+
+	forecasters = [model() for model in comed_forecast.FORECASTERS.values()]
+	scores = comed_backtest.score_forecasters(millis, prices, forecasters, args.train_fraction)
+	# the newest 24 hours, as the live loop sees them
+	recent = slice(-288, None)
+	series = comedlib.ComedPriceSeries(millis[recent][::-1], prices[recent][::-1])
+
+	print(f"{'forecaster':<12s}{'MAE':>8s}{'RMSE':>8s}{'bias':>8s}{'samples':>9s}{'live us':>9s}")
+	for forecaster in forecasters:
+		score = scores[forecaster.name]
+		micros = live_microseconds(forecaster, series)
+		print(f"{forecaster.name:<12s}{score['mae']:8.3f}{score['rmse']:8.3f}{score['bias']:8.3f}"
+			f"{score['count']:9d}{micros:9.1f}")
+
+	if args.save_file:
+		best = min(forecasters, key=lambda forecaster: scores[forecaster.name]['mae'])
+		comed_forecast.save_forecaster(best, args.save_file)
+		print(f"\nSaved {best.name} forecaster to {args.save_file}")
+
+#============================================
+if __name__ == '__main__':
+	main()
@@ -1,7 +1,152 @@
+import os
+import types
+import datetime
+import importlib.util
+
 import pytest
 
+# the app imports ecobeelib, which needs the Ecobee client stack
+pytest.importorskip("pyecobee")
+pytz = pytest.importorskip("pytz")
+pytest.importorskip("six")
+
+import git_file_utils
+from energylib import ecobeelib
+
+REPO_ROOT = git_file_utils.get_repo_root()
+SCRIPT_PATH = os.path.join(REPO_ROOT, "apps", "thermostat-comed.py")
+
+
+#============================================
+def _load_app():
+	# the script name has a dash, so load it by path
+	spec = importlib.util.spec_from_file_location("thermostat_comed", SCRIPT_PATH)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+#============================================
+class FakeComedLib(object):
+	def __init__(self, predict_rate):
+		self.predict_rate = predict_rate
+		self.calls = 0
+
+	def getCurrentComedRate(self):
+		self.calls += 1
+		return 3.0
+
+	def getMedianComedRate(self):
+		return 3.0, 1.0
+
+	def getReasonableCutOff(self):
+		return 4.0
+
+	def getPredictedRate(self):
+		return self.predict_rate
+
+	def getMostRecentRate(self):
+		return 3.0
+
+
+#============================================
+class FakeEcobee(object):
+	def __init__(self, events_seen):
+		self.events_seen = events_seen
+		self.connection_checks = 0
+		self.event_requests = []
+		self.holds = []
+
+	def ensureConnection(self):
+		self.connection_checks += 1
+
+	def invalidateSnapshot(self):
+		pass
+
+	def runtime(self):
+		return {'desired_cool': 780}
+
+	def events(self, fresh=False):
+		self.event_requests.append(fresh)
+		return self.events_seen.pop(0)
+
+	def sensors(self):
+		return {'living room': {'temperature': 75.0, 'humidity': 50}}
+
+	def getStdevTemp(self):
+		return 0.0
+
+	def getMedianTemp(self):
+		return 75.0
+
+	def setTemperature(self, cooltemp=80, heattemp=55, endTimeMethod='end_of_hour', message=None):
+		self.holds.append((cooltemp, endTimeMethod))
+
+
+#============================================
+def _user_hold():
+	event = {'end_date': '2026-07-01', 'end_time': '18:00:00', 'cool_hold_temp': 740, 'is_cool_off': False}
+	return [event]
+
+
+#============================================
+def _thermostat(monkeypatch, predict_rate, events_seen):
+	app = _load_app()
+	fixed = datetime.datetime(2026, 7, 1, 14, 30)
+
+	class FixedDatetime(datetime.datetime):
+		@classmethod
+		def now(cls, tz=None):
+			return fixed
+	monkeypatch.setattr(app, "datetime", types.SimpleNamespace(datetime=FixedDatetime))
+	args = app.parse_args([])
+	thermostat = app.ThermoStat(args, FakeComedLib(predict_rate))
+	thermostat.myecobee = FakeEcobee(events_seen)
+	return thermostat
+
+
+#============================================
+def test_run_cycle_reuses_session_and_rechecks_events(monkeypatch):
+	thermostat = _thermostat(monkeypatch, 2.0, [[], []])
+	thermostat.runCycle()
+	ecobee = thermostat.myecobee
+	# the open session is only checked, and the re-check asks for the events alone
+	assert ecobee.connection_checks == 1
+	assert ecobee.event_requests == [False, True]
+	assert len(ecobee.holds) == 1 and ecobee.holds[0][1] == 'end_of_hour'
+	assert thermostat.comlib.calls == 1
+
+
+#============================================
+def test_run_cycle_respects_hold_set_during_price_check(monkeypatch):
+	thermostat = _thermostat(monkeypatch, 20.0, [[], _user_hold()])
+	thermostat.runCycle()
+	assert thermostat.myecobee.event_requests == [False, True]
+	assert thermostat.myecobee.holds == []
+
+
+#============================================
+class FakeService(object):
+	def __init__(self, access_token, refresh_days):
+		now = datetime.datetime.now(pytz.utc)
+		self.access_token = access_token
+		self.refresh_token_expires_on = now + datetime.timedelta(days=refresh_days)
+
+
+#============================================
+def _connection_calls(monkeypatch, service):
+	myecobee = ecobeelib.MyEcobee()
+	myecobee.ecobee_service = service
+	calls = []
+	monkeypatch.setattr(myecobee, "openConnection", lambda: calls.append("open"))
+	monkeypatch.setattr(myecobee, "_refresh_tokens", lambda margin_seconds=0: calls.append(("refresh", margin_seconds)))
+	myecobee.ensureConnection()
+	return calls
+
 
-pytest.skip(
-	"Thermostat control script needs external services and time-based IO; skip unit tests.",
-	allow_module_level=True,
-)
+#============================================
+def test_ensure_connection_only_checks_tokens_of_open_session(monkeypatch):
+	assert _connection_calls(monkeypatch, FakeService("token", 30)) == [("refresh", 60)]
+	assert _connection_calls(monkeypatch, None) == ["open"]
+	assert _connection_calls(monkeypatch, FakeService(None, 30)) == ["open"]
+	assert _connection_calls(monkeypatch, FakeService("token", -1)) == ["open"]
@@ -0,0 +1,69 @@
+import time
+
+import numpy
+import pytest
+
+from energylib import charge_planner
+
+
+#============================================
+def _day(prices):
+	hours = 1700002800 + 3600 * numpy.arange(len(prices))
+	return hours, numpy.array(prices, dtype=numpy.float64)
+
+
+#============================================
+def test_plan_takes_cheapest_hours_and_partial_last_hour():
+	hours, prices = _day([5.0, 1.0, 4.0, 2.0, 3.0])
+	# 2.5 hours of charging at 2 kW
+	plan = charge_planner.plan_cheapest_hours(hours, prices, 5.0, 2.0, hours[0], hours[-1] + 3600)
+	# adjacent chosen hours merge into one interval
+	assert plan["intervals"] == [(hours[1], hours[1] + 3600), (hours[3], hours[4] + 1800)]
+	assert plan["energy_kwh"] == pytest.approx(5.0)
+	assert plan["cost_cents"] == pytest.approx(2.0 * (1.0 + 2.0 + 0.5 * 3.0))
+	assert plan["shortfall_kwh"] == 0.0
+	assert charge_planner.plan_is_active(plan, hours[1] + 10)
+	assert not charge_planner.plan_is_active(plan, hours[2] + 10)
+	assert charge_planner.next_change_seconds(plan, hours[2]) == hours[3]
+
+
+#============================================
+def test_plan_reports_shortfall_and_uses_fallback():
+	hours, prices = _day([2.0, 3.0])
+	deadline = hours[0] + 4 * 3600
+	plan = charge_planner.plan_cheapest_hours(hours, prices, 10.0, 1.0, hours[0], deadline)
+	assert plan["shortfall_kwh"] == pytest.approx(8.0)
+	# merged into one interval over the two priced hours
+	assert plan["intervals"] == [(hours[0], hours[0] + 7200)]
+	plan = charge_planner.plan_cheapest_hours(hours, prices, 3.0, 1.0, hours[0], deadline, fallback_price=2.5)
+	# the two unpublished hours at 2.5 beat the published 3.0 hour
+	assert plan["estimated_hours"] == 2 and plan["shortfall_kwh"] == 0.0
+
+
+#============================================
+def test_cheapest_window_uses_prefix_sums():
+	hours, prices = _day([4.0, 1.0, 5.0, 1.0, 1.0, 6.0])
+	start, average = charge_planner.cheapest_window(hours, prices, 2)
+	assert start == hours[3] and average == pytest.approx(1.0)
+	assert charge_planner.cheapest_window(hours, prices, 7) is None
+
+
+#============================================
+def test_fallback_by_hour_of_day_keeps_daily_shape():
+	hours, prices = _day([])
+	start = 1700002800
+	by_hour = numpy.full(24, 5.0)
+	cheap_hour = time.localtime(start + 2 * 3600).tm_hour
+	by_hour[cheap_hour] = 1.0
+	plan = charge_planner.plan_cheapest_hours(hours, prices, 1.0, 1.0, start, start + 6 * 3600, by_hour)
+	# an unpublished night is not simply charged from its first hour
+	assert plan["intervals"] == [(start + 2 * 3600, start + 3 * 3600)]
+	assert plan["estimated_hours"] == 1
+
+
+#============================================
+def test_planned_on_seconds_counts_delivered_time():
+	plan = {"intervals": [(100.0, 200.0), (300.0, 400.0)]}
+	assert charge_planner.planned_on_seconds(plan, 0.0, 1000.0) == 200.0
+	assert charge_planner.planned_on_seconds(plan, 150.0, 350.0) == 100.0
+	assert charge_planner.planned_on_seconds(plan, 200.0, 300.0) == 0.0
@@ -0,0 +1,109 @@
+import random
+
+import numpy
+
+from energylib import charging_decision
+
+
+#============================================
+def _legacy_decision(minute, predict_rate, cutoff, lower_bound, upper_bound, buffer_rate):
+	# rule order of the original apps/wemoPlug-comed-multi.py _decision()
+	if predict_rate > 2.0 * cutoff and minute > 20:
+		return "disable_long"
+	if predict_rate < lower_bound:
+		return "enable"
+	if predict_rate > float(cutoff) + buffer_rate:
+		return "disable"
+	if predict_rate > upper_bound:
+		return "disable"
+	if predict_rate < float(cutoff) - buffer_rate:
+		return "enable"
+	return "unchanged"
+
+
+#============================================
+def test_decide_matches_legacy_rules():
+	rng = random.Random(7)
+	params = charging_decision.DEFAULT_PARAMS
+	for _ in range(500):
+		minute = rng.randint(0, 59)
+		predict_rate = rng.uniform(-2.0, 15.0)
+		cutoff = charging_decision.bound_cutoff(rng.uniform(0.0, 12.0),
+			params['lower_bound'], params['upper_bound'], params['cutoff_adjust'])
+		expected = _legacy_decision(minute, predict_rate, cutoff, params['lower_bound'],
+			params['upper_bound'], params['buffer_rate'])
+		action = charging_decision.decide(minute, predict_rate, cutoff, params['lower_bound'],
+			params['upper_bound'], params['buffer_rate'])
+		assert action == expected
+
+
+#============================================
+def test_decide_array_broadcasts_parameter_columns():
+	predict_rate = numpy.array([1.0, 4.0, 9.0])
+	lower_bound = numpy.array([[0.5], [2.0]])
+	actions = charging_decision.decide_array(10, predict_rate, 4.0, lower_bound, 7.2, 0.5)
+	assert actions.shape == (2, 3)
+	assert actions[1, 0] == charging_decision.ENABLE
+	assert actions[0, 2] == charging_decision.DISABLE
+
+
+#============================================
+def test_battery_action_matches_threshold_compare():
+	fudge = 1.0
+	for predict_rate in numpy.linspace(0.0, 12.0, 49):
+		thresholds = [4.0, 6.0]
+		action = charging_decision.battery_action_array(predict_rate, 4.0, 6.0, fudge)
+		if all(predict_rate > t + fudge for t in thresholds):
+			assert action == charging_decision.BATTERY_DISCHARGE
+		elif all(predict_rate < t - fudge for t in thresholds):
+			assert action == charging_decision.BATTERY_CHARGE
+		else:
+			assert action == charging_decision.BATTERY_OFF
+
+
+#============================================
+def _engine(**kwargs):
+	params = {'min_on_seconds': 600, 'min_off_seconds': 600, 'max_toggles_per_hour': 4}
+	params.update(kwargs)
+	return charging_decision.DecisionEngine(**params)
+
+
+#============================================
+def test_engine_holds_toggles_during_dwell():
+	engine = _engine()
+	# predicted price oscillating around cutoff 4.0 +/- 0.5 every three minutes
+	actions = []
+	for tick in range(10):
+		predict_rate = 3.0 if tick % 2 == 0 else 5.0
+		actions.append(engine.decide(tick * 180.0, 10, predict_rate, 4.0))
+	assert actions[0] == 'enable'
+	assert actions[1] == 'unchanged'
+	assert engine.metrics(1800.0)['held_dwell'] > 0
+	# the stateless rules would have toggled on every tick
+	assert engine.counts['toggles'] <= 3
+
+
+#============================================
+def test_engine_toggle_budget():
+	engine = _engine(min_on_seconds=0, min_off_seconds=0, max_toggles_per_hour=2)
+	engine.apply('enable', 0.0)
+	assert engine.apply('disable', 60.0) == 'disable'
+	assert engine.apply('enable', 120.0) == 'enable'
+	assert engine.apply('disable', 180.0) == 'unchanged'
+	assert engine.last_reason == 'budget'
+	# the window slides: an hour after the first toggle it is spent again
+	assert engine.apply('disable', 3661.0) == 'disable'
+
+
+#============================================
+def test_engine_never_holds_price_spikes_or_forced_actions():
+	engine = _engine()
+	engine.apply('enable', 0.0)
+	assert engine.apply('disable_long', 60.0) == 'disable_long'
+	assert engine.apply('enable', 120.0, force=True) == 'enable'
+	metrics = engine.metrics(180.0)
+	assert metrics['forced_toggles'] == 2
+	assert metrics['is_on'] is True
+	# confirming the current state is not a toggle
+	assert engine.apply('enable', 200.0) == 'enable'
+	assert engine.metrics(200.0)['toggles'] == 2
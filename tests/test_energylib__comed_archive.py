@@ -0,0 +1,52 @@
+import numpy
+
+from energylib import comed_archive
+
+
+#============================================
+def test_append_ignores_duplicates(tmp_path):
+	archive_file = str(tmp_path / "sub" / "archive.sqlite3")
+	millis = numpy.array([300000, 0, 600000], dtype=numpy.int64)
+	prices = numpy.array([2.0, 1.0, 3.0])
+	assert comed_archive.append_samples(millis, prices, archive_file) == 3
+	assert comed_archive.append_samples(millis[:2], prices[:2], archive_file) == 0
+	assert comed_archive.newest_millis(archive_file) == 600000
+
+
+#============================================
+def test_query_range_is_sorted_and_half_open(tmp_path):
+	archive_file = str(tmp_path / "archive.sqlite3")
+	assert comed_archive.newest_millis(archive_file) is None
+	millis = numpy.arange(10, dtype=numpy.int64)[::-1] * 300000
+	prices = numpy.arange(10, dtype=numpy.float64)[::-1]
+	comed_archive.append_samples(millis, prices, archive_file)
+	range_millis, range_prices = comed_archive.query_range(600000, 1500000, archive_file)
+	assert range_millis.dtype == numpy.int64
+	assert range_millis.tolist() == [600000, 900000, 1200000]
+	assert range_prices.tolist() == [2.0, 3.0, 4.0]
+	empty_millis, empty_prices = comed_archive.query_range(10**12, None, archive_file)
+	assert len(empty_millis) == 0 and len(empty_prices) == 0
+
+
+#============================================
+def test_range_summary_counts_samples(tmp_path):
+	archive_file = str(tmp_path / "archive.sqlite3")
+	assert comed_archive.range_summary(0, 10**9, archive_file) == (0, None, None)
+	millis = numpy.array([0, 300000, 600000, 900000], dtype=numpy.int64)
+	comed_archive.append_samples(millis, numpy.ones(4), archive_file)
+	assert comed_archive.range_summary(300000, 900000, archive_file) == (2, 300000, 600000)
+
+
+#============================================
+def test_missing_ranges_finds_interior_gaps(tmp_path):
+	archive_file = str(tmp_path / "archive.sqlite3")
+	step = 300000
+	assert comed_archive.missing_ranges(0, 10 * step, step, archive_file) == [(0, 10 * step)]
+	# samples 2-3 and 6-7 archived: the month start, a hole and the end are missing
+	millis = numpy.array([2, 3, 6, 7], dtype=numpy.int64) * step
+	comed_archive.append_samples(millis, numpy.ones(4), archive_file)
+	gaps = comed_archive.missing_ranges(0, 10 * step, step, archive_file)
+	assert gaps == [(0, 2 * step), (3 * step + 1, 6 * step), (7 * step + 1, 10 * step)]
+	full = numpy.arange(10, dtype=numpy.int64) * step
+	comed_archive.append_samples(full, numpy.ones(10), archive_file)
+	assert comed_archive.missing_ranges(0, 10 * step, step, archive_file) == []
@@ -0,0 +1,104 @@
+import numpy
+
+from energylib import comedlib
+from energylib import comed_backtest
+from energylib import comed_forecast
+from energylib import charging_decision
+
+
+#============================================
+def _history(count, seed=3):
+	rng = numpy.random.default_rng(seed)
+	millis = 1700000000000 + numpy.arange(count, dtype=numpy.int64) * 300000
+	prices = rng.normal(4.0, 3.0, count)
+	return millis, prices
+
+
+#============================================
+def test_predicted_rates_match_live_predictor():
+	millis, prices = _history(120)
+	fields = comed_backtest.local_time_fields(millis)
+	predicted = comed_backtest.predicted_rates(prices, fields["hour_id"])
+	comlib = comedlib.ComedLib.__new__(comedlib.ComedLib)
+	comlib.debug = False
+	comlib.forecaster = comed_forecast.HeuristicForecaster()
+	for i in range(20, len(prices), 7):
+		series = comedlib.ComedPriceSeries(millis[:i + 1][::-1], prices[:i + 1][::-1])
+		assert numpy.isclose(predicted[i], comlib._computePredictedRate(series))
+
+
+#============================================
+def test_trailing_median_std_matches_window():
+	_millis, prices = _history(300)
+	median, std = comed_backtest.trailing_median_std(prices, 288)
+	assert len(median) == 13
+	assert numpy.isclose(median[-1], numpy.percentile(prices[-288:], 75))
+	assert numpy.isclose(std[0], numpy.std(prices[:288]))
+
+
+#============================================
+def _reference_states(features, params):
+	# tick-by-tick replay of the live loop for one parameter combination
+	states = []
+	state = False
+	held_hour = None
+	for i in range(len(features["price"])):
+		if held_hour == features["hour_id"][i]:
+			action = "disable"
+		elif features["price"][i] < charging_decision.ALWAYS_CHEAP_RATE:
+			action = "enable"
+		else:
+			cutoff = charging_decision.bound_cutoff(features["cutoff"][i], params["lower_bound"],
+				params["upper_bound"], params["cutoff_adjust"])
+			action = charging_decision.decide(features["minute"][i], features["predict"][i], cutoff,
+				params["lower_bound"], params["upper_bound"], params["buffer_rate"])
+			if action == "disable_long":
+				held_hour = features["hour_id"][i]
+		if action == "enable":
+			state = True
+		elif action in ("disable", "disable_long"):
+			state = False
+		states.append(state)
+	return numpy.array(states)
+
+
+#============================================
+def test_plug_states_match_tick_by_tick_replay():
+	millis, prices = _history(288 * 3)
+	features = comed_backtest.build_features(millis, prices)
+	grid = comed_backtest.parameter_grid(lower_bound=[2.0, 3.0], cutoff_adjust=[-2.0, 0.0])
+	states = comed_backtest.plug_states(features, grid)
+	assert states.shape == (4, len(features["price"]))
+	for row in range(4):
+		params = {name: grid[name][row] for name in grid}
+		assert numpy.array_equal(states[row], _reference_states(features, params))
+
+
+#============================================
+def test_simulate_plug_reports_every_combination():
+	millis, prices = _history(288 * 2)
+	features = comed_backtest.build_features(millis, prices)
+	grid = comed_backtest.parameter_grid(buffer_rate=[0.25, 0.5, 1.0])
+	report = comed_backtest.simulate_plug(features, grid, load_kw=2.0)
+	assert len(report["kwh"]) == 3
+	assert numpy.all(report["kwh"] <= 2.0 * len(features["price"]) * comed_backtest.SAMPLE_HOURS)
+	assert numpy.array_equal(report["buffer_rate"], [0.25, 0.5, 1.0])
+
+
+#============================================
+def test_pareto_front_drops_dominated_settings():
+	cost = numpy.array([3.0, 2.0, 2.5, 1.0, numpy.nan, 2.0])
+	toggles = numpy.array([10, 20, 30, 40, 5, 25])
+	front = comed_backtest.pareto_front(cost, toggles)
+	assert front.tolist() == [0, 1, 3]
+
+
+#============================================
+def test_score_forecasters_reports_each_model():
+	millis, prices = _history(288 * 4)
+	forecasters = [comed_forecast.HeuristicForecaster(), comed_forecast.SmoothingForecaster()]
+	scores = comed_backtest.score_forecasters(millis, prices, forecasters)
+	assert set(scores) == {"heuristic", "smoothing"}
+	for score in scores.values():
+		assert 0 < score["mae"] <= score["rmse"]
+		assert score["count"] > 0
@@ -0,0 +1,66 @@
+import datetime
+
+import numpy
+import pytest
+
+from energylib import comed_archive
+from energylib import comed_billing
+
+
+#============================================
+def _seconds(date_text):
+	return datetime.datetime.strptime(date_text, "%Y-%m-%d").timestamp()
+
+
+#============================================
+def test_rates_inherit_from_previous_version():
+	rates = comed_billing.rates_at(_seconds("2025-07-01"))
+	# delivery and transmission carried over from the 2025-05-18 bill
+	assert rates["delivery_import_cents"] == pytest.approx(6.180)
+	assert rates["transmission_cents"] == pytest.approx(1.101)
+	assert rates["export_supply_credit_cents"] == pytest.approx(-0.263)
+	assert comed_billing.delivery_rate(_seconds("2026-01-01")) == pytest.approx(6.354)
+
+
+#============================================
+def test_level1_matches_hand_calculation():
+	hours = _seconds("2026-01-05") + 3600 * numpy.arange(3)
+	import_kwh = numpy.array([2.0, 0.0, 1.0])
+	export_kwh = numpy.array([0.0, 3.0, 0.0])
+	price = numpy.array([4.0, 2.0, numpy.nan])
+	with pytest.raises(ValueError):
+		comed_billing.replay_bill(hours, import_kwh, export_kwh, price, level=1)
+	price[2] = 5.0
+	bill = comed_billing.replay_bill(hours, import_kwh, export_kwh, price, level=1)
+	assert set(bill) >= set(comed_billing.LEVEL1_ITEMS)
+	assert bill["supply_charge"] == pytest.approx(13.0)
+	assert bill["supply_credit"] == pytest.approx(-6.0)
+	assert bill["total"] == pytest.approx(13.0 - 6.0 + 3.0 * 6.354 - 3.0 * 6.354)
+	assert bill["rate_versions"] == ["2025-12-15"]
+
+
+#============================================
+def test_level2_batches_strategies():
+	hours = _seconds("2026-01-05") + 3600 * numpy.arange(24)
+	price = numpy.full(24, 3.0)
+	import_kwh = numpy.stack([numpy.ones(24), numpy.zeros(24)])
+	export_kwh = numpy.stack([numpy.zeros(24), numpy.ones(24)])
+	bill = comed_billing.replay_bill(hours, import_kwh, export_kwh, price, fixed_charges_cents=1500.0)
+	assert bill["total"].shape == (2,)
+	assert bill["transmission_charge"][0] == pytest.approx(24 * 1.083)
+	assert bill["net_metering_adjustment"][1] == pytest.approx(24 * 1.220)
+	assert bill["fixed_charges"].tolist() == [1500.0, 1500.0]
+	single = comed_billing.replay_bill(hours, import_kwh[1], export_kwh[1], price, fixed_charges_cents=1500.0)
+	assert single["total"] == pytest.approx(bill["total"][1])
+
+
+#============================================
+def test_hourly_prices_average_archive(tmp_path):
+	archive_file = str(tmp_path / "archive.sqlite3")
+	millis = numpy.arange(24, dtype=numpy.int64) * 300000
+	prices = numpy.repeat([2.0, 4.0], 12)
+	comed_archive.append_samples(millis, prices, archive_file)
+	hours, hourly = comed_billing.hourly_prices(0, 3 * 3600, archive_file)
+	assert hours.tolist() == [0, 3600, 7200]
+	assert hourly[:2].tolist() == [2.0, 4.0]
+	assert numpy.isnan(hourly[2])
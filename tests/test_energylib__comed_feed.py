@@ -0,0 +1,69 @@
+import os
+import stat
+import threading
+
+import numpy
+
+from energylib import comed_feed
+
+
+#============================================
+def test_publish_and_read_round_trip(tmp_path):
+	feed_file = str(tmp_path / "feed.npy")
+	millis = numpy.array([1700000600000, 1700000300000, 1700000000000], dtype=numpy.int64)
+	prices = numpy.array([3.5, 2.25, -0.5], dtype=numpy.float64)
+	comed_feed.publish_feed(millis, prices, feed_file)
+	feed = comed_feed.read_feed(feed_file)
+	assert feed is not None
+	read_millis, read_prices, _published = feed
+	assert numpy.array_equal(read_millis, millis)
+	assert numpy.array_equal(read_prices, prices)
+	# the temporary file is renamed into place, never left behind
+	assert os.listdir(tmp_path) == ["feed.npy"]
+
+
+#============================================
+def test_concurrent_publishers_never_tear_the_feed(tmp_path):
+	feed_file = str(tmp_path / "feed.npy")
+	sizes = [50, 200, 800, 3200]
+	errors = []
+
+	def publish(size):
+		try:
+			for _ in range(20):
+				millis = numpy.arange(size, dtype=numpy.int64)
+				comed_feed.publish_feed(millis, millis * 0.5, feed_file)
+		except OSError as error:
+			errors.append(error)
+	threads = [threading.Thread(target=publish, args=(size,)) for size in sizes]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join(10)
+	assert errors == []
+	read_millis, read_prices, _published = comed_feed.read_feed(feed_file)
+	# the feed is one publisher's complete columns, and no temporary file is left
+	assert len(read_millis) in sizes
+	assert numpy.array_equal(read_prices, read_millis * 0.5)
+	assert os.listdir(tmp_path) == ["feed.npy"]
+	assert stat.S_IMODE(os.stat(feed_file).st_mode) == 0o666
+
+
+#============================================
+def test_read_feed_ignores_stale_and_missing(tmp_path):
+	feed_file = str(tmp_path / "feed.npy")
+	assert comed_feed.read_feed(feed_file) is None
+	comed_feed.publish_feed(numpy.array([1], dtype=numpy.int64), numpy.array([1.0]), feed_file)
+	old_seconds = os.stat(feed_file).st_mtime - 3600
+	os.utime(feed_file, (old_seconds, old_seconds))
+	assert comed_feed.read_feed(feed_file, max_age_seconds=60) is None
+	assert comed_feed.read_feed(feed_file) is not None
+
+
+#============================================
+def test_wait_for_feed_update_times_out(tmp_path):
+	feed_file = str(tmp_path / "feed.npy")
+	comed_feed.publish_feed(numpy.array([1], dtype=numpy.int64), numpy.array([1.0]), feed_file)
+	stamp = comed_feed.feed_stamp(feed_file)
+	assert comed_feed.wait_for_feed_update(stamp, 0.05, feed_file, poll_seconds=0.01) is None
+	assert comed_feed.wait_for_feed_update(None, 0.05, feed_file) == stamp
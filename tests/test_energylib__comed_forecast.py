@@ -0,0 +1,64 @@
+import numpy
+import pytest
+
+from energylib import comedlib
+from energylib import comed_forecast
+
+
+#============================================
+def _history(count, seed=5):
+	rng = numpy.random.default_rng(seed)
+	millis = 1700000000000 + numpy.arange(count, dtype=numpy.int64) * 300000
+	hour_ids = comedlib.localSeconds(millis) // 3600
+	# a daily cycle plus noise
+	prices = 4.0 + 2.0 * numpy.sin(2 * numpy.pi * (hour_ids % 24) / 24.0) + rng.normal(0, 0.5, count)
+	return millis, prices, hour_ids
+
+
+#============================================
+def test_closed_form_slope_matches_polyfit():
+	values = numpy.array([3.0, 1.0, 4.0, 1.0, 5.0, 9.0])
+	assert comed_forecast.closed_form_slope(values) == pytest.approx(numpy.polyfit(numpy.arange(6), values, 1)[0])
+	assert numpy.isnan(comed_forecast.closed_form_slope(numpy.array([2.0])))
+
+
+#============================================
+@pytest.mark.parametrize("forecaster", [
+	comed_forecast.HeuristicForecaster(),
+	comed_forecast.SmoothingForecaster(0.2),
+	comed_forecast.SeasonalForecaster(numpy.full((7, 24), 4.0), 0.25),
+])
+def test_live_prediction_matches_history(forecaster):
+	millis, prices, hour_ids = _history(200)
+	history = forecaster.predict_history(prices, hour_ids)
+	for i in (30, 101, 199):
+		series = comedlib.ComedPriceSeries(millis[:i + 1][::-1], prices[:i + 1][::-1])
+		assert forecaster.predict(series) == pytest.approx(history[i])
+
+
+#============================================
+def test_seasonal_fit_learns_profile_and_round_trips(tmp_path):
+	_millis, prices, hour_ids = _history(288 * 21)
+	forecaster = comed_forecast.SeasonalForecaster().fit(prices, hour_ids)
+	# the peak of the daily cycle is at 6:00
+	assert forecaster.profile.mean(axis=0).argmax() == 6
+	path = str(tmp_path / "forecaster.json")
+	comed_forecast.save_forecaster(forecaster, path)
+	loaded = comed_forecast.load_forecaster(path)
+	assert isinstance(loaded, comed_forecast.SeasonalForecaster)
+	assert numpy.allclose(loaded.predict_history(prices, hour_ids), forecaster.predict_history(prices, hour_ids), atol=1e-3)
+	with pytest.raises(RuntimeError):
+		comed_forecast.SeasonalForecaster().predict_history(prices, hour_ids)
+
+
+#============================================
+def test_forecaster_interface_is_abstract():
+	with pytest.raises(TypeError):
+		comed_forecast.PriceForecaster()
+
+	class PartialForecaster(comed_forecast.PriceForecaster):
+		def predict(self, series):
+			return 0.0
+	# predict_history() is required too, so backtests cannot hit a stub
+	with pytest.raises(TypeError):
+		PartialForecaster()
@@ -1,6 +1,17 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+
 import numpy
+import pytest
+import requests
 
 from energylib import comedlib
+from energylib import comed_forecast
+from energylib import httpclient
 
 
 #============================================
@@ -11,7 +22,9 @@ def _sample_data(prices):
 #============================================
 def _new_comedlib(monkeypatch):
 	monkeypatch.setattr(comedlib.os.path, "exists", lambda _: True)
-	return comedlib.ComedLib()
+	comlib = comedlib.ComedLib()
+	comlib.useArchive = False
+	return comlib
 
 
 #============================================
@@ -29,3 +42,460 @@ def test_get_median_comed_rate(monkeypatch):
 def test_get_url(monkeypatch):
 	comlib = _new_comedlib(monkeypatch)
 	assert comlib.getUrl().startswith("https://")
+
+
+#============================================
+def _feed_data(newest_ms, prices):
+	# feed order is newest first, one sample every 5 minutes
+	data = []
+	for i, price in enumerate(prices):
+		data.append({"millisUTC": str(newest_ms - i * 300000), "price": str(price)})
+	return data
+
+
+#============================================
+def test_price_series_buckets_match_hour_dict(monkeypatch):
+	comlib = _new_comedlib(monkeypatch)
+	# 2024-01-15 18:05 UTC, spanning several hours
+	data = _feed_data(1705341900000, [float(i % 7) for i in range(40)])
+	series = comlib.getPriceSeries(data)
+	yvalues = comlib.parseComedData(data)
+	for key in series.bucket_keys:
+		assert yvalues[int(key)] == series.hourPrices(key).tolist()
+
+
+#============================================
+def test_hourly_index_matches_bucket_statistics():
+	rng = numpy.random.default_rng(3)
+	prices = rng.normal(3.0, 2.0, 60)
+	millis = 1705341900000 - 300000 * numpy.arange(60)
+	series = comedlib.ComedPriceSeries(millis[20:], prices[20:])
+	# fold newer samples in a few at a time, trimming to a 3 hour window
+	for stop in (15, 8, 0):
+		series = series.withNewerSamples(millis[stop:stop + 5], prices[stop:stop + 5], 3 * 3600000)
+	rebuilt = comedlib.ComedPriceSeries(series.millis, series.prices)
+	assert series.hourly.hour_ids.tolist() == rebuilt.hourly.hour_ids.tolist()
+	for key in series.bucket_keys:
+		bucket = series.hourPrices(key)
+		assert series.hourMean(key) == pytest.approx(bucket.mean())
+		assert series.hourMean(key, clamp=True) == pytest.approx(numpy.maximum(bucket, 1.0).mean())
+		assert series.hourStd(key) == pytest.approx(bucket.std())
+		assert series.hourly.maximum(key + series._key_offset) == bucket.max()
+	keys, averages = series.hourlyAverages()
+	assert keys.tolist() == series.bucket_keys.tolist()
+
+
+#============================================
+def test_price_series_newest_sample_first(monkeypatch):
+	comlib = _new_comedlib(monkeypatch)
+	data = _feed_data(1705341900000, [5.0, 4.0, 3.0, 2.0])
+	assert comlib.getMostRecentRate(data) == 5.0
+	assert comlib.getLastPriceTimestampSeconds(data) == 1705341900.0
+
+
+#============================================
+def test_median_cache_invalidates_on_new_data(monkeypatch):
+	comlib = _new_comedlib(monkeypatch)
+	old_data = _feed_data(1705341900000, [2.0, 2.0, 2.0])
+	new_data = _feed_data(1705342200000, [9.0, 9.0, 9.0, 9.0])
+	monkeypatch.setattr(comlib, "downloadComedJsonData", lambda: old_data)
+	old_median, _ = comlib.getMedianComedRate()
+	monkeypatch.setattr(comlib, "downloadComedJsonData", lambda: new_data)
+	new_median, _ = comlib.getMedianComedRate()
+	assert new_median > old_median
+
+
+#============================================
+def test_data_version_matches_series_version(monkeypatch):
+	comlib = _new_comedlib(monkeypatch)
+	data = _feed_data(1705341900000, [1.0, 2.0, 3.0])
+	series = comlib.getPriceSeries(data)
+	assert comedlib.dataVersion(data) == series.version
+
+
+#============================================
+def test_read_feed_matches_published_series(monkeypatch, tmp_path):
+	comlib = _new_comedlib(monkeypatch)
+	comlib.feed_file = str(tmp_path / "feed.npy")
+	data = _feed_data(1700000000000, [2.0, 4.5, 3.0, 1.5])
+	published = comlib.publishFeed(data)
+	reader = _new_comedlib(monkeypatch)
+	reader.feed_file = comlib.feed_file
+	feed_data = reader.readFeed()
+	series = reader.getPriceSeries(feed_data)
+	assert series.version == published.version
+	assert numpy.array_equal(series.prices, published.prices)
+	assert reader.getMedianComedRate(feed_data) == comlib.getMedianComedRate(data)
+
+
+#============================================
+def test_read_feed_builds_records_lazily(monkeypatch, tmp_path):
+	comlib = _new_comedlib(monkeypatch)
+	comlib.feed_file = str(tmp_path / "feed.npy")
+	data = _feed_data(1700000000000, [2.0, 4.5, 3.0, 1.5])
+	comlib.publishFeed(data)
+	reader = _new_comedlib(monkeypatch)
+	reader.feed_file = comlib.feed_file
+	reader.useCache = True
+	reader.cache_file = str(tmp_path / "cache.json")
+	feed_data = reader.readFeed()
+	expected = [{'millisUTC': int(item['millisUTC']), 'price': float(item['price'])} for item in data]
+	# the rate accessors and single lookups never build the dictionaries
+	reader.getMedianComedRate(feed_data)
+	assert feed_data[0] == expected[0]
+	assert len(feed_data) == len(expected)
+	assert feed_data._records is None
+	# callers that walk the records still see the downloaded list
+	assert feed_data == expected
+	assert feed_data[1:3] == expected[1:3]
+	assert expected[:1] + feed_data == expected[:1] + expected
+	reader.writeCache(feed_data)
+	assert reader.readCache() == expected
+
+
+#============================================
+def test_next_publication_follows_newest_sample():
+	latest = 1700000000.0
+	assert comedlib.nextPublicationSeconds(latest, latest + 60) == latest + 330
+	# overdue: look again soon, backing off up to one interval
+	assert comedlib.nextPublicationSeconds(latest, latest + 340) == latest + 370
+	assert comedlib.nextPublicationSeconds(latest, latest + 3600) == latest + 3900
+	assert comedlib.nextPublicationSeconds(None, 100.0) == 130.0
+
+
+#============================================
+def test_wait_for_new_price_wakes_on_feed_update(monkeypatch, tmp_path):
+	comlib = _new_comedlib(monkeypatch)
+	comlib.feed_file = str(tmp_path / "feed.npy")
+	newest_ms = int(time.time() - 60) // 300 * 300000
+	comlib.publishFeed(_feed_data(newest_ms, [2.0, 3.0, 4.0]))
+
+	def no_download(*args, **kwargs):
+		raise AssertionError("the feed should answer")
+	monkeypatch.setattr(comlib, "safeDownloadWebpage", no_download)
+
+	def publisher():
+		time.sleep(0.2)
+		# a republish without a new sample does not end the wait
+		comlib.publishFeed(_feed_data(newest_ms, [2.0, 3.0, 4.0]))
+		time.sleep(1.2)
+		comlib.publishFeed(_feed_data(newest_ms + 300000, [5.0, 2.0, 3.0, 4.0]))
+	thread = threading.Thread(target=publisher)
+	thread.start()
+	start = time.time()
+	latest = comlib.waitForNewPrice(newest_ms / 1000.0, max_wait_seconds=10.0)
+	thread.join()
+	assert latest == (newest_ms + 300000) / 1000.0
+	assert time.time() - start < 5.0
+	assert comlib.getMostRecentRate() == 5.0
+
+
+#============================================
+class _FakeResponse(object):
+	def __init__(self, data, status_code=200, headers=None):
+		self.text = json.dumps(data)
+		self.status_code = status_code
+		self.headers = headers or {}
+
+
+#============================================
+def _offline_comedlib(monkeypatch, responses, urls):
+	comlib = _new_comedlib(monkeypatch)
+	comlib.useCache = False
+	comlib.useFeed = False
+
+	def fake_download(url, headers=None, deadline=None):
+		urls.append((url, dict(headers or {})))
+		return responses.pop(0)
+	monkeypatch.setattr(comlib, "safeDownloadWebpage", fake_download)
+	return comlib
+
+
+#============================================
+def test_incremental_refresh_merges_new_samples(monkeypatch):
+	full = _feed_data(1700000000000, [2.0, 3.0, 4.0, 5.0])
+	newer = _feed_data(1700000600000, [7.0, 6.0, 2.0])
+	urls = []
+	responses = [_FakeResponse(full), _FakeResponse(newer, headers={"ETag": "abc"})]
+	comlib = _offline_comedlib(monkeypatch, responses, urls)
+	comlib.refreshComedJsonData()
+	merged = comlib.refreshComedJsonData()
+	assert "datestart=" in urls[1][0]
+	# the overlapping sample is dropped and the window trims the oldest sample
+	assert [float(p["price"]) for p in merged] == [7.0, 6.0, 2.0, 3.0]
+	series = comlib.getPriceSeries(merged)
+	assert series.version == comedlib.dataVersion(merged)
+	assert numpy.array_equal(series.prices, numpy.array([7.0, 6.0, 2.0, 3.0]))
+	# validators from the response are sent on the next poll
+	responses.append(_FakeResponse([], status_code=304))
+	assert comlib.refreshComedJsonData() is merged
+	assert urls[2][1]["If-None-Match"] == "abc"
+
+
+#============================================
+def test_incremental_refresh_resyncs_with_full_download(monkeypatch):
+	full = _feed_data(1700000000000, [2.0, 3.0])
+	urls = []
+	responses = [_FakeResponse(full), _FakeResponse(full)]
+	comlib = _offline_comedlib(monkeypatch, responses, urls)
+	comlib.refreshComedJsonData()
+	comlib.last_full_download -= comlib.incremental_resync_seconds + 1
+	comlib.refreshComedJsonData()
+	assert [url for url, _headers in urls] == [comlib.getUrl(), comlib.getUrl()]
+
+
+#============================================
+def test_safe_download_gives_up_at_deadline(monkeypatch):
+	comlib = _new_comedlib(monkeypatch)
+	comlib.backoff_base_seconds = 0.01
+	comlib.backoff_max_seconds = 0.02
+	calls = []
+
+	def failing_get(url, **kwargs):
+		calls.append(kwargs)
+		raise requests.exceptions.ConnectTimeout("offline")
+	monkeypatch.setattr(httpclient, "get", failing_get)
+	start = time.monotonic()
+	with pytest.raises(RuntimeError):
+		comlib.safeDownloadWebpage(comlib.getUrl(), deadline=time.monotonic() + 0.2)
+	assert time.monotonic() - start < 1.0
+	assert len(calls) > 1
+	# no attempt is allowed a timeout longer than the time left
+	assert all(kw["timeout"] <= 0.2 for kw in calls)
+
+
+#============================================
+def test_safe_download_retries_ssl_error_without_verify(monkeypatch):
+	comlib = _new_comedlib(monkeypatch)
+	comlib.backoff_base_seconds = 0.001
+	verify_flags = []
+
+	def flaky_get(url, **kwargs):
+		# the deadline loop is the only retry layer
+		assert kwargs["retry"] is False
+		verify_flags.append(kwargs["verify"])
+		if len(verify_flags) == 1:
+			raise requests.exceptions.SSLError("bad chain")
+		return _FakeResponse([])
+	monkeypatch.setattr(httpclient, "get", flaky_get)
+	comlib.safeDownloadWebpage(comlib.getUrl())
+	assert verify_flags == [True, False]
+
+
+#============================================
+def test_refresh_falls_back_to_last_known_good(monkeypatch):
+	full = _feed_data(1700000000000, [2.0, 3.0])
+	comlib = _offline_comedlib(monkeypatch, [_FakeResponse(full)], [])
+	comlib.refreshComedJsonData()
+
+	def offline_download(url, headers=None, deadline=None):
+		raise RuntimeError("offline")
+	monkeypatch.setattr(comlib, "safeDownloadWebpage", offline_download)
+	assert comlib.refreshComedJsonData() is comlib.raw_data_cache["data"]
+	assert comlib.getMostRecentRate() == 2.0
+	with pytest.raises(RuntimeError):
+		comlib.refreshComedJsonData(fallback=False)
+
+
+#============================================
+def test_fallback_expires_during_long_outage(monkeypatch):
+	clock = [1700000000.0]
+	monkeypatch.setattr(comedlib.time, "time", lambda: clock[0])
+	full = _feed_data(1700000000000, [2.0, 3.0])
+	comlib = _offline_comedlib(monkeypatch, [_FakeResponse(full)], [])
+	comlib.refreshComedJsonData()
+	attempts = []
+
+	def offline_download(url, headers=None, deadline=None):
+		attempts.append(url)
+		raise RuntimeError("offline")
+	monkeypatch.setattr(comlib, "safeDownloadWebpage", offline_download)
+	clock[0] += 300
+	assert comlib.downloadComedJsonData() == full
+	# the holdoff reuses the fallback without another download
+	tries = len(attempts)
+	clock[0] += 30
+	assert comlib.downloadComedJsonData() == full
+	assert len(attempts) == tries
+	# repeated fallbacks do not make the data look fresh again
+	for _ in range(20):
+		clock[0] += 90
+		comlib.downloadComedJsonData()
+	assert comlib.raw_data_cache['timestamp'] == 1700000000.0
+	clock[0] += 1800
+	assert comlib.refreshComedJsonData() is None
+
+
+#============================================
+def test_wait_for_new_price_keeps_fallback_age(monkeypatch):
+	clock = [1700000000.0]
+	monkeypatch.setattr(comedlib.time, "time", lambda: clock[0])
+
+	def fake_sleep(seconds):
+		clock[0] += seconds
+	monkeypatch.setattr(comedlib.time, "sleep", fake_sleep)
+	full = _feed_data(1700000000000, [2.0, 3.0])
+	comlib = _offline_comedlib(monkeypatch, [_FakeResponse(full)], [])
+	comlib.refreshComedJsonData()
+
+	def offline_download(url, headers=None, deadline=None):
+		raise RuntimeError("offline")
+	monkeypatch.setattr(comlib, "safeDownloadWebpage", offline_download)
+	clock[0] += 400
+	assert comlib.waitForNewPrice(max_wait_seconds=120.0) == 1700000000.0
+	# last-known-good data served during the wait keeps its download time
+	assert comlib.raw_data_cache['timestamp'] == 1700000000.0
+
+
+#============================================
+def test_shared_comedlib_downloads_once_across_threads(monkeypatch):
+	full = _feed_data(1700000000000, [2.0, 3.0])
+	comlib = _offline_comedlib(monkeypatch, [], [])
+	downloads = []
+
+	def slow_download(url, headers=None, deadline=None):
+		downloads.append(url)
+		time.sleep(0.1)
+		return _FakeResponse(full)
+	monkeypatch.setattr(comlib, "safeDownloadWebpage", slow_download)
+	results = []
+	threads = [threading.Thread(target=lambda: results.append(comlib.downloadComedJsonData()))
+		for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join(5)
+	# the other threads wait for the first download and reuse it
+	assert len(downloads) == 1
+	assert len(results) == 4
+	assert all(result is results[0] for result in results)
+
+
+#============================================
+def test_concurrent_cache_writes_do_not_collide(monkeypatch, tmp_path):
+	comlib = comedlib.ComedLib()
+	comlib.cache_file = str(tmp_path / "comed_cache_file.json")
+	errors = []
+
+	def write(price):
+		try:
+			for _ in range(20):
+				comlib.writeCache(_feed_data(1700000000000, [price]))
+		except OSError as error:
+			errors.append(error)
+	threads = [threading.Thread(target=write, args=(float(price),)) for price in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join(5)
+	assert errors == []
+	assert comlib.readCache(max_age_seconds=60) is not None
+	assert os.listdir(tmp_path) == ["comed_cache_file.json"]
+
+
+#============================================
+def test_downloads_are_archived(monkeypatch, tmp_path):
+	full = _feed_data(1700000000000, [2.0, 3.0, 4.0])
+	newer = _feed_data(1700000300000, [5.0, 2.0])
+	responses = [_FakeResponse(full), _FakeResponse(newer)]
+	comlib = _offline_comedlib(monkeypatch, responses, [])
+	comlib.useArchive = True
+	comlib.archive_file = str(tmp_path / "archive.sqlite3")
+	comlib.refreshComedJsonData()
+	comlib.refreshComedJsonData()
+	millis, prices = comlib.getArchivedPrices()
+	assert millis.tolist() == [1699999400000, 1699999700000, 1700000000000, 1700000300000]
+	assert prices.tolist() == [4.0, 3.0, 2.0, 5.0]
+	millis, prices = comlib.getArchivedPrices(1699999700.0, 1700000300.0)
+	assert prices.tolist() == [3.0, 2.0]
+
+
+#============================================
+def test_archive_is_opt_in_and_warns_on_stderr(monkeypatch, tmp_path, capsys):
+	# read-only users such as the CGI pages never write the archive
+	assert comedlib.ComedLib().useArchive is False
+	comlib = _new_comedlib(monkeypatch)
+	comlib.useArchive = True
+	blocker = tmp_path / "not_a_dir"
+	blocker.write_text("")
+	comlib.archive_file = str(blocker / "archive.sqlite3")
+	series = comlib.getPriceSeries(_feed_data(1700000000000, [2.0, 3.0]))
+	assert comlib.archiveSamples(series) == 0
+	# stdout stays clean for a CGI response
+	captured = capsys.readouterr()
+	assert captured.out == ""
+	assert "Could not archive" in captured.err
+
+
+#============================================
+def test_download_range_trims_to_half_open_range(monkeypatch):
+	data = _feed_data(1700000600000, [5.0, 4.0, 3.0])
+	urls = []
+	comlib = _offline_comedlib(monkeypatch, [_FakeResponse(data)], urls)
+	millis, prices = comlib.downloadRange(1700000000.0, 1700000600.0)
+	assert "datestart=" in urls[0][0] and "dateend=" in urls[0][0]
+	assert millis.tolist() == [1700000300000, 1700000000000]
+	assert prices.tolist() == [4.0, 3.0]
+
+
+#============================================
+def test_day_ahead_prices_are_cached(monkeypatch):
+	pairs = [[1700006400000, 3.5], [1700002800000, 2.5]]
+	urls = []
+	comlib = _offline_comedlib(monkeypatch, [_FakeResponse(pairs)], urls)
+	hours, prices = comlib.getDayAheadPrices()
+	assert "daynexttoday" in urls[0][0]
+	assert hours.tolist() == [1700002800, 1700006400]
+	assert prices.tolist() == [2.5, 3.5]
+	# served from memory, no second download
+	assert comlib.getDayAheadPrices()[1].tolist() == [2.5, 3.5]
+	assert len(urls) == 1
+	records = [{"millisUTC": "1700002800000", "price": "2.5"}]
+	assert comlib.parseDayAheadData(records)[0].tolist() == [1700002800]
+
+
+#============================================
+def test_hour_of_day_prices_follow_the_feed(monkeypatch):
+	data = _feed_data(1700000000000, [2.0, 4.0])
+	comlib = _new_comedlib(monkeypatch)
+	prices = comlib.getHourOfDayPrices(data)
+	hour = time.localtime(1700000000).tm_hour
+	assert prices.shape == (24,)
+	assert prices[hour] == pytest.approx(3.0)
+	# hours without samples fall back to the 75th percentile
+	median, _std = comlib.getMedianComedRate(data)
+	assert prices[(hour + 12) % 24] == pytest.approx(median)
+
+
+#============================================
+def test_import_defers_http_stack():
+	# feed clients never download, so importing comedlib must not load requests
+	code = "import sys; from energylib import comedlib; print('requests' in sys.modules)"
+	result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+		cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+	assert result.stdout.strip() == "False"
+
+
+#============================================
+class ConstantForecaster(comed_forecast.PriceForecaster):
+	name = "constant"
+
+	def __init__(self, rate):
+		self.rate = rate
+
+	def predict(self, series):
+		return self.rate
+
+	def predict_history(self, prices, hour_ids):
+		return numpy.full(len(prices), self.rate)
+
+
+#============================================
+def test_new_forecaster_is_not_served_old_prediction(monkeypatch):
+	comlib = _new_comedlib(monkeypatch)
+	data = _feed_data(1700000000000, [2.0, 4.5, 3.0])
+	for rate in [1.0, 2.0, 3.0, 4.0]:
+		# drop the old model first, so CPython may hand its id to the new one
+		comlib.forecaster = None
+		comlib.forecaster = ConstantForecaster(rate)
+		assert comlib.getPredictedRate(data) == rate
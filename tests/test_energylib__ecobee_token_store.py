@@ -0,0 +1,117 @@
+import os
+import json
+import stat
+import pickle
+import datetime
+import threading
+import types
+
+import pytest
+
+from energylib import ecobee_token_store
+
+
+#============================================
+def _tokens(access_token, minutes_left):
+	now = datetime.datetime.now(datetime.timezone.utc)
+	tokens = {
+		'authorization_token': 'auth',
+		'access_token': access_token,
+		'refresh_token': 'refresh-' + access_token,
+		'access_token_expires_on': now + datetime.timedelta(minutes=minutes_left),
+		'refresh_token_expires_on': now + datetime.timedelta(days=300),
+	}
+	return tokens
+
+
+#============================================
+class FakeService(object):
+	def __init__(self, tokens):
+		self.refresh_calls = 0
+		ecobee_token_store.apply_tokens(self, tokens)
+
+	def refresh_tokens(self):
+		self.refresh_calls += 1
+		fresh = _tokens(f"access{self.refresh_calls}", 60)
+		self.access_token = fresh['access_token']
+		self.refresh_token = fresh['refresh_token']
+		self.access_token_expires_on = fresh['access_token_expires_on']
+
+
+#============================================
+def test_round_trip_keeps_other_thermostats(tmp_path):
+	token_file = str(tmp_path / "tokens.json")
+	first = _tokens("a", 30)
+	ecobee_token_store.write_tokens("home", first, token_file)
+	ecobee_token_store.write_tokens("cabin", _tokens("b", 30), token_file)
+	loaded = ecobee_token_store.read_tokens("home", token_file)
+	assert loaded == first
+	with open(token_file) as f:
+		assert set(json.load(f)) == {"home", "cabin"}
+	assert ecobee_token_store.read_tokens("garage", token_file) is None
+
+
+#============================================
+def test_damaged_store_raises(tmp_path):
+	token_file = tmp_path / "tokens.json"
+	token_file.write_text("{not json")
+	# an unreadable store must not look empty and trigger re-authorization
+	with pytest.raises(ValueError):
+		ecobee_token_store.read_tokens("home", str(token_file))
+	assert ecobee_token_store.read_tokens("home", str(tmp_path / "missing.json")) is None
+
+
+#============================================
+def test_rewrite_keeps_mode_of_existing_store(tmp_path):
+	token_file = str(tmp_path / "tokens.json")
+	ecobee_token_store.write_tokens("home", _tokens("a", 30), token_file)
+	assert stat.S_IMODE(os.stat(token_file).st_mode) == ecobee_token_store.NEW_FILE_MODE
+	os.chmod(token_file, 0o644)
+	ecobee_token_store.write_tokens("home", _tokens("b", 30), token_file)
+	assert stat.S_IMODE(os.stat(token_file).st_mode) == 0o644
+
+
+#============================================
+def test_migrate_legacy_pickle(tmp_path):
+	token_file = str(tmp_path / "tokens.json")
+	pickle_file = str(tmp_path / "db.pickle")
+	legacy = types.SimpleNamespace(**_tokens("old", 30))
+	with open(pickle_file, "wb") as f:
+		pickle.dump({"home": legacy}, f)
+	migrated = ecobee_token_store.migrate_pickle("home", pickle_file, token_file)
+	assert migrated['access_token'] == "old"
+	assert ecobee_token_store.read_tokens("home", token_file)['refresh_token'] == "refresh-old"
+
+
+#============================================
+def test_needs_refresh_margin():
+	assert ecobee_token_store.needs_refresh(_tokens("a", 5), margin_seconds=600)
+	assert not ecobee_token_store.needs_refresh(_tokens("a", 30), margin_seconds=600)
+	assert ecobee_token_store.needs_refresh(None)
+
+
+#============================================
+def test_refresh_adopts_tokens_refreshed_elsewhere(tmp_path):
+	token_file = str(tmp_path / "tokens.json")
+	ecobee_token_store.write_tokens("home", _tokens("fresh", 50), token_file)
+	service = FakeService(_tokens("stale", 1))
+	refreshed = ecobee_token_store.refresh_if_needed(service, "home", token_file, margin_seconds=600)
+	assert refreshed is False
+	assert service.refresh_calls == 0
+	assert service.access_token == "fresh"
+
+
+#============================================
+def test_concurrent_refresh_happens_once(tmp_path):
+	token_file = str(tmp_path / "tokens.json")
+	ecobee_token_store.write_tokens("home", _tokens("stale", 1), token_file)
+	services = [FakeService(_tokens("stale", 1)) for _ in range(4)]
+	threads = [threading.Thread(target=ecobee_token_store.refresh_if_needed,
+		args=(service, "home", token_file, 600)) for service in services]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join(5)
+	assert sum(service.refresh_calls for service in services) == 1
+	stored = ecobee_token_store.read_tokens("home", token_file)
+	assert all(service.access_token == stored['access_token'] for service in services)
@@ -1,7 +1,91 @@
+import types
+import logging
+import datetime
+
 import pytest
 
+# ecobeelib needs the Ecobee client stack; run where it is installed
+pytest.importorskip("pyecobee")
+pytest.importorskip("pytz")
+pytest.importorskip("six")
+
+from energylib import ecobeelib
+
+
+#============================================
+class FakeResponse(object):
+	def __init__(self, thermostat_list=None):
+		self.status = types.SimpleNamespace(code=0)
+		self.thermostat_list = thermostat_list
+
+	def pretty_format(self):
+		return "fake response"
+
+
+#============================================
+class FakeThermostat(object):
+	def pretty_format(self):
+		return "fake thermostat"
+
+
+#============================================
+class FakeService(object):
+	def __init__(self):
+		self.selections = []
+		self.holds = []
+
+	def request_thermostats(self, selection):
+		self.selections.append(selection)
+		return FakeResponse([FakeThermostat()])
+
+	def set_hold(self, **kwargs):
+		self.holds.append(kwargs)
+		return FakeResponse()
+
+
+#============================================
+@pytest.fixture
+def myecobee(monkeypatch):
+	clock = [1000.0]
+	monkeypatch.setattr(ecobeelib.time, "monotonic", lambda: clock[0])
+	ecobee = ecobeelib.MyEcobee()
+	ecobee.logger = logging.getLogger("test_ecobeelib")
+	ecobee.thermostat_id = "123456"
+	ecobee.ecobee_service = FakeService()
+	ecobee.clock = clock
+	return ecobee
+
+
+#============================================
+def test_snapshot_fetches_every_section_once(myecobee):
+	first = myecobee.snapshot(("sensors",))
+	selection = myecobee.ecobee_service.selections[0]
+	assert selection.include_runtime and selection.include_events and selection.include_weather
+	# the other accessors reuse the same thermostat object
+	assert myecobee.snapshot(("events", "runtime")) is first
+	assert myecobee.snapshot() is first
+	assert len(myecobee.ecobee_service.selections) == 1
+
+
+#============================================
+def test_snapshot_expires_after_ttl(myecobee):
+	first = myecobee.snapshot()
+	myecobee.clock[0] += myecobee.snapshot_ttl_seconds - 1
+	assert myecobee.snapshot() is first
+	myecobee.clock[0] += 2
+	assert myecobee.snapshot() is not first
+	assert len(myecobee.ecobee_service.selections) == 2
+	# a caller can ask for a fresher snapshot than the default
+	myecobee.clock[0] += 5
+	myecobee.snapshot(max_age_seconds=1)
+	assert len(myecobee.ecobee_service.selections) == 3
+
 
-pytest.skip(
-	"ecobeelib requires filesystem state and network access; skip unit tests.",
-	allow_module_level=True,
-)
+#============================================
+def test_hold_invalidates_snapshot(myecobee):
+	first = myecobee.snapshot()
+	myecobee.setHoldTemperature(80, 55, datetime.datetime(2026, 7, 1, 15, 59))
+	assert myecobee.snapshot_cache is None
+	assert len(myecobee.ecobee_service.holds) == 1
+	assert myecobee.snapshot() is not first
+	assert len(myecobee.ecobee_service.selections) == 2
@@ -1,5 +1,6 @@
 import re
 import sys
+import time
 import types
 
 import energylib
@@ -8,6 +9,7 @@ _fake_ecobee = types.SimpleNamespace()
 energylib.ecobeelib = _fake_ecobee
 sys.modules["energylib.ecobeelib"] = _fake_ecobee
 
+from energylib import comedlib
 from energylib import htmltools
 
 
@@ -48,3 +50,21 @@ def test_number_to_html_color_rgb_bounds():
 #============================================
 def test_equivalent_gas_cost():
 	assert htmltools.equivalent_gas_cost(10.0) == 1.4
+
+
+#============================================
+def test_html_comed_data_reuses_downloaded_data(monkeypatch):
+	monkeypatch.setattr(comedlib.os.path, "exists", lambda _: True)
+	comlib = comedlib.ComedLib()
+	comlib.useArchive = False
+
+	def no_download(*args, **kwargs):
+		raise AssertionError("data was passed in, nothing should be downloaded")
+
+	monkeypatch.setattr(comlib, "downloadComedJsonData", no_download)
+	newest_ms = int(time.time() * 1000)
+	data = [{"millisUTC": str(newest_ms - i * 300000), "price": str(2.0 + 0.1 * (i % 5))}
+		for i in range(288)]
+	html = htmltools.htmlComedData(comlib=comlib, comed_data=data)
+	assert html.startswith("<h3>Comed Prices</h3>")
+	assert "failed" not in html
@@ -0,0 +1,35 @@
+from energylib import httpclient
+
+
+#============================================
+def test_build_session_pools_and_retries():
+	session = httpclient.build_session(retries=3, pool_hosts=2, pool_per_host=5)
+	adapter = session.get_adapter("https://hourlypricing.comed.com/api")
+	assert adapter is session.get_adapter("http://192.168.2.188/solar_api")
+	assert adapter._pool_maxsize == 5
+	assert adapter.max_retries.total == 3
+	# read timeouts must surface to the caller instead of being retried
+	assert adapter.max_retries.read is False
+	session.close()
+
+
+#============================================
+def test_get_session_is_shared_until_closed():
+	first = httpclient.get_session()
+	assert httpclient.get_session() is first
+	httpclient.close_session()
+	second = httpclient.get_session()
+	assert second is not first
+	httpclient.close_session()
+
+
+#============================================
+def test_no_retry_session_makes_one_attempt():
+	session = httpclient.get_session(retry=False)
+	assert session is not httpclient.get_session()
+	adapter = session.get_adapter("https://hourlypricing.comed.com/api")
+	assert adapter.max_retries.total == 0
+	# no status retries, so a Retry-After header is never slept on
+	assert not adapter.max_retries.status_forcelist
+	assert httpclient.get_session(retry=False) is session
+	httpclient.close_session()
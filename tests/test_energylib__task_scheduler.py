@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from energylib import task_scheduler
+
+
+#============================================
+class FakeClock(object):
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+#============================================
+def _scheduler():
+	clock = FakeClock()
+	scheduler = task_scheduler.TaskScheduler(clock=clock)
+	return scheduler, clock
+
+
+#============================================
+def test_due_task_runs_and_reschedules_after_interval():
+	scheduler, clock = _scheduler()
+	calls = []
+	task = scheduler.addTask('count', lambda: calls.append(1), 30)
+	scheduler.runPending()
+	assert scheduler.join(5)
+	assert calls == [1]
+	assert task.runs == 1
+	assert task.next_run == pytest.approx(clock.now + 30)
+	# not due yet: nothing starts
+	scheduler.runPending()
+	assert scheduler.join(5)
+	assert calls == [1]
+
+
+#============================================
+def test_failure_is_isolated_and_backs_off():
+	scheduler, clock = _scheduler()
+	calls = []
+
+	def broken():
+		raise RuntimeError("boom")
+
+	bad = scheduler.addTask('bad', broken, 10)
+	good = scheduler.addTask('good', lambda: calls.append(1), 10)
+	scheduler.runPending()
+	assert scheduler.join(5)
+	assert calls == [1]
+	assert bad.failures == 1
+	assert "boom" in bad.last_error
+	assert good.failures == 0
+
+	clock.now = bad.next_run
+	scheduler.runPending()
+	assert scheduler.join(5)
+	# second failure in a row doubles the pause
+	assert bad.next_run == pytest.approx(clock.now + 20)
+
+
+#============================================
+def test_system_exit_is_contained():
+	scheduler, _ = _scheduler()
+
+	def exits():
+		raise SystemExit(1)
+
+	task = scheduler.addTask('exits', exits, 10)
+	scheduler.runPending()
+	assert scheduler.join(5)
+	assert task.failures == 1
+
+
+#============================================
+def test_returned_hold_extends_pause():
+	scheduler, clock = _scheduler()
+	task = scheduler.addTask('hold', lambda: 300.0, 60)
+	scheduler.runPending()
+	assert scheduler.join(5)
+	assert task.next_run == pytest.approx(clock.now + 360)
+
+
+#============================================
+def test_overrun_is_reported_and_not_restarted():
+	scheduler, clock = _scheduler()
+	release = threading.Event()
+	calls = []
+
+	def slow():
+		calls.append(1)
+		release.wait(5)
+
+	task = scheduler.addTask('slow', slow, 10, timeout_seconds=30)
+	scheduler.runPending()
+	clock.now += 31
+	scheduler.runPending()
+	assert task.timeouts == 1
+	assert task.isRunning()
+	release.set()
+	assert scheduler.join(5)
+	assert calls == [1]
+	assert task.runs == 1
+
+
+#============================================
+def test_duplicate_name_rejected():
+	scheduler, _ = _scheduler()
+	scheduler.addTask('job', lambda: None, 10)
+	with pytest.raises(ValueError):
+		scheduler.addTask('job', lambda: None, 10)
@@ -0,0 +1,213 @@
+import threading
+
+import pytest
+
+from energylib import wemolib
+
+
+#============================================
+class FakeRegistry(object):
+	def __init__(self):
+		self.callbacks = {}
+		self.subscribed = set()
+		self.registered = []
+
+	def register(self, device):
+		self.registered.append(device)
+		self.subscribed.add(device)
+
+	def unregister(self, device):
+		self.subscribed.discard(device)
+
+	def on(self, device, event_type, callback):
+		self.callbacks[device] = callback
+
+	def is_subscribed(self, device):
+		return device in self.subscribed
+
+	def push(self, device, value):
+		self.callbacks[device](device, wemolib.BINARY_STATE_EVENT, value)
+
+	def stop(self):
+		pass
+
+
+#============================================
+class FakeDevice(object):
+	def __init__(self, registry, state=0, send_events=True):
+		self.registry = registry
+		self.state = state
+		self.send_events = send_events
+		self.polls = 0
+
+	def get_state(self, force_update=False):
+		self.polls += 1
+		return self.state
+
+	def _switch(self, state, value):
+		self.state = state
+		if self.send_events:
+			# the event arrives on the registry's server thread
+			threading.Timer(0.05, self.registry.push, args=(self, value)).start()
+
+	def on(self):
+		self._switch(8, "8|1700000000|0|0")
+
+	def off(self):
+		self._switch(0, "0")
+
+
+#============================================
+def _manager(send_events=True):
+	registry = FakeRegistry()
+	devices = []
+
+	def factory(address):
+		device = FakeDevice(registry, send_events=send_events)
+		devices.append(device)
+		return device
+
+	manager = wemolib.WemoPlugManager(registry=registry, device_factory=factory)
+	manager.addPlug("10.0.0.5")
+	return manager, registry, devices
+
+
+#============================================
+def test_parse_binary_state():
+	assert wemolib.parse_binary_state("1") == 1
+	assert wemolib.parse_binary_state("8|1700000000|0") == 8
+	assert wemolib.parse_binary_state(0) == 0
+
+
+#============================================
+def test_state_comes_from_events_without_polling():
+	manager, registry, devices = _manager()
+	device = devices[0]
+	assert device.polls == 1
+	registry.push(device, "1")
+	assert manager.getState("10.0.0.5") == 1
+	assert manager.isOn("10.0.0.5")
+	assert device.polls == 1
+
+
+#============================================
+def test_switch_confirmed_by_event():
+	manager, registry, devices = _manager()
+	assert manager.switch("10.0.0.5", True, confirm_seconds=5)
+	assert manager.getState("10.0.0.5") == 8
+	assert manager.switch("10.0.0.5", False, confirm_seconds=5)
+	# confirmation came from the events, not from polling
+	assert devices[0].polls == 1
+
+
+#============================================
+def test_switch_without_event_falls_back_to_one_poll():
+	manager, registry, devices = _manager(send_events=False)
+	assert manager.switch("10.0.0.5", True, confirm_seconds=0.1)
+	assert devices[0].polls == 2
+
+
+#============================================
+def test_reconnect_only_after_subscription_failure():
+	manager, registry, devices = _manager()
+	assert not manager.ensureSubscribed("10.0.0.5")
+	assert len(devices) == 1
+	registry.subscribed.clear()
+	assert manager.ensureSubscribed("10.0.0.5")
+	assert len(devices) == 2
+	# events from the dropped connection are ignored
+	registry.callbacks[devices[0]](devices[0], wemolib.BINARY_STATE_EVENT, "1")
+	assert manager.getState("10.0.0.5") == 0
+
+
+#============================================
+class FakeClock(object):
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+#============================================
+class DeadDevice(FakeDevice):
+	def on(self):
+		raise OSError("unreachable")
+
+
+#============================================
+def _actuator(device_class, **kwargs):
+	registry = FakeRegistry()
+	manager = wemolib.WemoPlugManager(registry=registry, device_factory=lambda address: device_class(registry))
+	manager.addPlug("10.0.0.5")
+	clock = FakeClock()
+	sleeps = []
+	actuator = wemolib.PlugActuator(manager, "10.0.0.5", clock=clock, sleep=sleeps.append, **kwargs)
+	return actuator, clock, sleeps
+
+
+#============================================
+def test_actuator_switches_and_skips_unchanged():
+	actuator, _, sleeps = _actuator(FakeDevice, verify_seconds=5)
+	assert actuator.actuate(True) == wemolib.SWITCHED
+	assert actuator.actuate(True) == wemolib.UNCHANGED
+	assert actuator.health()['switches'] == 1
+	assert sleeps == []
+
+
+#============================================
+def test_actuator_backs_off_then_opens_circuit():
+	actuator, clock, sleeps = _actuator(DeadDevice, attempts=4, backoff_seconds=2,
+		max_backoff_seconds=5, failure_threshold=2, open_seconds=600)
+	assert actuator.actuate(True) == wemolib.FAILED
+	# exponential backoff between attempts, capped
+	assert sleeps == [2, 4, 5]
+	assert actuator.health()['circuit'] == wemolib.CIRCUIT_CLOSED
+	assert actuator.actuate(True) == wemolib.FAILED
+	assert actuator.health()['circuit'] == wemolib.CIRCUIT_OPEN
+	assert "unreachable" in actuator.health()['last_error']
+	# open circuit: the plug is left alone without touching the network
+	assert actuator.actuate(True) == wemolib.SKIPPED
+	assert not actuator.isHealthy()
+
+
+#============================================
+def test_actuator_half_open_trial_closes_circuit():
+	actuator, clock, _ = _actuator(DeadDevice, attempts=1, failure_threshold=1, open_seconds=600)
+	assert actuator.actuate(True) == wemolib.FAILED
+	assert actuator.actuate(True) == wemolib.SKIPPED
+	clock.now += 601
+	# the plug recovered during the cool-down
+	actuator.manager.plugs["10.0.0.5"]['device'].__class__ = FakeDevice
+	assert actuator.actuate(True) == wemolib.SWITCHED
+	assert actuator.isHealthy()
+
+
+#============================================
+def test_unreachable_plug_retried_through_circuit():
+	registry = FakeRegistry()
+	reachable = [False]
+
+	def factory(address):
+		if not reachable[0]:
+			raise OSError("no route to host")
+		return FakeDevice(registry)
+
+	manager = wemolib.WemoPlugManager(registry=registry, device_factory=factory)
+	clock = FakeClock()
+	actuator = wemolib.PlugActuator(manager, "10.0.0.5", failure_threshold=2, open_seconds=600,
+		clock=clock, sleep=lambda seconds: None)
+	for _ in range(2):
+		with pytest.raises(OSError):
+			actuator.ensureConnected()
+	# an actuation before connecting fails instead of raising
+	assert actuator.actuate(True) == wemolib.SKIPPED
+	# open circuit: no connection attempt until the cool-down ends
+	reachable[0] = True
+	assert actuator.ensureConnected() is False
+	assert "10.0.0.5" not in manager.plugs
+	clock.now += 601
+	assert actuator.ensureConnected() is True
+	assert actuator.actuate(True) == wemolib.SWITCHED
+	assert actuator.isHealthy()
+	assert actuator.ensureConnected() is False
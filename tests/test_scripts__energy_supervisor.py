@@ -0,0 +1,90 @@
+import os
+import types
+import importlib.util
+
+import pytest
+
+import git_file_utils
+
+REPO_ROOT = git_file_utils.get_repo_root()
+SCRIPT_PATH = os.path.join(REPO_ROOT, "scripts", "energy_supervisor.py")
+
+
+#============================================
+def _load_supervisor():
+	spec = importlib.util.spec_from_file_location("energy_supervisor", SCRIPT_PATH)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+#============================================
+class FakeComedLib(object):
+	def __init__(self, latest_seconds):
+		self.latest_seconds = latest_seconds
+
+	def getLastPriceTimestampSeconds(self):
+		return self.latest_seconds
+
+
+#============================================
+@pytest.fixture
+def supervisor(monkeypatch):
+	module = _load_supervisor()
+	monkeypatch.setattr(module.time, "time", lambda: 1700000100.0)
+	cycles = {'holds': [], 'runs': 0, 'plans': []}
+
+	def run_cycle(plugs, comlib, state):
+		cycles['runs'] += 1
+		return cycles['holds'].pop(0) if cycles['holds'] else 0.0
+
+	def run_plan_cycle(plugs, comlib, state, charge_kwh, charge_kw, ready_by):
+		cycles['plans'].append((charge_kwh, charge_kw, ready_by))
+		return 1800.0
+	wemo = types.SimpleNamespace(
+		wemoIpAddresses=["10.0.0.1"],
+		connect_plugs=lambda ips: list(ips),
+		new_cycle_state=dict,
+		run_cycle=run_cycle,
+		new_plan_state=dict,
+		run_plan_cycle=run_plan_cycle,
+	)
+	monkeypatch.setattr(module, "load_script", lambda job: wemo)
+	module.cycles = cycles
+	return module
+
+
+#============================================
+def test_wemo_job_holds_until_next_price(supervisor):
+	# newest sample at :00, so the next one is due 5 minutes and the publish lag later
+	comlib = FakeComedLib(1700000000.0)
+	run = supervisor.wemo_job(comlib, None, 900.0)
+	expected = 1700000000.0 + 300 + supervisor.comedlib.PUBLISH_LAG_SECONDS - 1700000100.0
+	assert run() == pytest.approx(expected)
+	# a cycle that asks for its own hold keeps it
+	supervisor.cycles['holds'].append(1200.0)
+	assert run() == 1200.0
+	# without a known price it looks again soon, and never waits past the cap
+	comlib.latest_seconds = None
+	assert run() == pytest.approx(supervisor.comedlib.LATE_RETRY_SECONDS)
+	assert supervisor.wemo_job(FakeComedLib(1700000000.0), None, 60.0)() == 60.0
+
+
+#============================================
+def test_wemo_task_has_no_jitter(supervisor):
+	args = types.SimpleNamespace(run_feed=False, run_dashboard=False, run_awtrix=False, run_wemo=True,
+		run_ecobee_tokens=False, run_thermostat=False, wemo_ips=None, wemo_max_wait=900.0,
+		charge_kwh=None, charge_kw=1.4, ready_by='07:00')
+	scheduler = supervisor.build_scheduler(args)
+	task = scheduler.tasks[0]
+	assert task.jitter_seconds == 0
+	assert task.interval_seconds == supervisor.WEMO_RECHECK_SECONDS
+
+
+#============================================
+def test_wemo_job_follows_charge_plan(supervisor):
+	run = supervisor.wemo_job(FakeComedLib(1700000000.0), ["10.0.0.2"], 900.0, 6.0, 1.4, "06:30")
+	# the plan decides the hold, not the price cap
+	assert run() == 1800.0
+	assert supervisor.cycles['plans'] == [(6.0, 1.4, "06:30")]
+	assert supervisor.cycles['runs'] == 0